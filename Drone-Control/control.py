@@ -1,9 +1,14 @@
 from dronekit import connect, VehicleMode, LocationGlobalRelative, Command
 import time
 import cv2
-from ultralytics import YOLO
 import math
 from pymavlink import mavutil
+import os
+import sys
+
+# Shared model registry lives in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model_registry
 
 # === CONFIGURATION ===
 MODEL_PATH = 'distant.pt'
@@ -20,8 +25,6 @@ vehicle = None
 horizontal_fov_deg = None
 vertical_fov_deg = None
 altitude_to_fly = 10
-model = YOLO(MODEL_PATH)
-model.fuse()
 connected = False
 armed = False
 search_flag = False
@@ -115,6 +118,7 @@ def arm(altitude=4):
 # === DETECTION LOOP ===
 def detect_loop():
     global search_flag
+    model = model_registry.get_model(MODEL_PATH)
     cap = cv2.VideoCapture(0)  # Adjust camera index if needed
 
     if not cap.isOpened():
@@ -167,6 +171,7 @@ def detect_loop():
 # === MAIN ===
 if __name__ == "__main__":
     try:
+        model_registry.warmup_async(MODEL_PATH)
         connect_drone("tcp:127.0.0.1:5762")
         arm(altitude_to_fly)
         detect_loop()
@@ -5,12 +5,16 @@
 from dronekit import connect, VehicleMode, LocationGlobalRelative, Command
 import time
 import cv2
-from ultralytics import YOLO
 import math
 from pymavlink import mavutil
 import keyboard
-import os
 import json
+import os
+import sys
+
+# Shared model registry lives in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model_registry
 
 # === CONFIGURATION ===
 MODEL_PATH = 'distant.pt'
@@ -38,8 +42,6 @@ fallback_connection_string = "tcp:127.0.0.1:5762"
 vehicle = None
 horizontal_fov_deg = None
 vertical_fov_deg = None
-model = YOLO(MODEL_PATH)
-model.fuse()
 connected = False
 armed = False
 search_flag = False
@@ -133,6 +135,7 @@ def arm(altitude=altitude_to_fly):
 # === DETECTION FUNCTION ===
 def detect_loop():
     global horizontal_fov_deg, vertical_fov_deg, search_flag
+    model = model_registry.get_model(MODEL_PATH)
     cap = cv2.VideoCapture(0)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, IMAGE_WIDTH_PX)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, IMAGE_HEIGHT_PX)
@@ -203,6 +206,8 @@ def init_cam():
     return cap
 
 if __name__ == "__main__":
+    # Load and warm the detector while the vehicle link comes up
+    model_registry.warmup_async(MODEL_PATH)
     try:
         print(f"Attempting to connect to {connection_string}")
         connect_drone(connection_string)
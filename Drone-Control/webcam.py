@@ -1,29 +1,55 @@
+import os
+import sys
+import threading
 import cv2
-from ultralytics import YOLO
+
+# Shared capture/detection modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from capture import LatestFrameCapture
+import detection
+import model_registry
+
+# Forward camera and the down-looking camera share one model instance
+CAMERA_SOURCES = {"forward": 2, "down": 0}
 
 # Load the YOLOv8 model
-model = YOLO("mangodet_yolov8.pt")  # use your exact path
+model = model_registry.get_model("mangodet_yolov8.pt")  # use your exact path
+detector = detection.BatchDetector(model, batch_size=len(CAMERA_SOURCES), max_wait_ms=20)
 
-# Open webcam
-cap = cv2.VideoCapture(2)
+annotated = {}
+running = True
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+def camera_loop(name, index):
+    cap = LatestFrameCapture(index)
+    while running:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+
+        # Run detection, batched with the other cameras
+        results = detector.detect(name, frame)
 
-    # Run detection
-    results = model(frame)
+        # Draw results on the frame
+        annotated[name] = results[0].plot()
+    cap.release()
 
-    # Draw results on the frame
-    annotated_frame = results[0].plot()
+threads = [threading.Thread(target=camera_loop, args=(name, index), daemon=True)
+           for name, index in CAMERA_SOURCES.items()]
+for th in threads:
+    th.start()
 
+while True:
     # Display
-    cv2.imshow("YOLOv8 Detection", annotated_frame)
+    for name, frame in list(annotated.items()):
+        cv2.imshow(f"YOLOv8 Detection ({name})", frame)
 
     # Exit with 'q'
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
-cap.release()
+running = False
+for th in threads:
+    th.join(timeout=1.0)
+print("Batch stats:", detector.stats())
+detector.close()
 cv2.destroyAllWindows()
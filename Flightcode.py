@@ -3,9 +3,15 @@
 from dronekit import connect, VehicleMode, LocationGlobalRelative, Command
 import time
 import cv2
-from ultralytics import YOLO
+import model_registry
 import math
 from pymavlink import mavutil
+from capture import LatestFrameCapture
+import calibration
+from search_scheduler import SearchScheduler, YawSweep
+from visual_servo import VisualServoController
+from command_dispatcher import encode_velocity_setpoint
+from fruit_map import FruitMap
 
 # === CONFIGURATION ===
 MODEL_PATH = 'kaggle100.pt'
@@ -16,28 +22,26 @@ SENSOR_WIDTH_MM = 4.8
 SENSOR_HEIGHT_MM = 3.6
 IMAGE_WIDTH_PX = 640
 IMAGE_HEIGHT_PX = 480
+STANDOFF_DISTANCE_CM = 40  # Approach stops this far from the fruit
+ALIGN_TOLERANCE_DEG = 2.5  # Fruit counts as centred within this bearing (about 20 px)
+CAMERA_NAME = 'forward'
+FRUIT_MAP_FILE = f"fruit_map_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+
+# === LOAD OBJECT DETECTION MODEL (in background while connecting) ===
+print("Loading model...")
+model_registry.warmup_async(MODEL_PATH)
 
 # === CONNECT TO DRONE ===
 print("Connecting to drone...")
 vehicle = connect('tcp:127.0.0.1:5762', wait_ready=True)
 
-# === LOAD OBJECT DETECTION MODEL ===
-print("Loading model...")
-model = YOLO(MODEL_PATH)
-model.fuse()
-
 # === DISTANCE ESTIMATION ===
-def estimate_distance(focal_length_mm, real_width_cm, bbox_width_px, image_width_px, sensor_width_mm):
-    if bbox_width_px == 0:
-        return float('inf')
-    focal_px = (focal_length_mm / sensor_width_mm) * image_width_px
-    return (real_width_cm * focal_px) / bbox_width_px
-
-def estimate_height_difference(focal_length_mm, real_height_cm, bbox_height_px, image_height_px, sensor_height_mm):
-    if bbox_height_px == 0:
-        return float('inf')
-    focal_px = (focal_length_mm / sensor_height_mm) * image_height_px
-    return (real_height_cm * focal_px) / bbox_height_px
+# Intrinsics are computed once; distances for all boxes come from one call per frame
+# Uses the checkerboard calibration for this camera and resolution when there is one
+camera = calibration.load_camera_model(CAMERA_NAME, IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX,
+                                       focal_length_mm=FOCAL_LENGTH_MM, sensor_width_mm=SENSOR_WIDTH_MM,
+                                       sensor_height_mm=SENSOR_HEIGHT_MM, real_width_cm=REAL_FRUIT_WIDTH_CM,
+                                       real_height_cm=REAL_FRUIT_HEIGHT_CM)
 
 # === TAKEOFF ===
 def arm_and_takeoff(altitude):
@@ -86,20 +90,37 @@ def send_ned_velocity(velocity_x, velocity_y, velocity_z, duration):
         vehicle.send_mavlink(msg)
         time.sleep(1)
 
+# === HEADING ===
+def heading():
+    # attitude.yaw is None until the first ATTITUDE message; the search then times its steps
+    yaw = vehicle.attitude.yaw if vehicle.attitude is not None else None
+    return math.degrees(yaw) % 360 if yaw is not None else None
+
+# === VELOCITY + YAW RATE ===
+def send_velocity_yaw_rate(velocity_x, velocity_y, velocity_z, yaw_rate):
+    vehicle.send_mavlink(encode_velocity_setpoint(vehicle, velocity_x, velocity_y, velocity_z, yaw_rate))
+    vehicle.flush()
+
 # === OBJECT DETECTION + DRONE INTERACTION ===
 def detect_and_hover():
-    cap = cv2.VideoCapture()
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, IMAGE_WIDTH_PX)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, IMAGE_HEIGHT_PX)
+    model = model_registry.get_model(MODEL_PATH)
+    cap = LatestFrameCapture(0, IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX)
 
-    # === Calculate camera FOV from parameters ===
-    horizontal_fov_deg = 2 * math.degrees(math.atan((SENSOR_WIDTH_MM / 2) / FOCAL_LENGTH_MM))
-    vertical_fov_deg = 2 * math.degrees(math.atan((SENSOR_HEIGHT_MM / 2) / FOCAL_LENGTH_MM))
+    # === Camera FOV from parameters ===
+    horizontal_fov_deg = camera.horizontal_fov_deg
+    vertical_fov_deg = camera.vertical_fov_deg
     print(f"Calculated horizontal FOV: {horizontal_fov_deg:.2f} degrees")
     print(f"Calculated vertical FOV: {vertical_fov_deg:.2f} degrees")
 
-    yaw_angle = 0
+    # FOV-sized yaw steps; a step is done when the attitude reaches its heading
+    search = SearchScheduler(YawSweep(horizontal_fov_deg), condition_yaw, heading)
     detected = False
+    last_step = None
+    servo = VisualServoController(IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX, target_distance_cm=STANDOFF_DISTANCE_CM,
+                                  approach_axis="x")
+    tracking = False
+    # Every sighting goes into a georeferenced map, repeated ones are merged
+    fruit_map = FruitMap()
 
     while True:
         ret, frame = cap.read()
@@ -111,48 +132,55 @@ def detect_and_hover():
         boxes = results.boxes
 
         if boxes is None or len(boxes.xyxy) == 0:
-            print("No objects detected.")
-            yaw_angle += int(horizontal_fov_deg / 2) - 5
-            yaw_angle = yaw_angle % 360
-            print(f"Rotating to yaw angle: {yaw_angle}")
-            condition_yaw(yaw_angle)
-            time.sleep(4)
+            if tracking:
+                # Target lost: stop and resume the search
+                servo.reset()
+                send_velocity_yaw_rate(0, 0, 0, 0)
+                tracking = False
+            # Detection keeps running on every frame while the vehicle turns
+            step = search.update()
+            if search.done:
+                print("Full circle searched:", search.stats())
+                search.reset()
+            elif step is not None and step[1] != last_step:
+                print(f"No objects detected. Rotating to yaw angle: {step[1]:.0f}")
+                last_step = step[1]
         else:
-            bboxes = boxes.xyxy.cpu()
-            confs = boxes.conf.cpu()
-            clses = boxes.cls.cpu()
-
-            for i, box in enumerate(bboxes):
-                x1, y1, x2, y2 = box.int().tolist()
-                bbox_width = x2 - x1
-                bbox_height = y2 - y1
-                conf = confs[i].item()
-                dist_cm = estimate_distance(FOCAL_LENGTH_MM, REAL_FRUIT_WIDTH_CM, bbox_width, IMAGE_WIDTH_PX, SENSOR_WIDTH_MM)
-                height_cm = estimate_height_difference(FOCAL_LENGTH_MM, REAL_FRUIT_HEIGHT_CM, bbox_height, IMAGE_HEIGHT_PX, SENSOR_HEIGHT_MM)
+            estimates = camera.estimate(boxes)
+            location = vehicle.location.global_relative_frame
+            attitude = vehicle.attitude
+            # Sightings can only be placed once position and attitude have arrived
+            if location.lat is not None and attitude.yaw is not None:
+                fruit_map.add_estimates((location.lat, location.lon, location.alt), math.degrees(attitude.yaw),
+                                        math.degrees(attitude.pitch), estimates, min_conf=0.5)
+
+            # Estimates are in undistorted pixels when a calibration exists; the frame is
+            # not undistorted, so boxes are drawn from the raw detections
+            raw_boxes = boxes.xyxy.cpu().numpy()
+            for raw, est in zip(raw_boxes, estimates):
+                x1, y1, x2, y2 = map(int, raw[:4])
+                conf = float(est["conf"])
+                dist_cm = float(est["distance_cm"])
+                height_cm = float(est["height_cm"])
 
                 label = f"Conf: {conf:.2f} | Dist: {dist_cm:.1f}cm | Height Diff: {height_cm:.1f}cm"
                 cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
                 cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
 
                 if conf > 0.6:
-                    print(f"Fruit detected at ~{dist_cm:.1f}cm | Height difference: ~{height_cm:.1f}cm")
-                    bbox_center_x = (x1 + x2) // 2
-                    frame_center_x = IMAGE_WIDTH_PX // 2
-                    error = bbox_center_x - frame_center_x
-
-                    if abs(error) > 20:
-                        correction_angle = int((error / IMAGE_WIDTH_PX) * horizontal_fov_deg)
-                        print(f"Aligning yaw by {correction_angle} degrees")
-                        condition_yaw(correction_angle, relative=True)
-                        time.sleep(3)
-                    
-                    print("Switching to GUIDED mode to move forward toward object")
-                    vehicle.mode = VehicleMode("GUIDED")
-                    dist_m = dist_cm / 100.0
-                    forward_duration = int(dist_m / 0.25)  # Assuming 0.5 m/s forward speed
-                    send_ned_velocity(0.25, 0, 0, forward_duration)
-
-                    detected = True
+                    # Angle off the calibrated optical axis (principal point), not the image centre
+                    error = float(est["bearing_deg"])
+
+                    # Yaw, climb and forward speed from PID loops, refreshed every frame
+                    velocity_x, velocity_y, velocity_z, yaw_rate = servo.update(
+                        (est["x1"], est["y1"], est["x2"], est["y2"]), dist_cm)
+                    send_velocity_yaw_rate(velocity_x, velocity_y, velocity_z, yaw_rate)
+                    tracking = True
+
+                    if dist_cm <= STANDOFF_DISTANCE_CM and abs(error) <= ALIGN_TOLERANCE_DEG:
+                        print(f"Reached fruit at ~{dist_cm:.1f}cm | Height difference: ~{height_cm:.1f}cm")
+                        send_velocity_yaw_rate(0, 0, 0, 0)
+                        detected = True
                     break
 
         cv2.imshow("Live Feed", frame)
@@ -163,6 +191,9 @@ def detect_and_hover():
 
     cap.release()
     cv2.destroyAllWindows()
+    print("Fruit map:", fruit_map.stats())
+    print("Fruits per tree:", fruit_map.tree_counts())
+    print("Saved", fruit_map.save(FRUIT_MAP_FILE))
 
 
 # === EXECUTE FULL FLOW ===
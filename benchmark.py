@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+# === DEFAULTS ===
+DEFAULT_WEIGHTS = ["mango-final.pt"]
+DEFAULT_RESOLUTIONS = ["640x480"]
+# "copy" is the frame copy taken before annotating, frames come preloaded so disk
+# and camera reads are not part of the measurement
+STAGES = ["copy", "detect", "boxes", "track", "annotate", "write", "total"]
+# Metrics checked by --compare, higher is worse for all of them
+REGRESSION_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+# === FRAME SOURCES ===
+def synthetic_frames(width, height, count=120, seed=0):
+    """
+    Textured background with a few orange discs drifting across it, enough
+    for the detector to do real work without a recorded flight.
+    """
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 120, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+    centers = rng.uniform((0, 0), (width, height), (4, 2))
+    speeds = rng.uniform(-4, 4, (4, 2))
+    radius = max(8, min(width, height) // 16)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for (cx, cy), (vx, vy) in zip(centers, speeds):
+            x, y = int((cx + vx * i) % width), int((cy + vy * i) % height)
+            cv2.circle(frame, (x, y), radius, (0, 140, 255), -1)
+        frames.append(frame)
+    return frames
+
+def video_frames(path, width, height, count=120):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height))
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise IOError(f"No frames in {path}")
+    return frames
+
+
+# === MEASUREMENT ===
+def rss_mb():
+    """
+    Current resident set size of this process in MB (Linux), or the
+    peak so far where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def summarize(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    if samples.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(samples.max()),
+    }
+
+
+# === BENCHMARK ===
+def run_config(weights, width, height, frames, imgsz=None, warmup=5, memory_frames=20):
+    """
+    Runs every frame through the same steps as the track state: detection,
+    box extraction, tracking and target selection, the steering box loop with
+    its annotations, and the video writer. Returns latency percentiles per
+    step, throughput and memory peaks. The Python allocation peak comes from
+    a separate untimed pass over memory_frames frames, because tracing every
+    allocation would slow down the steps being timed.
+    """
+    import detection
+    import model_registry
+    import mot
+
+    detection.MODEL_PATH = weights
+    rss_before = rss_mb()
+    load_start = time.perf_counter()
+    model_registry.get_model(weights)
+    load_s = time.perf_counter() - load_start
+    for frame in frames[:warmup]:
+        detection.get_detections(frame, imgsz)
+
+    frame_center = (width // 2, height // 2)
+    video_path = os.path.join(tempfile.gettempdir(), f"benchmark_{os.getpid()}.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'XVID'), 20.0, (width, height))
+
+    def process(frame, fruit_tracker):
+        """
+        One frame through every step; returns the step boundaries and the number of boxes.
+        """
+        t0 = time.perf_counter()
+        frame = frame.copy()
+        t1 = time.perf_counter()
+        result = detection.get_detections(frame, imgsz)
+        t2 = time.perf_counter()
+        boxes = detection.boxes_array(result)
+        t3 = time.perf_counter()
+        tracks = fruit_tracker.update(boxes, timestamp=t3)
+        target = fruit_tracker.select_target(tracks, "nearest", frame_center)
+        t4 = time.perf_counter()
+        for box in boxes:
+            x1, y1, x2, y2 = map(int, box[:4])
+            box_center_x = (x1 + x2) // 2
+            offset_x = box_center_x - frame_center[0]
+            area = (x2 - x1) * (y2 - y1)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, str(area), (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA, False)
+            line_color = (255, 0, 0) if abs(offset_x) > 50 else (0, 255, 0)
+            cv2.line(frame, (box_center_x, y1), (box_center_x, y2), line_color, 2)
+        if target is not None:
+            cv2.putText(frame, f"id={int(target[6])}", (0, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 1)
+        t5 = time.perf_counter()
+        writer.write(frame)
+        t6 = time.perf_counter()
+        return (t0, t1, t2, t3, t4, t5, t6), len(boxes)
+
+    timings = {stage: [] for stage in STAGES}
+    detections = 0
+    rss_peak = rss_mb()
+    fruit_tracker = mot.MultiObjectTracker()
+    started = time.perf_counter()
+    for i in range(len(frames)):
+        (t0, t1, t2, t3, t4, t5, t6), count = process(frames[i], fruit_tracker)
+        for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5, t6 - t0)):
+            timings[stage].append(elapsed)
+        detections += count
+        if i % 10 == 0:
+            rss_peak = max(rss_peak, rss_mb())
+    elapsed = time.perf_counter() - started
+    rss_peak = max(rss_peak, rss_mb())
+
+    # Untimed pass for the Python allocation peak
+    tracemalloc.start()
+    fruit_tracker = mot.MultiObjectTracker()
+    for frame in frames[:memory_frames]:
+        process(frame, fruit_tracker)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    writer.release()
+    if os.path.exists(video_path):
+        os.remove(video_path)
+    model_registry.unload(weights)
+
+    return {
+        "weights": weights,
+        "resolution": f"{width}x{height}",
+        "imgsz": imgsz,
+        "frames": len(frames),
+        "fps": len(frames) / elapsed if elapsed > 0 else 0.0,
+        "detections_per_frame": detections / len(frames),
+        "load_s": load_s,
+        "rss_peak_mb": rss_peak,
+        "rss_growth_mb": rss_peak - rss_before,
+        "python_peak_mb": python_peak / (1024.0 * 1024.0),
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+    }
+
+
+# === ENVIRONMENT ===
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# === REGRESSION CHECK ===
+def _key(result):
+    return (result["weights"], result["resolution"], result["imgsz"])
+
+def compare(baseline, current, tolerance=0.15):
+    """
+    Lists every stage metric or fps that got worse than the baseline by
+    more than tolerance (relative).
+    """
+    regressions = []
+    previous = {_key(r): r for r in baseline["results"]}
+    for result in current["results"]:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        label = "{} {} imgsz={}".format(*_key(result))
+        if result["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{label}: fps {old['fps']:.1f} -> {result['fps']:.1f}")
+        for stage, stats in result["stages"].items():
+            old_stats = old["stages"].get(stage, {})
+            for metric in REGRESSION_METRICS:
+                if metric in stats and old_stats.get(metric) and stats[metric] > old_stats[metric] * (1 + tolerance):
+                    regressions.append(f"{label}: {stage} {metric} {old_stats[metric]:.1f} -> {stats[metric]:.1f}")
+    return regressions
+
+def print_table(results):
+    for result in results:
+        print(f"\n{result['weights']} @ {result['resolution']} imgsz={result['imgsz'] or 'default'}: "
+              f"{result['fps']:.1f} fps, RSS peak {result['rss_peak_mb']:.0f} MB, "
+              f"python peak {result['python_peak_mb']:.1f} MB")
+        for stage, s in result["stages"].items():
+            if s["count"]:
+                print(f" {stage:<10} p50 {s['p50_ms']:7.2f} ms | p95 {s['p95_ms']:7.2f} ms | p99 {s['p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark for the vision loop")
+    parser.add_argument("--weights", nargs="+", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, help="Frame sizes, e.g. 640x480 1280x720")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[0], help="Detector input sizes, 0 uses the model default")
+    parser.add_argument("--video", help="Recorded flight to use instead of synthetic frames")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--gpu", action="store_true", help="Allow CUDA, by default the benchmark runs on CPU")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="Baseline JSON, exits with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if not args.gpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.lower().split("x"))
+        if args.video:
+            frames = video_frames(args.video, width, height, args.frames)
+        else:
+            frames = synthetic_frames(width, height, args.frames)
+        for weights in args.weights:
+            for imgsz in args.imgsz:
+                print(f"Benchmarking {weights} at {resolution}, imgsz={imgsz or 'default'}...")
+                results.append(run_config(weights, width, height, frames, imgsz or None, args.warmup))
+
+    report = {"environment": environment(), "source": args.video or "synthetic", "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print("\nRegressions against", args.compare)
+            for line in regressions:
+                print(" " + line)
+            sys.exit(1)
+        print("\nNo regressions against", args.compare)
@@ -0,0 +1,245 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+# === STORAGE ===
+# One JSON file per camera and resolution, e.g. calibration/down_1920x1080.json,
+# with the undistortion maps cached next to it as .npz
+CALIBRATION_DIR = "calibration"
+
+
+def _base_path(camera, width, height, directory=CALIBRATION_DIR):
+    return os.path.join(directory, f"{camera}_{width}x{height}")
+
+
+# === INTRINSICS ===
+class Intrinsics:
+    """
+    Camera matrix and distortion coefficients for one camera at one resolution.
+    """
+
+    def __init__(self, camera, width, height, camera_matrix, dist_coeffs, rms=None, frames=None, created=None):
+        self.camera = camera
+        self.width = int(width)
+        self.height = int(height)
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).reshape(-1)
+        self.rms = rms
+        self.frames = frames
+        self.created = created or time.strftime("%Y-%m-%d %H:%M:%S")
+
+    @property
+    def fx(self):
+        return self.camera_matrix[0, 0]
+
+    @property
+    def fy(self):
+        return self.camera_matrix[1, 1]
+
+    @property
+    def cx(self):
+        return self.camera_matrix[0, 2]
+
+    @property
+    def cy(self):
+        return self.camera_matrix[1, 2]
+
+    def scaled(self, width, height):
+        """
+        The same lens at another capture resolution with the same aspect ratio.
+        Distortion coefficients are in normalized coordinates and carry over.
+        """
+        sx, sy = width / self.width, height / self.height
+        if abs(sx - sy) > 0.01:
+            raise ValueError(f"{self.width}x{self.height} calibration cannot be scaled to {width}x{height}")
+        matrix = self.camera_matrix.copy()
+        matrix[0, :] *= sx
+        matrix[1, :] *= sy
+        return Intrinsics(self.camera, width, height, matrix, self.dist_coeffs, self.rms, self.frames, self.created)
+
+    def fingerprint(self):
+        data = np.concatenate([self.camera_matrix.ravel(), self.dist_coeffs, [self.width, self.height]])
+        return hashlib.sha1(data.astype(np.float64).tobytes()).hexdigest()[:12]
+
+    def to_dict(self):
+        return {
+            "camera": self.camera,
+            "width": self.width,
+            "height": self.height,
+            "camera_matrix": self.camera_matrix.tolist(),
+            "dist_coeffs": self.dist_coeffs.tolist(),
+            "rms": self.rms,
+            "frames": self.frames,
+            "created": self.created,
+        }
+
+    def save(self, directory=CALIBRATION_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = _base_path(self.camera, self.width, self.height, directory) + ".json"
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def load_intrinsics(camera, width, height, directory=CALIBRATION_DIR):
+    """
+    Intrinsics for camera at width x height: the exact calibration if there is
+    one, otherwise another resolution of the same camera scaled to this one.
+    Returns None when the camera was never calibrated at this aspect ratio.
+    """
+    path = _base_path(camera, width, height, directory) + ".json"
+    if os.path.exists(path):
+        with open(path) as f:
+            return Intrinsics(**json.load(f))
+    for other in sorted(glob.glob(os.path.join(directory, f"{camera}_*x*.json"))):
+        with open(other) as f:
+            intrinsics = Intrinsics(**json.load(f))
+        try:
+            return intrinsics.scaled(width, height)
+        except ValueError:
+            continue
+    return None
+
+
+# === CALIBRATION ===
+def find_corners(frames, pattern=(9, 6), max_frames=40):
+    """
+    Checkerboard corners (inner corners, columns x rows) for the frames where
+    the whole board is visible, spread evenly over at most max_frames.
+    """
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    found = []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        ok, corners = cv2.findChessboardCorners(gray, pattern, cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE)
+        if ok:
+            found.append(cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria))
+    if len(found) > max_frames:
+        found = [found[i] for i in np.linspace(0, len(found) - 1, max_frames).astype(int)]
+    return found
+
+def calibrate(camera, frames, pattern=(9, 6), square_mm=25.0, max_frames=40):
+    """
+    Calibrates from checkerboard frames and returns Intrinsics at the frames' resolution.
+    """
+    frames = list(frames)
+    if not frames:
+        raise ValueError("No frames to calibrate from")
+    height, width = frames[0].shape[:2]
+    image_corners = find_corners(frames, pattern, max_frames)
+    if len(image_corners) < 5:
+        raise ValueError(f"Checkerboard found in only {len(image_corners)} frames, need at least 5")
+
+    board = np.zeros((pattern[0] * pattern[1], 3), np.float32)
+    board[:, :2] = np.mgrid[0:pattern[0], 0:pattern[1]].T.reshape(-1, 2) * square_mm
+    rms, matrix, dist, _, _ = cv2.calibrateCamera([board] * len(image_corners), image_corners,
+                                                  (width, height), None, None)
+    return Intrinsics(camera, width, height, matrix, dist, float(rms), len(image_corners))
+
+def sample_video(path, every=10):
+    cap = cv2.VideoCapture(path)
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % every == 0:
+            yield frame
+        index += 1
+    cap.release()
+
+
+# === UNDISTORTION ===
+class Undistorter:
+    """
+    Precomputed initUndistortRectifyMap tables for one camera and resolution,
+    cached to disk so later runs load them instead of recomputing. Frames are
+    undistorted with a single remap; boxes can be corrected on their corners
+    only, which is far cheaper than remapping the whole frame.
+    """
+
+    def __init__(self, intrinsics, directory=CALIBRATION_DIR):
+        self.intrinsics = intrinsics
+        self.camera_matrix = intrinsics.camera_matrix
+        self.dist_coeffs = intrinsics.dist_coeffs
+        self.size = (intrinsics.width, intrinsics.height)
+        self.map1, self.map2 = self._load_maps(directory)
+
+    def _load_maps(self, directory):
+        path = _base_path(self.intrinsics.camera, *self.size, directory) + ".maps.npz"
+        fingerprint = self.intrinsics.fingerprint()
+        if os.path.exists(path):
+            cached = np.load(path)
+            if str(cached["fingerprint"]) == fingerprint:
+                return cached["map1"], cached["map2"]
+        # Fixed-point maps make remap noticeably faster than float maps
+        map1, map2 = cv2.initUndistortRectifyMap(self.camera_matrix, self.dist_coeffs, None,
+                                                 self.camera_matrix, self.size, cv2.CV_16SC2)
+        os.makedirs(directory, exist_ok=True)
+        np.savez(path, map1=map1, map2=map2, fingerprint=fingerprint)
+        return map1, map2
+
+    def undistort(self, frame):
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR)
+
+    def undistort_points(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return points.reshape(0, 2)
+        return cv2.undistortPoints(points, self.camera_matrix, self.dist_coeffs,
+                                   P=self.camera_matrix).reshape(-1, 2)
+
+    def undistort_boxes(self, xyxy):
+        """
+        (N, 4) boxes in the raw image -> axis-aligned boxes around their
+        undistorted corners, in pixels of the same camera matrix.
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        corners = xyxy[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 2)
+        corners = self.undistort_points(corners).reshape(-1, 4, 2)
+        return np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+
+
+def load_camera_model(camera, width, height, directory=CALIBRATION_DIR, **camera_kwargs):
+    """
+    CameraModel for camera at width x height, using the stored calibration
+    (with box undistortion) when available and the datasheet values otherwise.
+    """
+    from camera_model import CameraModel
+    intrinsics = load_intrinsics(camera, width, height, directory)
+    if intrinsics is None:
+        print(f"No calibration for camera '{camera}' at {width}x{height}, using datasheet intrinsics")
+        return CameraModel(width, height, **camera_kwargs)
+    return CameraModel(width, height, intrinsics=intrinsics,
+                       undistorter=Undistorter(intrinsics, directory), **camera_kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkerboard calibration from recorded frames")
+    parser.add_argument("camera", help="Camera name, e.g. forward or down")
+    parser.add_argument("inputs", nargs="+", help="Video files or images of the checkerboard")
+    parser.add_argument("--pattern", default="9x6", help="Inner corners, columns x rows")
+    parser.add_argument("--square", type=float, default=25.0, help="Square size in mm")
+    parser.add_argument("--every", type=int, default=10, help="Use every n-th video frame")
+    parser.add_argument("--dir", default=CALIBRATION_DIR)
+    args = parser.parse_args()
+
+    def frames():
+        for path in args.inputs:
+            if os.path.splitext(path)[1].lower() in (".png", ".jpg", ".jpeg", ".bmp"):
+                yield cv2.imread(path)
+            else:
+                yield from sample_video(path, args.every)
+
+    pattern = tuple(int(n) for n in args.pattern.lower().split("x"))
+    intrinsics = calibrate(args.camera, frames(), pattern, args.square)
+    print(f"Calibrated {args.camera} at {intrinsics.width}x{intrinsics.height} from {intrinsics.frames} frames, "
+          f"RMS reprojection error {intrinsics.rms:.3f}px")
+    print("Saved", intrinsics.save(args.dir))
+    Undistorter(intrinsics, args.dir)
+    print("Undistortion maps cached")
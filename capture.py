@@ -0,0 +1,211 @@
+import cv2
+import numpy as np
+import threading
+import time
+
+
+# === LATEST-FRAME CAPTURE ===
+class LatestFrameCapture:
+    """
+    Wraps cv2.VideoCapture with a background grabber thread that keeps only
+    the newest frame. Readers never see a frame older than the last grab, so
+    the vision loop steers on what the camera sees now rather than on frames
+    that queued up in the driver while model.predict was running.
+    """
+
+    def __init__(self, source=0, width=None, height=None, start=True):
+        self.cap = cv2.VideoCapture(source)
+        if width is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Keep the driver queue as short as the backend allows
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.frame = None
+        self.timestamp = 0.0
+        self.seq = 0
+        self.frames_grabbed = 0
+        self.frames_dropped = 0
+        self.last_read_seq = 0
+
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.running = False
+        self.thread = None
+        if start:
+            self.start()
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def _grab_loop(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            timestamp = time.time()
+            if not ret:
+                time.sleep(0.005)
+                continue
+            with self.lock:
+                # A frame nobody read before this one replaced it is a dropped frame
+                if self.seq > self.last_read_seq:
+                    self.frames_dropped += 1
+                self.frame = frame
+                self.timestamp = timestamp
+                self.seq += 1
+                self.frames_grabbed += 1
+                self.new_frame.notify_all()
+
+    def read_latest(self, timeout=1.0, wait_new=True):
+        """
+        Returns (ret, frame, timestamp, seq) for the newest frame.
+        With wait_new the call blocks until a frame newer than the last one
+        returned is available, so callers never process the same frame twice.
+        """
+        with self.lock:
+            if wait_new:
+                deadline = time.time() + timeout
+                while self.running and self.seq <= self.last_read_seq:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.new_frame.wait(remaining)
+            if self.frame is None or (wait_new and self.seq <= self.last_read_seq):
+                return False, None, 0.0, self.seq
+            self.last_read_seq = self.seq
+            return True, self.frame, self.timestamp, self.seq
+
+    def read(self):
+        """
+        Drop-in replacement for cv2.VideoCapture.read().
+        """
+        ret, frame, _, _ = self.read_latest()
+        return ret, frame
+
+    def stats(self):
+        with self.lock:
+            return {
+                "grabbed": self.frames_grabbed,
+                "dropped": self.frames_dropped,
+                "last_timestamp": self.timestamp,
+                "age": time.time() - self.timestamp if self.timestamp else None,
+            }
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.running = False
+        with self.lock:
+            self.new_frame.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.cap.release()
+
+
+# === LETTERBOX ===
+def _box_copy(boxes):
+    boxes = np.array(boxes, dtype=np.float32)
+    return boxes.reshape(len(boxes), -1) if boxes.size else boxes.reshape(0, 4)
+
+class Letterbox:
+    """
+    Scale and padding used to fit a full-resolution frame into a square
+    inference frame, and the inverse mapping for boxes found in it.
+    """
+
+    def __init__(self, full_width, full_height, size):
+        self.full_width = full_width
+        self.full_height = full_height
+        self.size = size
+        self.scale = min(size / full_width, size / full_height)
+        self.new_width = int(round(full_width * self.scale))
+        self.new_height = int(round(full_height * self.scale))
+        self.pad_x = (size - self.new_width) // 2
+        self.pad_y = (size - self.new_height) // 2
+
+    def apply(self, frame):
+        resized = cv2.resize(frame, (self.new_width, self.new_height), interpolation=cv2.INTER_AREA)
+        return cv2.copyMakeBorder(resized, self.pad_y, self.size - self.new_height - self.pad_y,
+                                  self.pad_x, self.size - self.new_width - self.pad_x,
+                                  cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+    def to_full(self, boxes):
+        """
+        (N, 4+) boxes in inference-frame pixels -> full-resolution pixels.
+        Extra columns (conf, cls, track id) are passed through.
+        """
+        boxes = _box_copy(boxes)
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - self.pad_x) / self.scale).clip(0, self.full_width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - self.pad_y) / self.scale).clip(0, self.full_height)
+        return boxes
+
+    def to_inference(self, boxes):
+        boxes = _box_copy(boxes)
+        boxes[:, [0, 2]] = boxes[:, [0, 2]] * self.scale + self.pad_x
+        boxes[:, [1, 3]] = boxes[:, [1, 3]] * self.scale + self.pad_y
+        return boxes
+
+
+def crop(frame, box, margin=0.2):
+    """
+    View (no copy) of frame around box, grown by margin of the box size on each side.
+    """
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = box[:4]
+    mx, my = (x2 - x1) * margin, (y2 - y1) * margin
+    x1, y1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+    x2, y2 = min(w, int(x2 + mx)), min(h, int(y2 + my))
+    return frame[y1:y2, x1:x2]
+
+
+# === DUAL-RESOLUTION CAPTURE ===
+class DualResolutionCapture(LatestFrameCapture):
+    """
+    Captures at full resolution (e.g. 3840x2160) for recording and hands out
+    a letterboxed inference_size x inference_size frame for detection. Both
+    come from the same grabbed buffer: the full frame is shared, not copied,
+    and the small frame is only computed for frames that are actually read.
+    Boxes found on the small frame map back with letterbox.to_full().
+    """
+
+    def __init__(self, source=0, width=3840, height=2160, inference_size=640, start=True):
+        super().__init__(source, width, height, start=False)
+        self.inference_size = inference_size
+        full_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or width
+        full_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height
+        self.letterbox = Letterbox(full_width, full_height, inference_size)
+        if start:
+            self.start()
+
+    def read_pair(self, timeout=1.0, wait_new=True):
+        """
+        Returns (ret, full_frame, inference_frame, timestamp, seq). The full
+        frame must be treated as read-only: it is the buffer shared with
+        every other reader of this frame.
+        """
+        ret, frame, timestamp, seq = super().read_latest(timeout, wait_new)
+        if not ret:
+            return False, None, None, timestamp, seq
+        if frame.shape[1] != self.letterbox.full_width or frame.shape[0] != self.letterbox.full_height:
+            # The driver picked another mode than it reported
+            self.letterbox = Letterbox(frame.shape[1], frame.shape[0], self.inference_size)
+        return True, frame, self.letterbox.apply(frame), timestamp, seq
+
+    def read_latest(self, timeout=1.0, wait_new=True):
+        """
+        Same contract as LatestFrameCapture.read_latest(), returning the inference frame.
+        """
+        ret, _, small, timestamp, seq = self.read_pair(timeout, wait_new)
+        return ret, small, timestamp, seq
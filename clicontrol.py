@@ -1,11 +1,20 @@
 from dronekit import connect, VehicleMode, LocationGlobalRelative, Command
 import time
 import cv2
-from ultralytics import YOLO
+import model_registry
+import detection
+import mot
+from telemetry import TelemetryCache
+from stream_rates import StreamRateManager
 import math
 from pymavlink import mavutil
 import threading
 import keyboard
+from capture import LatestFrameCapture
+import calibration
+from search_scheduler import SearchScheduler, YawSweep
+from command_dispatcher import encode_position_setpoint
+from harvest_queue import HarvestQueue, fruit_position, standoff_point
 
 # === CONFIGURATION ===
 MODEL_PATH = 'distant.pt'
@@ -16,31 +25,37 @@ SENSOR_WIDTH_MM = 4.8
 SENSOR_HEIGHT_MM = 3.6
 IMAGE_WIDTH_PX = 640
 IMAGE_HEIGHT_PX = 480
+SEARCH_YAW_SPEED = 30  # deg/s
+CAMERA_NAME = 'forward'
+HARVEST_STANDOFF_M = 1.0  # tour waypoints stop this far short of each fruit
+HARVEST_GAP_M = 0.3  # the creep from the waypoint stops this far from the fruit
+CREEP_SPEED = 0.25  # m/s
+POSITION_TOLERANCE_M = 0.3
 
 # === GLOBAL STATE ===
 vehicle = None
+telemetry = None
+stream_rates = None
 horizontal_fov_deg = None
 vertical_fov_deg = None
 altitude_to_fly = 10
-model = YOLO(MODEL_PATH)
-model.fuse()
 connected = False
 armed = False
 search_flag = False
 
 # === DISTANCE ESTIMATION ===
-def estimate_distance(focal_length_mm, real_width_cm, bbox_width_px, image_width_px, sensor_width_mm):
-    if bbox_width_px == 0:
-        return float('inf')
-    focal_px = (focal_length_mm / sensor_width_mm) * image_width_px
-    return (real_width_cm * focal_px) / bbox_width_px
+# Uses the checkerboard calibration for this camera and resolution when there is one
+camera = calibration.load_camera_model(CAMERA_NAME, IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX,
+                                       focal_length_mm=FOCAL_LENGTH_MM, sensor_width_mm=SENSOR_WIDTH_MM,
+                                       sensor_height_mm=SENSOR_HEIGHT_MM, real_width_cm=REAL_FRUIT_WIDTH_CM,
+                                       real_height_cm=REAL_FRUIT_HEIGHT_CM)
 
 # === YAW ROTATION FUNCTION ===
-def condition_yaw(heading, relative=False):
+def condition_yaw(heading, relative=False, speed=0.5):
     is_relative = 1 if relative else 0
     msg = vehicle.message_factory.command_long_encode(
         0, 0, mavutil.mavlink.MAV_CMD_CONDITION_YAW,
-        0, heading, 0.5, 1, is_relative, 0, 0, 0
+        0, heading, speed, 1, is_relative, 0, 0, 0
     )
     vehicle.send_mavlink(msg)
     vehicle.flush()
@@ -72,35 +87,105 @@ def arm(altitude = 10):
     print("Arming motors...")
     vehicle.mode = VehicleMode("GUIDED")
     vehicle.armed = True
-    while not vehicle.armed:
-        print(" Waiting for arming...")
-        time.sleep(1)
+    print(" Waiting for arming...")
+    telemetry.wait_for_armed()
     armed = True
     print("Armed.")
 
     print(f"Taking off to {altitude}m")
+    stream_rates.set_state("takeoff")
     vehicle.simple_takeoff(altitude)
-    while True:
-        print(f" Altitude: {vehicle.location.global_relative_frame.alt:.2f}m")
-        if vehicle.location.global_relative_frame.alt >= altitude * 0.95:
-            print("Reached target altitude")
-            break
-        time.sleep(1)
+    telemetry.wait_for_altitude(altitude)
+    print(f" Altitude: {telemetry.altitude:.2f}m")
+    print("Reached target altitude")
 
+    stream_rates.set_state("search")
     search_flag = True  # Begin search loop
 
+# === HARVEST TOUR ===
+def local_pose():
+    """
+    (north, east, down, heading_deg) from the EKF, or None before it has a local position.
+    """
+    frame = telemetry.get("location.local_frame")
+    attitude = telemetry.attitude
+    if frame is None or frame.north is None or attitude is None:
+        return None
+    return frame.north, frame.east, frame.down, math.degrees(attitude.yaw) % 360
+
+def goto_local(position, timeout=30):
+    vehicle.send_mavlink(encode_position_setpoint(vehicle, *position))
+    vehicle.flush()
+
+    def reached(t):
+        frame = t.get("location.local_frame")
+        return frame is not None and frame.north is not None and \
+            math.dist((frame.north, frame.east, frame.down), position) <= POSITION_TOLERANCE_M
+    return telemetry.wait_until(reached, timeout)
+
+def wait_for_heading(heading, tolerance=5, timeout=10):
+    return telemetry.wait_until(lambda t: t.attitude is not None and
+                                abs((math.degrees(t.attitude.yaw) - heading + 180) % 360 - 180) <= tolerance, timeout)
+
+def fly_tour(harvest, fruit_tracker, pose):
+    """
+    Visits every queued fruit in tour order starting from pose: fly to its
+    stand-off point, face it, creep in to HARVEST_GAP_M, back out, then on
+    to the next one.
+    """
+    tour = harvest.plan(pose[:3])
+    print(f"Harvest tour of {len(tour)} fruits:", harvest.stats())
+    stream_rates.set_state("track")
+
+    target = harvest.next()
+    while target is not None:
+        start = local_pose() or pose
+        standoff, heading = standoff_point(start[:3], target.position, HARVEST_STANDOFF_M)
+        print(f"Flying to fruit {target.id} at n={target.position[0]:.1f} e={target.position[1]:.1f}")
+        if not goto_local(standoff):
+            print(" Stand-off point not reached, approaching from here")
+        condition_yaw(heading, speed=SEARCH_YAW_SPEED)
+        wait_for_heading(heading)
+
+        # Creep only the distance actually left, the waypoint may not have been reached
+        # or the vehicle may already have been inside the stand-off
+        here = local_pose() or standoff
+        creep_m = math.dist(here[:3], target.position) - HARVEST_GAP_M
+        print(f"Moving toward object... Estimated distance: {(creep_m + HARVEST_GAP_M) * 100:.1f} cm")
+        if creep_m > 0:
+            send_ned_velocity(CREEP_SPEED, 0, 0, int(creep_m / CREEP_SPEED))
+        goto_local(standoff)
+
+        harvest.mark_visited(target)
+        for track_id in target.track_ids:
+            fruit_tracker.mark_visited(track_id)
+        target = harvest.next()
+
+    print("Returning to base height...")
+    vehicle.simple_goto(LocationGlobalRelative(vehicle.location.global_frame.lat, vehicle.location.global_frame.lon, altitude_to_fly))
+    telemetry.wait_for_altitude(altitude_to_fly, tolerance=0.3)
+    print(f" Current Altitude: {telemetry.altitude:.2f}")
+    stream_rates.set_state("search")
+    print("Tour done:", harvest.stats())
+
 # === DETECTION FUNCTION ===
 def detect_loop():
     global horizontal_fov_deg, vertical_fov_deg, search_flag
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, IMAGE_WIDTH_PX)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, IMAGE_HEIGHT_PX)
+    model = model_registry.get_model(MODEL_PATH)
+    cap = LatestFrameCapture(0, IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX)
 
-    horizontal_fov_deg = 2 * math.degrees(math.atan((SENSOR_WIDTH_MM / 2) / FOCAL_LENGTH_MM))
-    vertical_fov_deg = 2 * math.degrees(math.atan((SENSOR_HEIGHT_MM / 2) / FOCAL_LENGTH_MM))
+    horizontal_fov_deg = camera.horizontal_fov_deg
+    vertical_fov_deg = camera.vertical_fov_deg
     print(f"Calculated FOV: H={horizontal_fov_deg:.2f}°, V={vertical_fov_deg:.2f}°")
 
-    yaw_angle = 0
+    search = SearchScheduler(YawSweep(horizontal_fov_deg), lambda heading: condition_yaw(heading, speed=SEARCH_YAW_SPEED),
+                             lambda: math.degrees(telemetry.attitude.yaw) if telemetry.attitude else None,
+                             yaw_speed=SEARCH_YAW_SPEED)
+    # Stable IDs per fruit so each one is approached once
+    fruit_tracker = mot.MultiObjectTracker()
+    # Fruits found during one full sweep, visited in a single tour afterwards
+    harvest = HarvestQueue()
+    last_pose = None
 
     while True:
         ret, frame = cap.read()
@@ -108,47 +193,29 @@ def detect_loop():
             print("Camera error.")
             break
 
-        results = model.predict(source=frame, conf=0.5, verbose=False)[0]
-        boxes = results.boxes
+        results = model.predict(source=frame, conf=0.5, verbose=False)
+        tracks = fruit_tracker.update(detection.boxes_array(results))
 
         if search_flag and connected and armed:
-            print("Waiting 3 seconds before searching for fruit...")
-            time.sleep(3)
-
-            if boxes is None or len(boxes.xyxy) == 0:
-                yaw_angle += int(horizontal_fov_deg / 2) - 5
-                yaw_angle = yaw_angle % 360
-                print(f"No object. Rotating yaw to: {yaw_angle}")
-                condition_yaw(yaw_angle)
-                time.sleep(3)
-            else:
-                for i, box in enumerate(boxes.xyxy.cpu()):
-                    x1, y1, x2, y2 = box.int().tolist()
-                    bbox_width = x2 - x1
-                    bbox_center_x = (x1 + x2) // 2
-                    frame_center_x = IMAGE_WIDTH_PX // 2
-                    error = bbox_center_x - frame_center_x
-
-                    dist_cm = estimate_distance(FOCAL_LENGTH_MM, REAL_FRUIT_WIDTH_CM, bbox_width, IMAGE_WIDTH_PX, SENSOR_WIDTH_MM)
-
-                    if abs(error) > 20:
-                        correction = int((error / IMAGE_WIDTH_PX) * horizontal_fov_deg)
-                        print(f"Aligning yaw by {correction} degrees")
-                        condition_yaw(correction, relative=True)
-                        time.sleep(3)
-
-                    print(f"Moving toward object... Estimated distance: {dist_cm:.1f} cm")
-                    dist_m = dist_cm / 100.0
-                    send_ned_velocity(0.25, 0, 0, int(dist_m / 0.25))
-
-                    print("Returning to base height...")
-                    vehicle.simple_goto(LocationGlobalRelative(vehicle.location.global_frame.lat, vehicle.location.global_frame.lon, altitude_to_fly))
-                    while abs(vehicle.location.global_relative_frame.alt - altitude_to_fly) > 0.3:
-                        print(f" Current Altitude: {vehicle.location.global_relative_frame.alt:.2f}")
-                        time.sleep(3)
-
-                    print("Ready to search again.")
-                    break
+            # Non-blocking: frames keep being processed while the vehicle turns
+            search.update()
+            pose = local_pose()
+            last_pose = pose or last_pose
+            if pose is not None and len(tracks):
+                # Every fruit in view goes into the local-frame queue instead of being approached now
+                estimates = camera.estimate(tracks[:, :6])
+                for track, est in zip(tracks, estimates):
+                    record = fruit_tracker.registry.get(int(track[6]))
+                    if record is None or not record.visited:
+                        harvest.add(int(track[6]), fruit_position(pose, float(est["bearing_deg"]),
+                                                                  float(est["elevation_deg"]),
+                                                                  float(est["distance_cm"]) / 100.0))
+            if search.done:
+                print("Full circle searched:", search.stats())
+                if len(harvest) and last_pose is not None:
+                    fly_tour(harvest, fruit_tracker, pose or last_pose)
+                harvest.clear()
+                search.reset()
 
         cv2.imshow("Live Feed", frame)
         key = cv2.waitKey(1) & 0xFF
@@ -160,12 +227,15 @@ def detect_loop():
 
 # === KEYBOARD CLI FUNCTIONS ===
 def cli_control():
-    global vehicle, connected
+    global vehicle, connected, telemetry, stream_rates
     print("Commands:\n'd' = connect to drone\n'm' = arm + takeoff\n'q' = quit")
     while True:
         if keyboard.is_pressed('d') and not connected:
             print("Connecting to drone...")
             vehicle = connect('tcp:127.0.0.1:5762', wait_ready=True)
+            telemetry = TelemetryCache(vehicle).attach()
+            stream_rates = StreamRateManager(vehicle, 57600)
+            stream_rates.set_state("idle")
             connected = True
             print("Connected.")
             time.sleep(1)
@@ -188,6 +258,7 @@ def cli_control():
         time.sleep(3)
 
 # === MAIN ===
+model_registry.warmup_async(MODEL_PATH)
 th_cli = threading.Thread(target=cli_control)
 th_cli.start()
 detect_loop()
@@ -0,0 +1,170 @@
+import threading
+import time
+from pymavlink import mavutil
+
+# Velocity-only type mask for SET_POSITION_TARGET_LOCAL_NED (ignore position, accel, yaw)
+VELOCITY_TYPE_MASK = 0b0000111111000111
+# Velocity + yaw rate (ignore position, accel and absolute yaw)
+VELOCITY_YAW_RATE_TYPE_MASK = 0b0000010111000111
+# Position only (ignore velocity, accel, yaw and yaw rate)
+POSITION_TYPE_MASK = 0b0000110111111000
+
+
+def encode_velocity_setpoint(vehicle, velocity_x, velocity_y, velocity_z, yaw_rate=None):
+    """
+    Body-frame velocity (m/s) and, if given, yaw rate (rad/s, positive clockwise)
+    as a single SET_POSITION_TARGET_LOCAL_NED message.
+    """
+    type_mask = VELOCITY_TYPE_MASK if yaw_rate is None else VELOCITY_YAW_RATE_TYPE_MASK
+    return vehicle.message_factory.set_position_target_local_ned_encode(
+        0, 0, 0, mavutil.mavlink.MAV_FRAME_BODY_NED,
+        type_mask,
+        0, 0, 0,
+        velocity_x, velocity_y, velocity_z,
+        0, 0, 0,
+        0, yaw_rate or 0)
+
+
+def encode_position_setpoint(vehicle, north, east, down):
+    """
+    Local NED position (m from the EKF origin) as a SET_POSITION_TARGET_LOCAL_NED message.
+    """
+    return vehicle.message_factory.set_position_target_local_ned_encode(
+        0, 0, 0, mavutil.mavlink.MAV_FRAME_LOCAL_NED,
+        POSITION_TYPE_MASK,
+        north, east, down,
+        0, 0, 0,
+        0, 0, 0,
+        0, 0)
+
+
+# === COMMAND DISPATCHER ===
+class CommandDispatcher:
+    """
+    Owns the outbound MAVLink link on its own thread. The vision loop only
+    records setpoints (latest value wins per axis) and returns immediately;
+    the dispatcher streams the current velocity setpoint at a fixed rate,
+    which is what ArduPilot expects in GUIDED velocity control, and sends
+    each new yaw request once.
+
+    If no velocity request arrives for stale_after seconds the dispatcher
+    sends a single zero setpoint and stops streaming.
+    """
+
+    def __init__(self, vehicle, rate_hz=10, stale_after=1.0):
+        self.vehicle = vehicle
+        self.period = 1.0 / rate_hz
+        self.stale_after = stale_after
+
+        self.lock = threading.Lock()
+        self.velocity = None  # [vx, vy, vz] in body frame, m/s
+        self.velocity_updated = 0.0
+        self.velocity_dirty = False
+        self.yaw_rate = None  # rad/s, None leaves yaw to CONDITION_YAW
+        self.yaw = None  # pending (heading, speed, direction, relative)
+        self.oneshot = []  # already encoded messages to send next tick
+
+        self.requested = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2 * self.period + 0.5)
+
+    # === REQUESTS (called from the vision thread, never block) ===
+    def set_velocity(self, vx=None, vy=None, vz=None, yaw_rate=None):
+        with self.lock:
+            self.requested += 1
+            if self.velocity_dirty:
+                self.coalesced += 1
+            self.velocity_dirty = True
+            if self.velocity is None:
+                self.velocity = [0.0, 0.0, 0.0]
+            for axis, value in enumerate((vx, vy, vz)):
+                if value is not None:
+                    self.velocity[axis] = float(value)
+            if yaw_rate is not None:
+                self.yaw_rate = float(yaw_rate)
+            self.velocity_updated = time.time()
+
+    def stop_velocity(self):
+        """
+        Sends one zero setpoint on the next tick and stops streaming, so a
+        following CONDITION_YAW or position target is not overridden.
+        """
+        with self.lock:
+            if self.velocity is not None:
+                self.velocity_updated = float("-inf")
+
+    def set_yaw(self, heading, speed=0, direction=1, relative=True):
+        with self.lock:
+            self.requested += 1
+            if self.yaw is not None:
+                self.coalesced += 1
+            self.yaw = (heading, speed, direction, 1 if relative else 0)
+
+    def send(self, msg):
+        """
+        Queues an already encoded message to go out on the next tick.
+        """
+        with self.lock:
+            self.requested += 1
+            self.oneshot.append(msg)
+
+    # === DISPATCH LOOP ===
+    def _run(self):
+        next_tick = time.time()
+        while self.running:
+            self._tick()
+            next_tick += self.period
+            delay = next_tick - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.time()
+
+    def _tick(self):
+        factory = self.vehicle.message_factory
+        with self.lock:
+            velocity = list(self.velocity) if self.velocity is not None else None
+            yaw_rate = self.yaw_rate
+            self.velocity_dirty = False
+            if velocity is not None and time.time() - self.velocity_updated > self.stale_after:
+                velocity = [0.0, 0.0, 0.0]
+                yaw_rate = 0.0 if yaw_rate is not None else None
+                self.velocity = None
+                self.yaw_rate = None
+            yaw, self.yaw = self.yaw, None
+            oneshot, self.oneshot = self.oneshot, []
+
+        messages = list(oneshot)
+        if velocity is not None:
+            messages.append(encode_velocity_setpoint(self.vehicle, *velocity, yaw_rate=yaw_rate))
+        if yaw is not None:
+            heading, speed, direction, relative = yaw
+            messages.append(factory.command_long_encode(
+                0, 0, mavutil.mavlink.MAV_CMD_CONDITION_YAW, 0,
+                heading, speed, direction, relative, 0, 0, 0))
+
+        if not messages:
+            return
+        for msg in messages:
+            self.vehicle.send_mavlink(msg)
+        self.vehicle.flush()
+        self.sent += len(messages)
+
+    def stats(self):
+        with self.lock:
+            return {"requested": self.requested, "sent": self.sent, "coalesced": self.coalesced}
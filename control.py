@@ -1,42 +1,70 @@
 from dronekit import *
 from pymavlink import mavutil
+import math
+from command_dispatcher import CommandDispatcher, encode_velocity_setpoint, encode_position_setpoint
+from telemetry import TelemetryCache
+from stream_rates import StreamRateManager
 
 vehicle = None
+dispatcher = None
+telemetry = None
+stream_rates = None
+recorder = None  # optional FlightRecorder logging every movement command
+
+def _record(name, **fields):
+    if recorder is not None:
+        recorder.log_command(name, **fields)
 
 # Connect to the Vehicle (in this case a UDP endpoint)
 def connect_drone(connection_string, waitready=True, baudrate=57600):
-    global vehicle
+    global vehicle, telemetry, stream_rates
     if vehicle == None:
         vehicle = connect(connection_string, wait_ready=waitready, baud=baudrate)
+        telemetry = TelemetryCache(vehicle).attach()
+        stream_rates = StreamRateManager(vehicle, baudrate)
+        stream_rates.apply("idle")
     print("drone connected")
 
+def start_dispatcher(rate_hz=10):
+    """
+    Routes movement commands through a background sender streaming at rate_hz.
+    """
+    global dispatcher
+    if dispatcher is None:
+        dispatcher = CommandDispatcher(vehicle, rate_hz).start()
+        if stream_rates is not None:
+            stream_rates.send = dispatcher.send
+    return dispatcher
+
+def set_flight_state(state):
+    """
+    Switches telemetry stream rates to the profile for state.
+    """
+    if stream_rates is not None:
+        stream_rates.set_state(state)
+
 def arm_and_takeoff(aTargetAltitude):
     """
     Arms vehicle and fly to aTargetAltitude.
     """
     global vehicle
     print("Basic pre-arm checks")
-    while not vehicle.is_armable:
-        print(" Waiting for vehicle to initialise...")
-        time.sleep(1)
+    print(" Waiting for vehicle to initialise...")
+    telemetry.wait_until(lambda t: t.vehicle.is_armable)
 
     print("Arming motors")
     vehicle.mode = VehicleMode("GUIDED")
     vehicle.armed = True
 
-    while not vehicle.armed:
-        print(" Waiting for arming...")
-        time.sleep(1)
+    print(" Waiting for arming...")
+    telemetry.wait_for_armed()
 
     print("Taking off!")
     vehicle.simple_takeoff(aTargetAltitude)
 
-    while True:
-        print(" Altitude: ", vehicle.location.global_relative_frame.alt)
-        if vehicle.location.global_relative_frame.alt >= aTargetAltitude * 0.95:
-            print("Reached target altitude")
-            break
-        time.sleep(1)
+    telemetry.wait_for_altitude(aTargetAltitude)
+    print(" Altitude: ", telemetry.altitude)
+    print("Reached target altitude")
     
     return "search"
 
@@ -45,6 +73,11 @@ def send_movement_command_Y(velocity_y):
     Send movement command in the Y (left-right) direction.
     Positive velocity moves right; negative moves left.
     """
+    _record("velocity_y", velocity_y=velocity_y)
+    if dispatcher is not None:
+        dispatcher.set_velocity(vy=velocity_y)
+        return
+
     msg = vehicle.message_factory.set_position_target_local_ned_encode(
         0, 0, 0, mavutil.mavlink.MAV_FRAME_BODY_NED,
         0b0000111111000111,  # Bitmask to control only Y-velocity
@@ -55,19 +88,51 @@ def send_movement_command_Y(velocity_y):
     vehicle.send_mavlink(msg)
     vehicle.flush()
 
+def send_velocity_yaw_rate(velocity_x, velocity_y, velocity_z, yaw_rate):
+    """
+    Sends body-frame velocity (m/s) and yaw rate (rad/s, positive clockwise)
+    together in one SET_POSITION_TARGET_LOCAL_NED, so approach and turn happen
+    at the same time instead of alternating two competing messages.
+    """
+    _record("velocity_yaw_rate", vx=velocity_x, vy=velocity_y, vz=velocity_z, yaw_rate=yaw_rate)
+    if dispatcher is not None:
+        dispatcher.set_velocity(velocity_x, velocity_y, velocity_z, yaw_rate)
+        return
+
+    msg = encode_velocity_setpoint(vehicle, velocity_x, velocity_y, velocity_z, yaw_rate)
+    vehicle.send_mavlink(msg)
+    vehicle.flush()
+
+def stop_velocity():
+    """
+    Stops a streamed velocity setpoint with a single zero setpoint.
+    """
+    _record("stop_velocity")
+    if dispatcher is not None:
+        dispatcher.stop_velocity()
+        return
+
+    msg = encode_velocity_setpoint(vehicle, 0, 0, 0, 0)
+    vehicle.send_mavlink(msg)
+    vehicle.flush()
+
 def send_movement_command_YAW(heading):
     global vehicle
     speed = 0 
     direction = 1 #direction -1 ccw, 1 cw
     
     #heading 0 to 360 degree. if negative then ccw 
-    
-    print("Sending YAW movement command with heading: %f" % heading)
+
+    _record("yaw", heading=heading)
 
     if heading < 0:
         heading = heading*-1
         direction = -1
 
+    if dispatcher is not None:
+        dispatcher.set_yaw(heading, speed, direction, relative=True)
+        return
+
     #point drone into correct heading 
     msg = vehicle.message_factory.command_long_encode(
         0, 0,       
@@ -83,6 +148,51 @@ def send_movement_command_YAW(heading):
     vehicle.send_mavlink(msg)
     #Vehicle.commands.flush()
     
+def send_yaw_to(heading, speed=0):
+    """
+    Turns to an absolute heading (degrees from north) at speed deg/s, 0 for the autopilot default.
+    """
+    _record("yaw_to", heading=heading, speed=speed)
+    if dispatcher is not None:
+        dispatcher.set_yaw(heading % 360, speed, 1, relative=False)
+        return
+
+    msg = vehicle.message_factory.command_long_encode(
+        0, 0, mavutil.mavlink.MAV_CMD_CONDITION_YAW, 0,
+        heading % 360, speed, 1, 0, 0, 0, 0)
+    vehicle.send_mavlink(msg)
+    vehicle.flush()
+
+def send_position_local(north, east, down=None):
+    """
+    Flies to a local NED position; down defaults to the current altitude.
+    """
+    if down is None:
+        down = -telemetry.altitude
+    _record("goto_local", north=north, east=east, down=down)
+    msg = encode_position_setpoint(vehicle, north, east, down)
+    if dispatcher is not None:
+        dispatcher.send(msg)
+        return
+    vehicle.send_mavlink(msg)
+    vehicle.flush()
+
+def heading():
+    """
+    Current heading in degrees from the attitude stream, or None without telemetry.
+    """
+    attitude = telemetry.attitude if telemetry is not None else None
+    return math.degrees(attitude.yaw) % 360 if attitude is not None else None
+
+def local_position():
+    """
+    (north, east) in metres from the EKF origin, or None without telemetry.
+    """
+    frame = telemetry.get("location.local_frame") if telemetry is not None else None
+    if frame is None or frame.north is None:
+        return None
+    return frame.north, frame.east
+
 def land():
     """
     Commands the drone to land at its current location.
@@ -90,9 +200,8 @@ def land():
     global vehicle
     print("Landing...")
     vehicle.mode = VehicleMode("LAND")
-    while vehicle.armed:
-        print(" Waiting for landing...")
-        time.sleep(1)
+    print(" Waiting for landing...")
+    telemetry.wait_for_armed(False)
     print("Landed and disarmed.")
 
 def RTL():
@@ -102,11 +211,17 @@ def RTL():
     global vehicle
     print("Returning to Launch (RTL)...")
     vehicle.mode = VehicleMode("RTL")
-    while vehicle.armed:
-        print(" Waiting for RTL and landing...")
-        time.sleep(1)
+    print(" Waiting for RTL and landing...")
+    telemetry.wait_for_armed(False)
     print("Returned and disarmed.")
 
 def disconnect_drone():
+    global dispatcher
+    if dispatcher is not None:
+        dispatcher.stop()
+        print("Commands requested/sent:", dispatcher.stats())
+        dispatcher = None
+    if telemetry is not None:
+        telemetry.detach()
     vehicle.close()
 
@@ -1,11 +1,135 @@
 import cv2
-from ultralytics import YOLO
+import numpy as np
+import model_registry
+import threading
 import time
+from concurrent.futures import Future
 
-model = YOLO("mango-final.pt")
+MODEL_PATH = "mango-final.pt"
 confidence_threshold = 0.8
 
-def get_detections(frame):
-    results = model.predict(source=frame, save=False, verbose=False)
+def get_model():
+    """
+    Shared detector instance, loaded on first use instead of at import.
+    """
+    return model_registry.get_model(MODEL_PATH)
+
+def warmup_async():
+    return model_registry.warmup_async(MODEL_PATH)
+
+def get_detections(frame, imgsz=None):
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    results = get_model().predict(source=frame, save=False, verbose=False, **kwargs)
     # results = model.predict(source=frame, conf=confidence_threshold, save=False, verbose=False)
-    return results
\ No newline at end of file
+    return results
+
+def boxes_array(results):
+    """
+    Detections of results[0] as an (N, 6) float32 array of x1, y1, x2, y2, conf, cls.
+    """
+    return np.asarray(results[0].boxes.cpu().numpy().data, dtype=np.float32).reshape(-1, 6)
+
+def get_detections_batch(frames, batch_model=None):
+    """
+    Runs one predict call over a list of frames and returns one result per frame,
+    in the same order. Each entry is shaped like get_detections() output.
+    """
+    batch_model = batch_model or get_model()
+    if len(frames) == 0:
+        return []
+    results = batch_model.predict(source=list(frames), save=False, verbose=False)
+    return [[r] for r in results]
+
+
+# === MULTI-CAMERA BATCHING ===
+class BatchDetector:
+    """
+    Collects frames from several camera sources and runs them through a single
+    predict call. A batch is flushed as soon as it holds batch_size frames or
+    the oldest pending frame has waited max_wait_ms, whichever comes first.
+    Only the newest pending frame per source is kept.
+    """
+
+    def __init__(self, batch_model=None, batch_size=2, max_wait_ms=20):
+        self.model = batch_model or get_model()
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = {}  # source_id -> (frame, future, submitted_at)
+        self.cond = threading.Condition()
+        self.running = True
+        self.batches = 0
+        self.frames = 0
+        self.superseded = 0
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def submit(self, source_id, frame):
+        """
+        Queues a frame for source_id and returns a Future resolving to its results.
+        """
+        future = Future()
+        with self.cond:
+            previous = self.pending.get(source_id)
+            if previous is not None:
+                # Older frame from the same camera never made it into a batch
+                previous[1].cancel()
+                self.superseded += 1
+            self.pending[source_id] = (frame, future, time.time())
+            self.cond.notify()
+        return future
+
+    def detect(self, source_id, frame, timeout=None):
+        """
+        Blocking helper returning the same structure as get_detections().
+        """
+        return self.submit(source_id, frame).result(timeout)
+
+    def _take_batch(self):
+        with self.cond:
+            while self.running:
+                if self.pending:
+                    oldest = min(item[2] for item in self.pending.values())
+                    wait = oldest + self.max_wait - time.time()
+                    if len(self.pending) >= self.batch_size or wait <= 0:
+                        break
+                    self.cond.wait(wait)
+                else:
+                    self.cond.wait(0.1)
+            if not self.running:
+                return []
+            source_ids = sorted(self.pending, key=lambda s: self.pending[s][2])[:self.batch_size]
+            return [(s,) + self.pending.pop(s) for s in source_ids]
+
+    def _worker(self):
+        while self.running:
+            batch = self._take_batch()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = get_detections_batch([item[1] for item in batch], self.model)
+            except Exception as e:
+                for item in batch:
+                    item[2].set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for item, result in zip(batch, results):
+                item[2].set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": self.frames / self.batches if self.batches else 0.0,
+            "superseded": self.superseded,
+        }
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            for _, future, _ in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.cond.notify_all()
+        self.thread.join(timeout=1.0)
@@ -0,0 +1,301 @@
+import abc
+import argparse
+import ast
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+# === CONFIGURATION ===
+# The "detector" section of config.json selects the backend, e.g.
+# {"detector": {"backend": "onnx", "threads": 4, "int8": true, "imgsz": 640}}
+CONFIG_FILE = 'config.json'
+DEFAULT_DETECTOR_CONFIG = {
+    "backend": "pytorch",  # pytorch, onnx or openvino
+    "threads": 0,          # intra-op threads, 0 lets the runtime decide
+    "int8": False,
+    "imgsz": 640,
+}
+
+def load_detector_config(path=CONFIG_FILE):
+    config = dict(DEFAULT_DETECTOR_CONFIG)
+    try:
+        with open(path, 'r') as config_file:
+            config.update(json.load(config_file).get('detector', {}))
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        pass
+    return config
+
+
+# === EXPORT ===
+def _is_fresh(target, weights):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights)
+
+def export_onnx(weights, imgsz=640, int8=False):
+    """
+    Exports PyTorch weights to ONNX once and returns the path. With int8 the
+    exported graph is dynamically quantized to 8-bit weights. The export
+    settings are part of the file name, e.g. model_640.int8.onnx, so changing
+    them in config.json exports again instead of reusing another graph.
+    """
+    base = f"{os.path.splitext(weights)[0]}_{imgsz}"
+    onnx_path = base + '.onnx'
+    if not _is_fresh(onnx_path, weights):
+        from ultralytics import YOLO
+        print(f"Exporting {weights} to ONNX at imgsz={imgsz}...")
+        exported = YOLO(weights).export(format='onnx', imgsz=imgsz, simplify=True)
+        os.replace(exported, onnx_path)
+    if not int8:
+        return onnx_path
+
+    int8_path = base + '.int8.onnx'
+    if not _is_fresh(int8_path, weights):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"Quantizing {onnx_path} to INT8...")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+def export_openvino(weights, imgsz=640, int8=False):
+    """
+    Exports PyTorch weights to an OpenVINO IR directory once and returns the
+    .xml path. The directory name carries imgsz and int8, as with export_onnx.
+    """
+    base = os.path.splitext(weights)[0]
+    out_dir = f"{base}_{imgsz}" + ('_int8' if int8 else '') + '_openvino_model'
+    xml_path = os.path.join(out_dir, os.path.basename(base) + '.xml')
+    if not _is_fresh(xml_path, weights):
+        from ultralytics import YOLO
+        import shutil
+        print(f"Exporting {weights} to OpenVINO at imgsz={imgsz}, int8={int8}...")
+        exported = YOLO(weights).export(format='openvino', imgsz=imgsz, int8=int8)
+        if os.path.abspath(exported) != os.path.abspath(out_dir):
+            if os.path.isdir(out_dir):
+                shutil.rmtree(out_dir)
+            os.replace(exported, out_dir)
+    return xml_path
+
+
+# === EXPORTED-MODEL DETECTOR ===
+class ExportedDetector(abc.ABC):
+    """
+    Runs an exported YOLOv8 graph and returns ultralytics Results objects, so
+    callers keep using result[0].boxes.xyxy / .conf / .cls exactly as with
+    YOLO.predict. Subclasses only implement _infer.
+    """
+
+    def __init__(self, imgsz=640, names=None):
+        self.imgsz = imgsz
+        self.names = names or {}
+
+    def fuse(self):
+        # Exported graphs are already fused, kept for YOLO API compatibility
+        return self
+
+    def _letterbox(self, frame):
+        h, w = frame.shape[:2]
+        gain = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * gain)), int(round(h * gain))
+        pad_x, pad_y = (self.imgsz - new_w) / 2, (self.imgsz - new_h) / 2
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        padded = cv2.copyMakeBorder(resized, top, self.imgsz - new_h - top, left, self.imgsz - new_w - left,
+                                    cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        blob = cv2.dnn.blobFromImage(padded, 1 / 255.0, swapRB=True)
+        return blob, gain, (left, top)
+
+    def _postprocess(self, output, frame, gain, pad, conf, iou, max_det=300):
+        from ultralytics.engine.results import Results
+        # (1, 4 + nc, anchors) -> (anchors, 4 + nc)
+        preds = np.squeeze(output, 0).T
+        scores = preds[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(cls)), cls]
+        keep = best >= conf
+        preds, cls, best = preds[keep], cls[keep], best[keep]
+
+        data = np.zeros((0, 6), dtype=np.float32)
+        if len(preds):
+            cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+            xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+            idx = cv2.dnn.NMSBoxesBatched(xywh.tolist(), best.tolist(), cls.tolist(), conf, iou)
+            idx = np.array(idx, dtype=int).reshape(-1)[:max_det]
+            if len(idx):
+                xyxy = np.stack([xywh[idx, 0], xywh[idx, 1],
+                                 xywh[idx, 0] + xywh[idx, 2], xywh[idx, 1] + xywh[idx, 3]], axis=1)
+                xyxy[:, [0, 2]] -= pad[0]
+                xyxy[:, [1, 3]] -= pad[1]
+                xyxy /= gain
+                h, w = frame.shape[:2]
+                xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+                xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+                data = np.concatenate([xyxy, best[idx, None], cls[idx, None]], axis=1).astype(np.float32)
+        return Results(orig_img=frame, path='', names=self.names, boxes=data)
+
+    @abc.abstractmethod
+    def _infer(self, blob):
+        """
+        Raw graph output for one (1, 3, imgsz, imgsz) blob.
+        """
+
+    def predict(self, source, conf=0.25, iou=0.7, verbose=False, save=False, imgsz=None, **kwargs):
+        if kwargs:
+            raise TypeError(f"{type(self).__name__}.predict() does not support {', '.join(sorted(kwargs))}")
+        # The graph was exported at a fixed input size, so every source (a
+        # full frame or a small ROI crop) is letterboxed to self.imgsz and a
+        # requested imgsz is only a hint
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        results = []
+        for frame in frames:
+            blob, gain, pad = self._letterbox(frame)
+            output = self._infer(blob)
+            results.append(self._postprocess(output, frame, gain, pad, conf, iou))
+        return results
+
+    __call__ = predict
+
+
+class OnnxDetector(ExportedDetector):
+    def __init__(self, onnx_path, threads=0, imgsz=640):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        names = ast.literal_eval(metadata['names']) if 'names' in metadata else None
+        super().__init__(imgsz, names)
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(ExportedDetector):
+    def __init__(self, xml_path, threads=0, imgsz=640):
+        import openvino as ov
+        import yaml
+        core = ov.Core()
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.compiled = core.compile_model(core.read_model(xml_path), 'CPU', config)
+        metadata_path = os.path.join(os.path.dirname(xml_path), 'metadata.yaml')
+        names = None
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                names = yaml.safe_load(f).get('names')
+        super().__init__(imgsz, names)
+
+    def _infer(self, blob):
+        return self.compiled([blob])[0]
+
+
+# === BACKEND SELECTION ===
+def load_detector(weights, backend=None, threads=None, int8=None, imgsz=None):
+    """
+    Returns an object with the YOLO predict()/__call__/names/fuse() interface for
+    the configured backend. Arguments override the config.json "detector" section.
+    """
+    config = load_detector_config()
+    backend = backend or config['backend']
+    threads = config['threads'] if threads is None else threads
+    int8 = config['int8'] if int8 is None else int8
+    imgsz = imgsz or config['imgsz']
+
+    if backend == 'onnx':
+        return OnnxDetector(export_onnx(weights, imgsz, int8), threads, imgsz)
+    if backend == 'openvino':
+        return OpenVinoDetector(export_openvino(weights, imgsz, int8), threads, imgsz)
+    if backend == 'pytorch':
+        from ultralytics import YOLO
+        return YOLO(weights)
+    raise ValueError(f"Unknown detector backend: {backend}")
+
+
+# === PARITY CHECK ===
+def _iou_matrix(a, b):
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def parity_check(weights, frames, backend='onnx', conf=0.5, iou_match=0.5, **backend_kwargs):
+    """
+    Runs the PyTorch model and the exported backend over the same frames and
+    reports how closely their boxes agree.
+    """
+    reference = load_detector(weights, backend='pytorch')
+    candidate = load_detector(weights, backend=backend, **backend_kwargs)
+    report = {"frames": 0, "matched": 0, "missed": 0, "extra": 0,
+              "mean_iou": 0.0, "max_conf_diff": 0.0, "class_mismatch": 0,
+              "reference_ms": 0.0, "candidate_ms": 0.0}
+    ious = []
+    for frame in frames:
+        start = time.perf_counter()
+        ref = reference.predict(source=frame, conf=conf, verbose=False)[0].boxes
+        report["reference_ms"] += 1000 * (time.perf_counter() - start)
+        start = time.perf_counter()
+        cand = candidate.predict(source=frame, conf=conf, verbose=False)[0].boxes
+        report["candidate_ms"] += 1000 * (time.perf_counter() - start)
+        report["frames"] += 1
+
+        ref_xyxy, cand_xyxy = ref.xyxy.cpu().numpy(), np.asarray(cand.xyxy)
+        if len(ref_xyxy) == 0 or len(cand_xyxy) == 0:
+            report["missed"] += len(ref_xyxy)
+            report["extra"] += len(cand_xyxy)
+            continue
+        matrix = _iou_matrix(ref_xyxy, cand_xyxy)
+        best = matrix.argmax(axis=1)
+        used = set()
+        for i, j in enumerate(best):
+            if matrix[i, j] < iou_match or j in used:
+                report["missed"] += 1
+                continue
+            used.add(j)
+            report["matched"] += 1
+            ious.append(matrix[i, j])
+            conf_diff = abs(float(ref.conf[i]) - float(cand.conf[j]))
+            report["max_conf_diff"] = max(report["max_conf_diff"], conf_diff)
+            if int(ref.cls[i]) != int(cand.cls[j]):
+                report["class_mismatch"] += 1
+        report["extra"] += len(cand_xyxy) - len(used)
+
+    if ious:
+        report["mean_iou"] = float(np.mean(ious))
+    if report["frames"]:
+        report["reference_ms"] /= report["frames"]
+        report["candidate_ms"] /= report["frames"]
+    return report
+
+def read_frames(video_path, limit=50):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a fruit detector and check parity with PyTorch")
+    parser.add_argument("weights")
+    parser.add_argument("--backend", default="onnx", choices=["onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--imgsz", type=int, default=load_detector_config()['imgsz'])
+    parser.add_argument("--video", help="Recorded flight used for the parity check")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.backend == 'onnx':
+        print("Exported:", export_onnx(args.weights, args.imgsz, args.int8))
+    else:
+        print("Exported:", export_openvino(args.weights, args.imgsz, args.int8))
+    if args.video:
+        result = parity_check(args.weights, read_frames(args.video, args.frames), args.backend,
+                              int8=args.int8, threads=args.threads, imgsz=args.imgsz)
+        print(json.dumps(result, indent=2))
@@ -4,6 +4,10 @@ import threading
 import time
 from pymavlink import mavutil
 from pynput import keyboard  # use pynput for key detection on Linux
+import os
+from capture import DualResolutionCapture, crop
+import detection
+import video_encoder
 
 # ========================
 # 1. Connect to the Vehicle
@@ -20,23 +24,38 @@ out = None
 
 VIDEO_WIDTH = 3840  # Set for 4K: 3840x2160 or 1920x1080 for Full HD
 VIDEO_HEIGHT = 2160
+INFERENCE_SIZE = 640  # Letterboxed frame used for display and detection
+DETECT = False  # Run the fruit detector on the inference frame
+CROP_DIR = "crops"  # Full-resolution fruit crops are saved here while recording
+CROP_PERIOD = 1.0  # seconds between saved crops
 
 def show_webcam():
     global recording, out
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, VIDEO_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, VIDEO_HEIGHT)
+    # One capture: the 4K frame is recorded, the small letterboxed copy is shown and detected on
+    cap = DualResolutionCapture(0, VIDEO_WIDTH, VIDEO_HEIGHT, INFERENCE_SIZE)
 
     if not cap.isOpened():
         print("Failed to open webcam.")
         return
 
+    last_crop = 0.0
     while True:
-        ret, frame = cap.read()
+        ret, frame, small, timestamp, seq = cap.read_pair()
         if not ret:
             break
 
-        cv2.imshow("Webcam Feed", frame)
+        if DETECT:
+            boxes = detection.boxes_array(detection.get_detections(small, INFERENCE_SIZE))
+            for box in boxes:
+                x1, y1, x2, y2 = map(int, box[:4])
+                cv2.rectangle(small, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            if recording and len(boxes) and timestamp - last_crop >= CROP_PERIOD:
+                os.makedirs(CROP_DIR, exist_ok=True)
+                for i, box in enumerate(cap.letterbox.to_full(boxes)):
+                    cv2.imwrite(os.path.join(CROP_DIR, f"fruit_{seq}_{i}.jpg"), crop(frame, box))
+                last_crop = timestamp
+
+        cv2.imshow("Webcam Feed", small)
 
         if recording and out is not None:
             out.write(frame)
@@ -158,7 +177,8 @@ while True:
     elif cmd == "r":
         if not recording:
             print("Starting video recording...")
-            out = cv2.VideoWriter('drone_feed.avi', cv2.VideoWriter_fourcc(*'XVID'), 20.0, (VIDEO_WIDTH, VIDEO_HEIGHT))
+            # H.264 in a separate ffmpeg process; the display loop only queues frames
+            out = video_encoder.open_writer('drone_feed.mp4', VIDEO_WIDTH, VIDEO_HEIGHT, 20.0)
             recording = True
         else:
             print("Stopping video recording...")
@@ -0,0 +1,276 @@
+import csv
+import math
+import time
+import numpy as np
+
+EARTH_RADIUS_M = 6378137.0
+
+
+# === GEOREFERENCING ===
+class LocalFrame:
+    """
+    Equirectangular conversion between lat / lon / alt and metres north, east
+    and up of an origin. Over an orchard the error stays at centimetres,
+    and it keeps the spatial index in plain metres.
+    """
+
+    def __init__(self, lat, lon, alt=0.0):
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.metres_per_deg_lat = math.radians(1) * EARTH_RADIUS_M
+        self.metres_per_deg_lon = self.metres_per_deg_lat * math.cos(math.radians(lat))
+
+    def to_local(self, lat, lon, alt):
+        return ((np.asarray(lat) - self.lat) * self.metres_per_deg_lat,
+                (np.asarray(lon) - self.lon) * self.metres_per_deg_lon,
+                np.asarray(alt) - self.alt)
+
+    def to_global(self, north, east, up):
+        return (self.lat + np.asarray(north) / self.metres_per_deg_lat,
+                self.lon + np.asarray(east) / self.metres_per_deg_lon,
+                self.alt + np.asarray(up))
+
+
+def project(yaw_deg, pitch_deg, bearing_deg, elevation_deg, distance_m):
+    """
+    North, east, up offsets (m) from the vehicle to fruits seen by the forward
+    camera at bearing / elevation off the optical axis, distance_m away.
+    Works on arrays, one entry per detection.
+    """
+    azimuth = np.radians(yaw_deg + np.asarray(bearing_deg, dtype=np.float64))
+    elevation = np.radians(pitch_deg + np.asarray(elevation_deg, dtype=np.float64))
+    distance_m = np.asarray(distance_m, dtype=np.float64)
+    horizontal = distance_m * np.cos(elevation)
+    return horizontal * np.cos(azimuth), horizontal * np.sin(azimuth), distance_m * np.sin(elevation)
+
+
+# === FRUIT MAP ===
+class FruitMap:
+    """
+    Every fruit seen during a flight, in world coordinates. Repeated
+    sightings within merge_radius metres are merged into one fruit (running
+    mean position, sighting count). Fruits are grouped into trees: a new
+    fruit joins the tree whose centre (mean of its fruits) is within
+    tree_radius metres horizontally, otherwise it starts a new tree.
+
+    Positions live in numpy arrays in a local metric frame anchored at the
+    first sighting; a grid hash of cell_size metres cells maps each cell to
+    the fruits in it, so radius queries only look at the few cells the
+    circle touches, whatever the size of the map.
+    """
+
+    def __init__(self, merge_radius=0.3, tree_radius=2.0, cell_size=2.0, origin=None, capacity=1024):
+        self.merge_radius = merge_radius
+        self.tree_radius = tree_radius
+        self.cell_size = cell_size
+        self.frame = LocalFrame(*origin) if origin is not None else None
+
+        self.count = 0
+        self.positions = np.zeros((capacity, 3), dtype=np.float64)  # north, east, up
+        self.sightings = np.zeros(capacity, dtype=np.int32)
+        self.trees = np.zeros(capacity, dtype=np.int32)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.cells = {}  # (i, j) -> list of fruit indices
+
+        self.tree_centres = []  # [north, east] mean of each tree's fruits
+        self.tree_sizes = []
+        self.tree_cells = {}  # (i, j) in tree_radius cells -> list of tree indices
+        self.merged = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        capacity = len(self.positions) * 2
+        for name in ("positions", "sightings", "trees", "first_seen", "last_seen"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def _cell(self, north, east):
+        return math.floor(north / self.cell_size), math.floor(east / self.cell_size)
+
+    @staticmethod
+    def _cell_range(north, east, radius, size):
+        i0, i1 = math.floor((north - radius) / size), math.floor((north + radius) / size)
+        j0, j1 = math.floor((east - radius) / size), math.floor((east + radius) / size)
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def _candidates(self, north, east, radius):
+        found = [self.cells[cell] for cell in self._cell_range(north, east, radius, self.cell_size) if cell in self.cells]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.fromiter((i for cell in found for i in cell), dtype=np.int64)
+
+    # === QUERIES ===
+    def within_local(self, north, east, radius):
+        """
+        Indices of the fruits within radius metres (horizontally) of north, east.
+        """
+        candidates = self._candidates(north, east, radius)
+        if len(candidates) == 0:
+            return candidates
+        offsets = self.positions[candidates, :2] - (north, east)
+        return candidates[np.einsum("ij,ij->i", offsets, offsets) <= radius * radius]
+
+    def within(self, lat, lon, radius):
+        """
+        Indices of the fruits within radius metres of lat, lon.
+        """
+        if self.frame is None:
+            return np.zeros(0, dtype=np.int64)
+        north, east, _ = self.frame.to_local(lat, lon, self.frame.alt)
+        return self.within_local(float(north), float(east), radius)
+
+    def nearest_local(self, north, east, up, radius):
+        """
+        Index of the closest fruit within radius metres in 3D, or None.
+        """
+        candidates = self._candidates(north, east, radius)
+        if len(candidates) == 0:
+            return None
+        offsets = self.positions[candidates] - (north, east, up)
+        distances = np.einsum("ij,ij->i", offsets, offsets)
+        best = int(np.argmin(distances))
+        return int(candidates[best]) if distances[best] <= radius * radius else None
+
+    # === UPDATES ===
+    def _tree_cell(self, north, east):
+        return math.floor(north / self.tree_radius), math.floor(east / self.tree_radius)
+
+    def _tree_for(self, north, east):
+        best, best_distance = None, self.tree_radius
+        for cell in self._cell_range(north, east, self.tree_radius, self.tree_radius):
+            for tree in self.tree_cells.get(cell, ()):
+                centre = self.tree_centres[tree]
+                distance = math.hypot(centre[0] - north, centre[1] - east)
+                if distance <= best_distance:
+                    best, best_distance = tree, distance
+        if best is None:
+            best = len(self.tree_centres)
+            self.tree_centres.append([north, east])
+            self.tree_sizes.append(1)
+            self.tree_cells.setdefault(self._tree_cell(north, east), []).append(best)
+            return best
+
+        # The centre follows the mean of the tree's fruits
+        centre = self.tree_centres[best]
+        old_cell = self._tree_cell(*centre)
+        self.tree_sizes[best] += 1
+        centre[0] += (north - centre[0]) / self.tree_sizes[best]
+        centre[1] += (east - centre[1]) / self.tree_sizes[best]
+        new_cell = self._tree_cell(*centre)
+        if new_cell != old_cell:
+            self.tree_cells[old_cell].remove(best)
+            self.tree_cells.setdefault(new_cell, []).append(best)
+        return best
+
+    def add_local(self, north, east, up, timestamp=None, sightings=1):
+        """
+        Adds one sighting in local metres. Returns (fruit index, True when it is a new fruit).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        index = self.nearest_local(north, east, up, self.merge_radius)
+        if index is not None:
+            old_cell = self._cell(*self.positions[index, :2])
+            total = self.sightings[index] + sightings
+            self.positions[index] += (np.array((north, east, up)) - self.positions[index]) * sightings / total
+            self.sightings[index] = total
+            self.last_seen[index] = timestamp
+            self.merged += 1
+            new_cell = self._cell(*self.positions[index, :2])
+            if new_cell != old_cell:
+                self.cells[old_cell].remove(index)
+                self.cells.setdefault(new_cell, []).append(index)
+            return index, False
+
+        if self.count == len(self.positions):
+            self._grow()
+        index = self.count
+        self.count += 1
+        self.positions[index] = (north, east, up)
+        self.sightings[index] = sightings
+        self.trees[index] = self._tree_for(north, east)
+        self.first_seen[index] = self.last_seen[index] = timestamp
+        self.cells.setdefault(self._cell(north, east), []).append(index)
+        return index, True
+
+    def add(self, lat, lon, alt, timestamp=None, sightings=1):
+        if self.frame is None:
+            self.frame = LocalFrame(lat, lon, alt)
+        north, east, up = self.frame.to_local(lat, lon, alt)
+        return self.add_local(float(north), float(east), float(up), timestamp, sightings)
+
+    def add_estimates(self, location, yaw_deg, pitch_deg, estimates, timestamp=None, min_conf=0.0):
+        """
+        Projects CameraModel estimates seen from location (lat, lon, alt) with
+        the vehicle at yaw / pitch into the map. Returns the fruit index of each estimate.
+        """
+        lat, lon, alt = location
+        if self.frame is None:
+            self.frame = LocalFrame(lat, lon, alt)
+        # Zero-width boxes have no range (distance_cm is inf) and cannot be placed
+        estimates = estimates[(estimates["conf"] >= min_conf) & np.isfinite(estimates["distance_cm"])]
+        if len(estimates) == 0:
+            return []
+        north, east, up = self.frame.to_local(lat, lon, alt)
+        dn, de, du = project(yaw_deg, pitch_deg, estimates["bearing_deg"], estimates["elevation_deg"],
+                             estimates["distance_cm"] / 100.0)
+        return [self.add_local(float(north + n), float(east + e), float(up + u), timestamp)[0]
+                for n, e, u in zip(dn, de, du)]
+
+    # === EXPORT ===
+    def tree_counts(self):
+        """
+        Fruit count per tree id.
+        """
+        counts = np.bincount(self.trees[:self.count], minlength=len(self.tree_centres))
+        return {tree: int(count) for tree, count in enumerate(counts)}
+
+    def global_positions(self, indices=None):
+        """
+        (N, 3) lat, lon, alt of the given fruits, or all of them.
+        """
+        indices = np.arange(self.count) if indices is None else np.asarray(indices, dtype=np.int64)
+        if self.frame is None or len(indices) == 0:
+            return np.zeros((0, 3))
+        positions = self.positions[indices]
+        return np.stack(self.frame.to_global(positions[:, 0], positions[:, 1], positions[:, 2]), axis=1)
+
+    def save(self, path):
+        """
+        One CSV row per fruit: id, lat, lon, alt, tree, sightings, first and last seen.
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "lat", "lon", "alt", "tree", "sightings", "first_seen", "last_seen"])
+            for index, (lat, lon, alt) in enumerate(self.global_positions()):
+                writer.writerow([index, f"{lat:.8f}", f"{lon:.8f}", f"{alt:.2f}", int(self.trees[index]),
+                                 int(self.sightings[index]), f"{self.first_seen[index]:.3f}",
+                                 f"{self.last_seen[index]:.3f}"])
+        return path
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Map saved with save(), e.g. to keep adding to it on the next flight.
+        """
+        fruit_map = cls(**kwargs)
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                index, _ = fruit_map.add(float(row["lat"]), float(row["lon"]), float(row["alt"]),
+                                         float(row["first_seen"]), int(row["sightings"]))
+                fruit_map.last_seen[index] = float(row["last_seen"])
+        return fruit_map
+
+    def stats(self):
+        return {
+            "fruits": self.count,
+            "trees": len(self.tree_centres),
+            "sightings": int(self.sightings[:self.count].sum()),
+            "merged": self.merged,
+            "cells": len(self.cells),
+        }
@@ -0,0 +1,193 @@
+import math
+
+# === LOCAL FRAME ===
+def fruit_position(pose, bearing_deg, elevation_deg, distance_m):
+    """
+    Local NED position (m) of a fruit seen by the forward camera at
+    bearing / elevation off the optical axis and distance_m away, from the
+    vehicle pose (north, east, down, heading_deg).
+    """
+    north, east, down, heading_deg = pose
+    azimuth = math.radians(heading_deg + bearing_deg)
+    elevation = math.radians(elevation_deg)
+    horizontal = distance_m * math.cos(elevation)
+    return (north + horizontal * math.cos(azimuth),
+            east + horizontal * math.sin(azimuth),
+            down - distance_m * math.sin(elevation))
+
+
+def standoff_point(start, position, standoff_m):
+    """
+    Point standoff_m short of position on the horizontal line from start, at
+    the fruit's height, and the heading (deg) that faces the fruit from there.
+    """
+    dn, de = position[0] - start[0], position[1] - start[1]
+    horizontal = math.hypot(dn, de)
+    heading = math.degrees(math.atan2(de, dn)) % 360
+    if horizontal <= standoff_m:
+        return (start[0], start[1], position[2]), heading
+    scale = (horizontal - standoff_m) / horizontal
+    return (start[0] + dn * scale, start[1] + de * scale, position[2]), heading
+
+
+# === TOUR ORDERING ===
+# Open tours: they start at the vehicle and end at the last fruit, the
+# search resumes from wherever that is.
+
+def tour_length(start, points, order):
+    length = 0.0
+    previous = start
+    for index in order:
+        length += math.dist(previous, points[index])
+        previous = points[index]
+    return length
+
+
+def nearest_neighbour_order(start, points):
+    remaining = list(range(len(points)))
+    order = []
+    current = start
+    while remaining:
+        index = min(remaining, key=lambda i: math.dist(current, points[i]))
+        remaining.remove(index)
+        order.append(index)
+        current = points[index]
+    return order
+
+
+def two_opt(start, points, order, max_passes=20):
+    """
+    Reverses tour segments while that shortens the tour. The start point
+    stays fixed and the end is free.
+    """
+    path = [start] + [points[i] for i in order]
+    order = list(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, len(path) - 1):
+            for k in range(i + 1, len(path)):
+                before = math.dist(path[i - 1], path[i])
+                after = math.dist(path[i - 1], path[k])
+                if k + 1 < len(path):
+                    before += math.dist(path[k], path[k + 1])
+                    after += math.dist(path[i], path[k + 1])
+                if after < before - 1e-9:
+                    path[i:k + 1] = path[i:k + 1][::-1]
+                    order[i - 1:k] = order[i - 1:k][::-1]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+# === HARVEST QUEUE ===
+class HarvestTarget:
+    """
+    One fruit in the local frame, averaged over every observation of it.
+    """
+
+    def __init__(self, target_id, position):
+        self.id = target_id
+        self.total = list(position)
+        self.observations = 1
+        self.track_ids = set()
+        self.visited = False
+
+    @property
+    def position(self):
+        return tuple(value / self.observations for value in self.total)
+
+    def observe(self, position):
+        for axis, value in enumerate(position):
+            self.total[axis] += value
+        self.observations += 1
+
+    def __repr__(self):
+        north, east, down = self.position
+        return f"HarvestTarget(id={self.id}, n={north:.2f}, e={east:.2f}, d={down:.2f}, obs={self.observations})"
+
+
+class HarvestQueue:
+    """
+    Fruits found during one scan, merged by tracker ID and by distance (a
+    fruit that left the view and came back under a new ID within
+    merge_radius metres is the same fruit), then visited in one tour ordered
+    by nearest neighbour + 2-opt instead of rescanning after each one.
+    """
+
+    def __init__(self, merge_radius=0.5):
+        self.merge_radius = merge_radius
+        self.targets = []
+        self.by_track = {}
+        self.tour = []
+        self.tour_index = 0
+        self.planned_length = 0.0
+        self.greedy_length = 0.0
+        self.scan_order_length = 0.0
+        self.visited = 0
+
+    def add(self, track_id, position):
+        target = self.by_track.get(track_id)
+        if target is None:
+            # Visited fruits take part too, so seeing one again does not queue it twice
+            nearest = min(self.targets, key=lambda t: math.dist(t.position, position), default=None)
+            if nearest is not None and math.dist(nearest.position, position) <= self.merge_radius:
+                target = nearest
+        if target is None:
+            target = HarvestTarget(len(self.targets), position)
+            self.targets.append(target)
+        else:
+            target.observe(position)
+        target.track_ids.add(track_id)
+        self.by_track[track_id] = target
+        return target
+
+    def pending(self):
+        return [target for target in self.targets if not target.visited]
+
+    def __len__(self):
+        return len(self.pending())
+
+    def plan(self, start):
+        """
+        Orders the pending fruits into a tour from start (north, east, down) and returns it.
+        """
+        pending = self.pending()
+        points = [target.position for target in pending]
+        greedy = nearest_neighbour_order(start, points)
+        order = two_opt(start, points, greedy)
+        self.scan_order_length = tour_length(start, points, range(len(points)))
+        self.greedy_length = tour_length(start, points, greedy)
+        self.planned_length = tour_length(start, points, order)
+        self.tour = [pending[i] for i in order]
+        self.tour_index = 0
+        return self.tour
+
+    def next(self):
+        while self.tour_index < len(self.tour) and self.tour[self.tour_index].visited:
+            self.tour_index += 1
+        return self.tour[self.tour_index] if self.tour_index < len(self.tour) else None
+
+    def mark_visited(self, target):
+        if not target.visited:
+            target.visited = True
+            self.visited += 1
+
+    def clear(self):
+        """
+        Forgets everything that is not visited yet, before a new scan.
+        """
+        self.targets = [target for target in self.targets if target.visited]
+        self.by_track = {track_id: target for track_id, target in self.by_track.items() if target.visited}
+        self.tour = []
+        self.tour_index = 0
+
+    def stats(self):
+        return {
+            "targets": len(self.targets),
+            "pending": len(self.pending()),
+            "visited": self.visited,
+            "tour_m": round(self.planned_length, 2),
+            "greedy_m": round(self.greedy_length, 2),
+            "scan_order_m": round(self.scan_order_length, 2),
+        }
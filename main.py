@@ -364,7 +364,6 @@
 
 
 import cv2
-from ultralytics import YOLO
 from dronekit import connect, VehicleMode, LocationGlobalRelative
 from pymavlink import mavutil
 import time
@@ -373,16 +372,40 @@ import keyboard
 import detection
 import argparse
 import socket
+import capture
+import pipeline
+import roi
+import tracker
+import mot
+import recorder
+import video_encoder
+import search_scheduler
+import visual_servo
+import calibration
+import state_machine
+import os
+import queue
+import threading
 
 sonars={}
-cap = cv2.VideoCapture(0)
+cap = None  # camera or replay source, set by open_io()
+out = None
+flight_log = None
+camera = None  # CameraModel for the source resolution, set by open_io()
 
 
-# Frame dimensions
-frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+# Frame dimensions, updated by open_io() from the source
+frame_width = 640
+frame_height = 480
 frame_center_x = frame_width // 2  # Center x-coordinate of the frame
 move_threshold = 50  # Threshold in pixels to initiate drone movement
+roi_reacquire_every = 15  # Full-frame detection every N tracked frames
+detect_every = 3  # Run the detector every k-th frame, optical flow in between
+target_policy = "nearest"  # Which fruit to steer on: nearest, largest or unvisited
+approach_area = 3850  # Box area in px^2 at which the approach stops
+camera_name = "forward"  # Calibration to load; its horizontal FOV sets the search yaw step
+search_overlap = 0.1  # Fraction of the view shared by consecutive search steps
+search_yaw_speed = 30  # deg/s
 font = cv2.FONT_HERSHEY_SIMPLEX
 org = (00, 185)
 fontScale = 1
@@ -396,20 +419,73 @@ thickness = 2
 
 
 
-# Set up video writer for saving the video feed
-output_file = f"output_{time.strftime('%Y%m%d_%H%M%S')}.avi"
-fourcc = cv2.VideoWriter_fourcc(*'XVID')
-out = cv2.VideoWriter(output_file, fourcc, 20.0, (frame_width, frame_height))
+video_frames = 0
+record_segment_minutes = 10  # A new video file is started every N minutes
+telemetry_log_period = 0.2  # seconds between telemetry snapshots in the log
+last_telemetry_log = 0.0
+
+# The replay harness runs the vision stages inline, without windows or prompts,
+# and swaps in the video clock for time-based decisions
+pipelined = True
+headless = False
+clock = time.time
 
-STATE = "takeoff"
 altitude  = 4
 
 
+class NullWriter:
+    def write(self, frame):
+        pass
+
+    def release(self):
+        pass
+
+def open_io(source, output_file, record_video=True):
+    """
+    Sets the frame source and opens the video writer and, next to it, the flight log
+    (frame index, detections, commands and telemetry).
+    """
+    global cap, out, flight_log, camera, frame_width, frame_height, frame_center_x, video_frames
+    cap = source
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_center_x = frame_width // 2
+    # Checkerboard calibration when there is one for this resolution, datasheet values otherwise
+    camera = calibration.load_camera_model(camera_name, frame_width, frame_height)
+    video_frames = 0
+
+    # Set up video writer for saving the video feed; encoding runs in a separate ffmpeg process
+    if record_video:
+        out = video_encoder.open_writer(output_file, frame_width, frame_height, 20.0,
+                                        segment_minutes=record_segment_minutes)
+    else:
+        out = NullWriter()
+
+    flight_log = recorder.FlightRecorder(os.path.splitext(output_file)[0] + ".fplog").start()
+    control.recorder = flight_log
+
+def show(window, frame):
+    """
+    Displays frame and returns the pressed key, or -1 when headless.
+    """
+    if headless:
+        return -1
+    cv2.imshow(window, frame)
+    return cv2.waitKey(1) & 0xFF
+
+def stream_ended():
+    # Only replay sources run out of frames
+    return getattr(cap, "ended", False)
+
+
 def setup():
 
+    # Load and warm the detector while the vehicle link comes up
+    model_loader = detection.warmup_async()
     control.connect_drone('tcp:127.0.0.1:5762', False, 57600)
-    ret, frame = cap.read()
-    result = detection.get_detections(frame)
+    # Movement commands from the vision loop go out at a fixed 10 Hz
+    control.start_dispatcher(10)
+    model_loader.join()
     # client_socket.connect((SERVER_IP, PORT))
     print("SETup done")
     #print("vehicle1 connected")
@@ -420,156 +496,400 @@ def setup():
     #vehicle2.add_message_listener('DISTANCE_SENSOR',listener)
     print("Detector Initialized")
     
-def init_camera():
-      while True:
-         ret, frame = cap.read()
-         if not ret:
-           continue
-         cv2.imshow("Setup camera", frame)
-         exit1 = input("Init succesful?: ")
-         if (exit1 == "yes"):
-            cv2.destroyAllWindows()
-            
-            break
-        #  if cv2.waitKey(1) & 0xFF == ord('q'):
-        #    cv2.destroyAllWindows()  
-        #    break
-        
-
-def yaw(speed, duration):
-   start = time.time()
-   while time.time() - start <=  duration:
-        control.send_movement_command_YAW(speed)
-        
-def search():
-    print("State is SEARCH -> " + STATE)
-    start = time.time()
-    last_yaw_time = start
-
-    while True:
-        
-        if cv2.waitKey(1) & 0xFF == ord('e'):
-          cv2.destroyAllWindows()  
-          break
-
-        # Send yaw command every 3 seconds
-        if time.time() - last_yaw_time >= 7:
-            yaw(5, 1)
-            last_yaw_time = time.time() 
-
-        ret, frame = cap.read()
-        if not ret:
-           continue
-
+def write_frame(frame, timestamp=None, capture_seq=0):
+   """
+   Writes a frame to the video and logs its index, so the flight log lines up with the video.
+   """
+   global video_frames, last_telemetry_log
+   # Frames the encoder had to drop are not in the video, so they get no index
+   if out.write(frame) is False:
+      return
+   flight_log.log_frame(video_frames, timestamp, capture_seq)
+   video_frames += 1
+   now = clock()
+   if control.telemetry is not None and now - last_telemetry_log >= telemetry_log_period:
+      flight_log.log_telemetry(control.telemetry.snapshot(), now)
+      last_telemetry_log = now
+
+def make_search_scheduler():
+    """
+    Yaw sweep in steps of the camera's horizontal FOV; each step completes on attitude feedback.
+    """
+    pattern = search_scheduler.YawSweep(camera.horizontal_fov_deg, search_overlap)
+    return search_scheduler.SearchScheduler(pattern, lambda heading: control.send_yaw_to(heading, search_yaw_speed),
+                                            control.heading, control.send_position_local, control.local_position,
+                                            yaw_speed=search_yaw_speed, clock=clock)
+
+
+class OperatorInput:
+    """
+    Reads operator answers on a background thread, so a prompt never holds up the vision loop.
+    """
+
+    def __init__(self):
+        self.lines = queue.Queue()
+        self.thread = None
+
+    def ask(self, prompt):
+        # Answers typed before the question belong to an earlier one
+        while self.poll() is not None:
+            pass
+        print(prompt, end="", flush=True)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._read, daemon=True)
+            self.thread.start()
+
+    def _read(self):
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                break
+            self.lines.put(line.strip())
+
+    def poll(self):
+        try:
+            return self.lines.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class Approach:
+    """
+    Tracking state for one approach, rebuilt every time track is entered.
+    """
+
+    def __init__(self):
+        # After the first full-frame hit, inference runs on a crop around the target
+        self.roi_detector = roi.RoiDetector(frame_width, frame_height, reacquire_every=roi_reacquire_every)
+        # Detections get stable IDs so the target does not flip between fruits
+        self.fruit_tracker = mot.MultiObjectTracker()
+        # Approach stays on the Y axis as with send_movement_command_Y
+        self.servo = visual_servo.VisualServoController(frame_width, frame_height, target_area=approach_area,
+                                                        approach_axis="y", clock=clock)
+        # Between detector runs the target is propagated by optical flow + Kalman filter
+        self.target_tracker = tracker.TargetTracker(self.detect_tracks, detect_every=detect_every,
+                                                    select_fn=self.select_target)
+        self.seq = 0
+        self.timestamp = None
+
+    def detect_tracks(self, frame):
+        tracks = self.fruit_tracker.update(self.roi_detector.detect(frame))
+        flight_log.log_detections(self.seq, tracks, self.timestamp)
+        return tracks
+
+    def select_target(self, tracks):
+        return self.fruit_tracker.select_target(tracks, target_policy, (frame_center_x, frame_height // 2))
+
+    def update(self, frame, timestamp, seq):
+        self.seq, self.timestamp = seq, timestamp
+        return self.target_tracker.update(frame)
+
+    def report(self):
+        print("ROI stats:", self.roi_detector.stats())
+        print("Tracker stats:", self.target_tracker.stats())
+        print("Fruits seen:", len(self.fruit_tracker.registry))
+
+
+# === MISSION STATES ===
+# Each state is a tick function called once per frame with (frame, timestamp,
+# seq, source, result), where result is what perceive() inferred on that frame
+# and source says for which state (see perceive). None of them blocks: prompts
+# are answered on the operator thread and vehicle calls that wait (takeoff,
+# landing) run as background actions, so capture, recording and display never
+# pause.
+takeoff_timeout = 60  # seconds to reach altitude before landing instead
+track_timeout = 60  # seconds on one approach before searching again
+search_timeout = None  # seconds before returning home, None to search until stopped
+operator = OperatorInput()
+machine = None
+search_plan = None
+approach = None
+action = None
+view_frame = None  # what the display shows; states may replace it with an annotated copy
+# Boxes and offset lines of the latest tracked frame. The recorder draws them on
+# every frame it writes, so the video keeps its annotations at camera rate.
+overlay = []
+
+def preflight_enter():
+    if not headless:
+        operator.ask("Camera OK? Enter yes to takeoff : ")
+
+def preflight_tick(item):
+    # Nobody to confirm when running headless
+    if headless:
+        return "takeoff"
+    answer = operator.poll()
+    if answer == "yes":
+        return "takeoff"
+    if answer is not None:
+        operator.ask("Enter yes to takeoff : ")
+
+def takeoff_enter():
+    global action
+    action = state_machine.Action(control.arm_and_takeoff, altitude)
+    #point = LocationGlobalRelative(17.396973996804782, 78.49031912873349, altitude)
+    #control.goto(point)
+
+def takeoff_tick(item):
+    if action.done:
+        return "land" if action.error is not None else action.result or "search"
+
+def search_enter():
+    global search_plan
+    search_plan = make_search_scheduler()
+
+def search_tick(item):
+    #    client_socket.send("RED".encode())
+    frame, timestamp, seq, source, result = item
+    # Never blocks: the next yaw step goes out once the previous one is reached
+    search_plan.update()
+    if search_plan.done:
+        print("Search sweep complete:", search_plan.stats())
+        search_plan.reset()
+
+    # Detections inferred before the switch to search belong to another state
+    if source == "search" and len(result[0].boxes) > 0:
+        return "track"
+
+def track_enter():
+    global approach
+    approach = Approach()
+
+def draw_overlay(frame, ops):
+    """
+    Draws ("rect" | "line" | "text", *cv2 args) operations on frame and returns it.
+    """
+    for op, *args in ops:
+        if op == "rect":
+            cv2.rectangle(frame, *args)
+        elif op == "line":
+            cv2.line(frame, *args)
+        else:
+            cv2.putText(frame, *args)
+    return frame
+
+def track_tick(item):
+    global view_frame, overlay
+    frame, timestamp, seq, source, result = item
+    # Inferred before this approach started (or for another state): nothing to steer on yet
+    if source is not approach:
+        return
+    target, crop = result
+    if target is None:
+        overlay = []
+        return "search"
+
+    ops = []
+    if crop is not None and target.source == "detection":
+        ops.append(("rect", crop[:2], crop[2:], (128, 128, 128), 1))
+    ops.append(("text", f"{target.source} id={target.track_id}", (0, 30), font, 0.6, color, 1, cv2.LINE_AA, False))
+
+    x1, y1, x2, y2 = map(int, target[:4])
+
+    # Calculate the center of the bounding box
+    box_center_x = (x1 + x2) // 2
+
+    # Calculate the horizontal offset from the center of the frame
+    offset_x = box_center_x - frame_center_x
+    ops.append(("rect", (x1, y1), (x2, y2), (0, 255, 0), 2))
+
+    #fetch distance
+    area = (x2-x1)*(y2-y1)
+
+    if(area > 10000):
+        overlay = ops
+        return "search"
+    ops.append(("text", str(area), org, font, fontScale, color, thickness, cv2.LINE_AA, False))
+
+    if abs(offset_x) > move_threshold:
+        # client_socket.send("ORANGE".encode())
+        ops.append(("line", (box_center_x, y1), (box_center_x, y2), (255, 0, 0), 2))
+    else:
+        ops.append(("line", (box_center_x, y1), (box_center_x, y2), (0, 255, 0), 2))
+        # client_socket.send("GREEN".encode())
+
+    # The recorder burns the same overlay into the video
+    overlay = ops
+    # The raw frame is shared with the recorder, annotate a copy
+    view_frame = draw_overlay(frame.copy(), ops)
+
+    # Turn, climb and approach together in one setpoint, from PID loops at a fixed rate
+    velocity_x, velocity_y, velocity_z, yaw_rate = approach.servo.update(target)
+    control.send_velocity_yaw_rate(velocity_x, velocity_y, velocity_z, yaw_rate)
+    if approach.servo.at_standoff() and abs(offset_x) <= move_threshold:
+        # At the fruit: hold here and hand over to the operator
+        print(f"Reached fruit id={target.track_id} at area {area}")
+        return "idle"
+
+def track_exit():
+    global overlay, approach
+    # Stop streaming rather than latch a zero setpoint: a streamed yaw_rate=0
+    # would override the search's CONDITION_YAW steps
+    control.stop_velocity()
+    overlay = []
+    approach.report()
+    approach = None
+
+def idle_enter():
+    # client_socket.send("NONE".encode())
+    if not headless:
+        operator.ask("Drone is in idle state, try to change the state to [search, land, RTL, exit]:")
+
+def idle_tick(item):
+    # Nobody to ask when running headless
+    if headless:
+        return "exit"
+    answer = operator.poll()
+    if answer in ["search", "land", "exit", "RTL"]:
+        return answer
+    if answer is not None:
+        idle_enter()
+
+def land_enter():
+    global action
+    action = state_machine.Action(control.land)
+
+def rtl_enter():
+    global action
+    action = state_machine.Action(control.RTL)
+
+def landing_tick(item):
+    if action.done:
+        return "exit"
+
+def perceive(item):
+    """
+    Inference for the current state, on its own pipeline stage: full-frame
+    detection while searching, ROI detection and tracking while tracking.
+    Returns item extended with (source, result); source is "search", the
+    Approach the target belongs to, or None when the state infers nothing.
+    """
+    frame, timestamp, seq = item
+    state, current = machine.current, approach
+    if state == "search":
         result = detection.get_detections(frame)
-        out.write(frame)
-        cv2.imshow("Drone camera", frame)
-        if len(result[0].boxes) > 0:
-            return "track"
-            
-    return "idle"
-    
-def track():
-
-    while True:
-      
-      ret, frame = cap.read()
-      if not ret:
-         continue
-      
-      result = detection.get_detections(frame)
-      if len(result[0].boxes) == 0:
-         return "search"
-        
-      for box in result[0].boxes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-        # Calculate the center of the bounding box
-        box_center_x = (x1 + x2) // 2
-        
-        # Calculate the horizontal offset from the center of the frame
-        offset_x = box_center_x - frame_center_x
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        
-        #fetch distance
-        area = (x2-x1)*(y2-y1)
-        
-        if(area > 10000):
-          return "search"
-        cv2.putText(frame, str(area), org, font, fontScale, color, thickness, cv2.LINE_AA, False)
-        
-        if abs(offset_x) > move_threshold:
-            control.send_movement_command_Y(0)
-            # client_socket.send("ORANGE".encode())
-            cv2.line(frame, (box_center_x, y1), (box_center_x, y2), (255, 0, 0), 2)
-            angle = -0.5 if offset_x < 0 else 0.5
-            control.send_movement_command_YAW(angle)
+        flight_log.log_detections(seq, detection.boxes_array(result), timestamp)
+        return item + ("search", result)
+    if state == "track" and current is not None:
+        target = current.update(frame, timestamp, seq)
+        return item + (current, (target, current.roi_detector.roi))
+    return item + (None, None)
+
+def log_transition(previous, state, reason, elapsed):
+    control.set_flight_state(state)
+    flight_log.log_event("state", state=state, previous=previous, reason=reason, elapsed=elapsed)
+
+def build_machine():
+    """
+    The mission as states, guards and timeouts.
+    """
+    machine = state_machine.StateMachine(clock, on_transition=log_transition)
+    machine.add_state("preflight", preflight_tick, enter=preflight_enter)
+    machine.add_state("takeoff", takeoff_tick, enter=takeoff_enter, timeout=takeoff_timeout, on_timeout="land")
+    machine.add_state("search", search_tick, enter=search_enter, timeout=search_timeout, on_timeout="RTL")
+    machine.add_state("track", track_tick, enter=track_enter, exit=track_exit, timeout=track_timeout,
+                      on_timeout="search")
+    machine.add_state("idle", idle_tick, enter=idle_enter)
+    machine.add_state("land", landing_tick, enter=land_enter)
+    machine.add_state("RTL", landing_tick, enter=rtl_enter)
+    machine.add_state("exit", final=True)
+    # Only replay sources run out of frames
+    machine.add_transition("*", "exit", stream_ended, "stream ended")
+    return machine
+
+
+def run(state):
+    """
+    Runs the mission state machine from state until it exits, lands or returns home.
+    Capture, inference, the state ticks (control) and recording form one
+    pipeline that keeps running across state changes. Inference has its own
+    stage, so the control tick for one frame overlaps the detector call for
+    the next one.
+    """
+    global machine
+    machine = build_machine()
+
+    def grab():
+        ret, frame, timestamp, seq = cap.read_latest(timeout=0.1)
+        if not ret:
+            return None
+        return frame, timestamp, seq
+
+    def record(item):
+        frame, timestamp, seq = item
+        ops = overlay
+        if ops:
+            frame = draw_overlay(frame.copy(), ops)
+        write_frame(frame, timestamp, seq)
+        return item
+
+    def mission(item):
+        global view_frame
+        view_frame = item[0]
+        machine.step(item)
+        return view_frame
+
+    def operator_key(key):
+        # 'e' stops the search, 'q' the approach
+        if (key == ord('e') and machine.current == "search") or (key == ord('q') and machine.current == "track"):
+            machine.request("idle", "operator")
+
+    machine.start(state)
+
+    if not pipelined:
+        # Same steps, one frame at a time: deterministic for replay
+        while not machine.done:
+            item = grab()
+            if item is None:
+                machine.check()
+                continue
+            # Mission first, so the recorded overlay belongs to this very frame
+            view = mission(perceive(item))
+            record(item)
+            operator_key(show("Drone camera", view))
+        print("Mission state times:\n" + machine.report())
+        return machine.current
+
+    pipe = pipeline.Pipeline()
+    pipe.add_source("capture", grab)
+    pipe.add_stage("inference", perceive, "capture", maxsize=1)
+    pipe.add_stage("mission", mission, "inference", maxsize=1)
+    pipe.add_stage("record", record, "capture", maxsize=4)
+    pipe.start()
+
+    # Display stays on the main thread, cv2.imshow is not thread safe
+    while pipe.running and not machine.done:
+        frame = pipe.latest("mission")
+        if frame is not None:
+            key = show("Drone camera", frame)
         else:
-            control.send_movement_command_YAW(0)
-            cv2.line(frame, (box_center_x, y1), (box_center_x, y2), (0, 255, 0), 2)
-            speed = 0.3 if area < 3850  else 0
-            # if speed == 0:
-            #   client_socket.send("GREEN".encode())
-            # else:
-            #   client_socket.send("ORANGE".encode())
-            control.send_movement_command_Y(speed)
-      out.write(frame)
-      cv2.imshow("Drone camera", frame)
-      
-      # Exit loop on 'q' key press
-      if cv2.waitKey(1) & 0xFF == ord('q'):
-        cv2.destroyAllWindows()
-        break
-    
-    return "idle"
-
-
-setup()
-
-
-# Main loop 
-while True:
-    if STATE == "track":
-        STATE = track()
-
-    elif STATE == "search":
-    #    client_socket.send("RED".encode())
-       STATE = search()
-    
-    elif STATE == "takeoff":
-        init_camera()
-        inpt = input("Enter yes to takeoff : ")
-        if inpt != "yes":
-           continue
-        STATE = control.arm_and_takeoff(altitude)
-        #point = LocationGlobalRelative(17.396973996804782, 78.49031912873349, altitude)
-        #control.goto(point)
-        
-    elif STATE == "land":
-        control.land()
-        break
-    
-    elif STATE == "RTL":
-        control.RTL()
-        break
-       
-    elif STATE == "exit":
-        break
-        
-    elif STATE == "idle":
-        # client_socket.send("NONE".encode())
-        val = input("Drone is in idle state, try to change the state to [search, land, RTL, exit]:")
-        if val in ["search", "land", "exit", "RTL"]:
-           STATE = val
-
-
-    
-
-    
-# Release resources
-cap.release()
-out.release()
-# client_socket.send("EXIT".encode())
-cv2.destroyAllWindows()
-control.disconnect_drone()
-#vehicle2.close()
\ No newline at end of file
+            key = -1 if headless else cv2.waitKey(1) & 0xFF
+        if headless:
+            time.sleep(0.01)
+        operator_key(key)
+
+    pipe.stop()
+    pipe.join()
+    print("Mission pipeline stats:\n" + pipe.report())
+    print("Mission state times:\n" + machine.report())
+    return machine.current
+
+def shutdown():
+    # Release resources
+    print("Camera stats:", cap.stats())
+    cap.release()
+    out.release()
+    flight_log.close()
+    print("Flight log stats:", flight_log.stats())
+    # client_socket.send("EXIT".encode())
+    cv2.destroyAllWindows()
+    control.disconnect_drone()
+    #vehicle2.close()
+
+
+if __name__ == "__main__":
+    open_io(capture.LatestFrameCapture(0), f"output_{time.strftime('%Y%m%d_%H%M%S')}.mp4")
+    setup()
+    run("preflight")
+    shutdown()
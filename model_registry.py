@@ -0,0 +1,64 @@
+import threading
+import time
+import numpy as np
+from detector_backends import load_detector
+
+# === PROCESS-WIDE MODEL CACHE ===
+# Models are keyed by weights path and backend arguments (backend, imgsz,
+# int8, ...), loaded on first use and shared by every caller in the process. Loading also runs one dummy frame through the model
+# so the first real frame does not pay for lazy initialisation.
+WARMUP_WIDTH = 640
+WARMUP_HEIGHT = 480
+
+_models = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+def _key(weights, backend_kwargs):
+    # Arguments left at None fall back to config.json, same as leaving them out
+    return weights, tuple(sorted((name, value) for name, value in backend_kwargs.items() if value is not None))
+
+def _lock_for(key):
+    with _registry_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+def get_model(weights, **backend_kwargs):
+    """
+    Returns the shared detector for weights and backend_kwargs, loading and
+    warming it on first use. Concurrent callers for the same model wait for
+    the one load in progress.
+    """
+    key = _key(weights, backend_kwargs)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock_for(key):
+        if key not in _models:
+            start = time.time()
+            model = load_detector(weights, **backend_kwargs)
+            model.fuse()
+            dummy = np.zeros((WARMUP_HEIGHT, WARMUP_WIDTH, 3), dtype=np.uint8)
+            model.predict(source=dummy, save=False, verbose=False)
+            _models[key] = model
+            print(f"Model {weights} loaded and warmed in {time.time() - start:.1f}s")
+        return _models[key]
+
+def warmup_async(weights, **backend_kwargs):
+    """
+    Starts loading weights in the background, e.g. while the vehicle connects.
+    Returns the thread so callers can join it if they need the model ready.
+    """
+    th = threading.Thread(target=get_model, args=(weights,), kwargs=backend_kwargs, daemon=True)
+    th.start()
+    return th
+
+def is_loaded(weights, **backend_kwargs):
+    return _key(weights, backend_kwargs) in _models
+
+def unload(weights):
+    """
+    Drops every cached model for weights, whatever backend it was loaded with.
+    """
+    for key in [key for key in list(_models) if key[0] == weights]:
+        with _lock_for(key):
+            _models.pop(key, None)
@@ -0,0 +1,205 @@
+import time
+from collections import deque
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+# === ASSOCIATION ===
+def iou_matrix(a, b):
+    """
+    Pairwise IoU between (N, 4+) and (M, 4+) xyxy box arrays.
+    """
+    a, b = np.asarray(a, dtype=np.float32)[:, :4], np.asarray(b, dtype=np.float32)[:, :4]
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def greedy_match(iou, threshold):
+    pairs = np.argwhere(iou >= threshold)
+    order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind="stable")
+    used_rows, used_cols, matches = set(), set(), []
+    for r, c in pairs[order]:
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+def match(iou, threshold):
+    """
+    Returns (row, col) pairs with IoU above threshold, using the Hungarian
+    algorithm when scipy is available and a greedy matcher otherwise.
+    """
+    if iou.size == 0:
+        return []
+    if linear_sum_assignment is None:
+        return greedy_match(iou, threshold)
+    rows, cols = linear_sum_assignment(-iou)
+    return [(r, c) for r, c in zip(rows, cols) if iou[r, c] >= threshold]
+
+
+# === FRUIT REGISTRY ===
+class FruitRecord:
+    def __init__(self, track_id, timestamp, history_size):
+        self.id = track_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 0
+        self.visited = False
+        self.history = deque(maxlen=history_size)  # (timestamp, x1, y1, x2, y2, conf)
+
+    def __repr__(self):
+        return f"FruitRecord(id={self.id}, hits={self.hits}, visited={self.visited})"
+
+
+# === MULTI-OBJECT TRACKER ===
+class MultiObjectTracker:
+    """
+    SORT/ByteTrack-style tracker assigning stable IDs to detections.
+    Track boxes are kept in flat NumPy arrays with a constant-velocity
+    prediction, so a frame with dozens of fruits costs one IoU matrix.
+    High-confidence detections are matched first, low-confidence ones then
+    only extend existing tracks.
+    """
+
+    def __init__(self, iou_threshold=0.3, high_conf=0.5, low_conf=0.1, max_age=15,
+                 min_hits=1, smoothing=0.6, history_size=100):
+        self.iou_threshold = iou_threshold
+        self.high_conf = high_conf
+        self.low_conf = low_conf
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.smoothing = smoothing
+        self.history_size = history_size
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.info = np.zeros((0, 2), dtype=np.float32)  # conf, cls
+        self.age = np.zeros(0, dtype=np.int64)  # frames since last match
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+        self.registry = {}
+        self.target_id = None
+
+    def _associate(self, dets, track_idx):
+        if len(dets) == 0 or len(track_idx) == 0:
+            return [], list(range(len(dets))), list(track_idx)
+        pairs = match(iou_matrix(self.boxes[track_idx], dets), self.iou_threshold)
+        matched_tracks = {r for r, _ in pairs}
+        matched_dets = {c for _, c in pairs}
+        pairs = [(track_idx[r], c) for r, c in pairs]
+        unmatched_dets = [d for d in range(len(dets)) if d not in matched_dets]
+        unmatched_tracks = [track_idx[t] for t in range(len(track_idx)) if t not in matched_tracks]
+        return pairs, unmatched_dets, unmatched_tracks
+
+    def _apply(self, pairs, dets, timestamp):
+        for t, d in pairs:
+            new_box = dets[d, :4]
+            self.velocity[t] = self.smoothing * (new_box - self.boxes[t] + self.velocity[t]) \
+                + (1 - self.smoothing) * self.velocity[t]
+            self.boxes[t] = new_box
+            self.info[t] = dets[d, 4:6]
+            self.age[t] = 0
+            self.hits[t] += 1
+            record = self.registry[int(self.ids[t])]
+            record.last_seen = timestamp
+            record.hits += 1
+            record.history.append((timestamp, *map(float, dets[d, :5])))
+
+    def update(self, detections, timestamp=None):
+        """
+        detections: (N, 6) array of x1, y1, x2, y2, conf, cls.
+        Returns an (M, 7) array of confirmed tracks: x1, y1, x2, y2, conf, cls, id.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        dets = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        dets = dets[dets[:, 4] >= self.low_conf]
+
+        # Predict every track forward one frame
+        self.boxes += self.velocity
+        self.age += 1
+
+        high = dets[dets[:, 4] >= self.high_conf]
+        low = dets[dets[:, 4] < self.high_conf]
+        all_tracks = list(range(len(self.ids)))
+        pairs, unmatched_high, remaining = self._associate(high, all_tracks)
+        self._apply(pairs, high, timestamp)
+        pairs_low, _, _ = self._associate(low, remaining)
+        self._apply(pairs_low, low, timestamp)
+
+        # New tracks only from unmatched high-confidence detections
+        if unmatched_high:
+            new = high[unmatched_high]
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, new[:, :4]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4), dtype=np.float32)])
+            self.info = np.concatenate([self.info, new[:, 4:6]])
+            self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            for track_id, det in zip(new_ids, new):
+                record = FruitRecord(int(track_id), timestamp, self.history_size)
+                record.hits = 1
+                record.history.append((timestamp, *map(float, det[:5])))
+                self.registry[int(track_id)] = record
+
+        # Drop tracks that have not been matched for too long
+        alive = self.age <= self.max_age
+        if not alive.all():
+            self.ids, self.boxes, self.velocity = self.ids[alive], self.boxes[alive], self.velocity[alive]
+            self.info, self.age, self.hits = self.info[alive], self.age[alive], self.hits[alive]
+
+        return self.active_tracks()
+
+    def active_tracks(self):
+        confirmed = (self.age == 0) & (self.hits >= self.min_hits)
+        return np.concatenate([self.boxes[confirmed], self.info[confirmed],
+                               self.ids[confirmed, None].astype(np.float32)], axis=1)
+
+    # === TARGET SELECTION ===
+    def select_target(self, tracks, policy="nearest", frame_center=(320, 240), sticky=True):
+        """
+        Picks one row of tracks to steer on. Policies: "nearest" to frame_center,
+        "largest" box area, or "unvisited" (largest fruit not yet marked visited).
+        With sticky, the current target is kept while it is still tracked.
+        """
+        if len(tracks) == 0:
+            self.target_id = None
+            return None
+        ids = tracks[:, 6].astype(np.int64)
+        if sticky and self.target_id is not None and self.target_id in ids:
+            return tracks[ids == self.target_id][0]
+
+        areas = (tracks[:, 2] - tracks[:, 0]) * (tracks[:, 3] - tracks[:, 1])
+        if policy == "nearest":
+            centres = (tracks[:, :2] + tracks[:, 2:4]) / 2
+            score = -np.linalg.norm(centres - np.asarray(frame_center, dtype=np.float32), axis=1)
+        elif policy == "largest":
+            score = areas
+        elif policy == "unvisited":
+            visited = np.array([self.registry[i].visited for i in ids])
+            if visited.all():
+                self.target_id = None
+                return None
+            score = np.where(visited, -np.inf, areas)
+        else:
+            raise ValueError(f"Unknown target policy: {policy}")
+        target = tracks[int(np.argmax(score))]
+        self.target_id = int(target[6])
+        return target
+
+    def mark_visited(self, track_id):
+        if track_id in self.registry:
+            self.registry[track_id].visited = True
+        if self.target_id == track_id:
+            self.target_id = None
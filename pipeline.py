@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+
+
+# === BOUNDED QUEUE ===
+class DropOldestQueue:
+    """
+    Bounded queue that never blocks the producer. When full, the oldest item
+    is discarded so consumers always work on the freshest data.
+    """
+
+    def __init__(self, maxsize=2):
+        self.items = deque()
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.cond = threading.Condition()
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=0.1):
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+# === STAGE ===
+class Stage:
+    """
+    One worker thread running fn on every item from its inbox and forwarding
+    non-None results to downstream stages. A source stage has no inbox and
+    calls fn() repeatedly to produce items.
+    """
+
+    def __init__(self, name, fn, maxsize=2, source=False):
+        self.name = name
+        self.fn = fn
+        self.source = source
+        self.inbox = None if source else DropOldestQueue(maxsize)
+        self.outputs = []
+        self.thread = None
+        self.last_output = None
+        self.error = None
+
+        self.processed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.started_at = None
+
+    def run(self, pipeline):
+        self.started_at = time.time()
+        while pipeline.running:
+            if self.source:
+                item = None
+            else:
+                item = self.inbox.get(timeout=0.1)
+                if item is None:
+                    continue
+
+            start = time.perf_counter()
+            try:
+                result = self.fn() if self.source else self.fn(item)
+            except Exception as e:
+                self.error = e
+                print(f"Stage '{self.name}' failed: {e}")
+                pipeline.stop()
+                break
+            elapsed = time.perf_counter() - start
+
+            if result is None:
+                continue
+            self.processed += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            self.last_output = result
+            for queue in self.outputs:
+                queue.put(result)
+
+    def stats(self):
+        running_for = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "processed": self.processed,
+            "dropped": self.inbox.dropped if self.inbox is not None else 0,
+            "fps": self.processed / running_for if running_for > 0 else 0.0,
+            "latency_avg_ms": 1000 * self.latency_total / self.processed if self.processed else 0.0,
+            "latency_max_ms": 1000 * self.latency_max,
+        }
+
+
+# === PIPELINE ===
+class Pipeline:
+    """
+    Runs each stage in its own thread, connected by drop-oldest queues, so a
+    slow stage (inference) only lowers its own rate and never stalls capture,
+    recording or steering.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.running = False
+
+    def add_source(self, name, fn):
+        stage = Stage(name, fn, source=True)
+        self.stages[name] = stage
+        return stage
+
+    def add_stage(self, name, fn, upstream, maxsize=2):
+        stage = Stage(name, fn, maxsize=maxsize)
+        self.stages[upstream].outputs.append(stage.inbox)
+        self.stages[name] = stage
+        return stage
+
+    def start(self):
+        self.running = True
+        for stage in self.stages.values():
+            stage.thread = threading.Thread(target=stage.run, args=(self,), daemon=True)
+            stage.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        for stage in self.stages.values():
+            if stage.inbox is not None:
+                stage.inbox.wake()
+
+    def join(self, timeout=1.0):
+        current = threading.current_thread()
+        for stage in self.stages.values():
+            if stage.thread is not None and stage.thread is not current:
+                stage.thread.join(timeout)
+
+    def latest(self, name):
+        return self.stages[name].last_output
+
+    def stats(self):
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def report(self):
+        lines = []
+        for name, s in self.stats().items():
+            lines.append(f" {name:<10} {s['fps']:6.1f} fps | avg {s['latency_avg_ms']:6.1f} ms | "
+                         f"max {s['latency_max_ms']:6.1f} ms | dropped {s['dropped']}")
+        return "\n".join(lines)
@@ -0,0 +1,163 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+# === LOG FORMAT ===
+# File:   MAGIC, then chunks until EOF
+# Chunk:  b"CHNK" | uint32 payload length | uint32 crc32 | uint32 record count | records
+# Record: uint8 type | float64 timestamp | uint32 length | body
+# Every chunk is fsync'ed when written, so a crash loses at most the chunk
+# being filled; readers stop at the first truncated or corrupt chunk.
+MAGIC = b"FPREC1\n"
+CHUNK_HEADER = struct.Struct("<4sIII")
+RECORD_HEADER = struct.Struct("<BdI")
+
+FRAME = 1       # body: uint64 video frame index, uint64 capture sequence
+DETECTIONS = 2  # body: uint64 capture sequence + (N, cols) float32 array
+COMMAND = 3     # body: JSON
+TELEMETRY = 4   # body: JSON
+EVENT = 5       # body: JSON
+
+RECORD_NAMES = {FRAME: "frame", DETECTIONS: "detections", COMMAND: "command",
+                TELEMETRY: "telemetry", EVENT: "event"}
+
+FRAME_BODY = struct.Struct("<QQ")
+DETECTIONS_HEAD = struct.Struct("<QII")
+
+
+# === FLIGHT RECORDER ===
+class FlightRecorder:
+    """
+    Append-only binary flight log written from a background thread. Callers
+    only enqueue records; when the bounded buffer is full new records are
+    dropped and counted rather than blocking the vision loop.
+    """
+
+    def __init__(self, path, chunk_seconds=1.0, chunk_bytes=256 * 1024, max_pending=10000):
+        self.path = path
+        self.chunk_seconds = chunk_seconds
+        self.chunk_bytes = chunk_bytes
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.records = 0
+        self.chunks = 0
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC)
+        self.file.flush()
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.file.close()
+
+    # === LOGGING API ===
+    def _put(self, record_type, body, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            self.pending.put_nowait((record_type, timestamp, body))
+        except queue.Full:
+            self.dropped += 1
+
+    def log_frame(self, frame_index, timestamp=None, capture_seq=0):
+        self._put(FRAME, FRAME_BODY.pack(frame_index, capture_seq), timestamp)
+
+    def log_detections(self, capture_seq, boxes, timestamp=None):
+        boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+        boxes = boxes.reshape(len(boxes), -1) if boxes.size else boxes.reshape(0, 6)
+        head = DETECTIONS_HEAD.pack(capture_seq, boxes.shape[0], boxes.shape[1])
+        self._put(DETECTIONS, head + boxes.tobytes(), timestamp)
+
+    def log_command(self, name, timestamp=None, **fields):
+        fields["name"] = name
+        self._put(COMMAND, json.dumps(fields, default=str).encode(), timestamp)
+
+    def log_telemetry(self, snapshot, timestamp=None):
+        self._put(TELEMETRY, json.dumps(snapshot, default=str).encode(), timestamp)
+
+    def log_event(self, name, timestamp=None, **fields):
+        fields["name"] = name
+        self._put(EVENT, json.dumps(fields, default=str).encode(), timestamp)
+
+    # === WRITER THREAD ===
+    def _write_chunk(self, buffer, count):
+        data = b"".join(buffer)
+        self.file.write(CHUNK_HEADER.pack(b"CHNK", len(data), zlib.crc32(data), count))
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.chunks += 1
+
+    def _writer(self):
+        buffer, size, count = [], 0, 0
+        chunk_started = time.time()
+        while self.running or not self.pending.empty():
+            try:
+                record_type, timestamp, body = self.pending.get(timeout=0.1)
+                buffer.append(RECORD_HEADER.pack(record_type, timestamp, len(body)))
+                buffer.append(body)
+                size += RECORD_HEADER.size + len(body)
+                count += 1
+                self.records += 1
+            except queue.Empty:
+                pass
+            if count and (size >= self.chunk_bytes or time.time() - chunk_started >= self.chunk_seconds):
+                self._write_chunk(buffer, count)
+                buffer, size, count = [], 0, 0
+                chunk_started = time.time()
+        if count:
+            self._write_chunk(buffer, count)
+
+    def stats(self):
+        return {"records": self.records, "chunks": self.chunks, "dropped": self.dropped,
+                "pending": self.pending.qsize()}
+
+
+# === READER ===
+def _decode(record_type, body):
+    if record_type == FRAME:
+        frame_index, capture_seq = FRAME_BODY.unpack(body)
+        return {"frame_index": frame_index, "capture_seq": capture_seq}
+    if record_type == DETECTIONS:
+        capture_seq, rows, cols = DETECTIONS_HEAD.unpack_from(body)
+        boxes = np.frombuffer(body, dtype=np.float32, offset=DETECTIONS_HEAD.size).reshape(rows, cols)
+        return {"capture_seq": capture_seq, "boxes": boxes}
+    return json.loads(body)
+
+def read_log(path):
+    """
+    Yields (record name, timestamp, decoded body) for every record in the
+    intact chunks of a flight log, in write order.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a flight log")
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                return
+            tag, length, crc, count = CHUNK_HEADER.unpack(header)
+            data = f.read(length)
+            if tag != b"CHNK" or len(data) < length or zlib.crc32(data) != crc:
+                print(f"Flight log {path} ends with a damaged chunk, stopping there")
+                return
+            offset = 0
+            for _ in range(count):
+                record_type, timestamp, body_len = RECORD_HEADER.unpack_from(data, offset)
+                offset += RECORD_HEADER.size
+                body = data[offset:offset + body_len]
+                offset += body_len
+                yield RECORD_NAMES.get(record_type, str(record_type)), timestamp, _decode(record_type, body)
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import time
+import cv2
+
+
+# === VIDEO FILE SOURCE ===
+class VideoFileSource:
+    """
+    Serves a recorded video with the LatestFrameCapture interface. Frames are
+    returned one after another as fast as they are asked for, and the clock
+    is the video time of the current frame, so time-based decisions (search
+    step timing, state timeouts) follow the video instead of the wall clock.
+    """
+
+    def __init__(self, path, fps=None):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open {path}")
+        self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 20.0
+        self.seq = 0
+        self.video_time = 0.0
+        self.frames_read = 0
+        self.ended = False
+
+    def clock(self):
+        return self.video_time
+
+    def read_latest(self, timeout=None, wait_new=True):
+        while not self.ended:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.ended = True
+                break
+            self.video_time = self.seq / self.fps
+            self.seq += 1
+            self.frames_read += 1
+            return True, frame, self.video_time, self.seq
+        return False, None, self.video_time, self.seq
+
+    def read(self):
+        ret, frame, _, _ = self.read_latest()
+        return ret, frame
+
+    def stats(self):
+        return {"grabbed": self.seq, "dropped": 0, "last_timestamp": self.video_time}
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.cap.release()
+
+
+# === MOCK CONTROL ===
+class MockControl:
+    """
+    Stands in for the control module. Every command is captured with the
+    video time it was issued at instead of being sent to a vehicle.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.commands = []
+        self.states = []
+        self.telemetry = None
+        self.recorder = None
+        self.dispatcher = None
+
+    def _capture(self, name, **fields):
+        timestamp = self.clock()
+        if self.recorder is not None:
+            self.recorder.log_command(name, timestamp, **fields)
+        fields["name"] = name
+        fields["time"] = timestamp
+        self.commands.append(fields)
+
+    def send_movement_command_Y(self, velocity_y):
+        self._capture("velocity_y", velocity_y=velocity_y)
+
+    def send_movement_command_YAW(self, heading):
+        self._capture("yaw", heading=heading)
+
+    def send_velocity_yaw_rate(self, velocity_x, velocity_y, velocity_z, yaw_rate):
+        self._capture("velocity_yaw_rate", vx=velocity_x, vy=velocity_y, vz=velocity_z, yaw_rate=yaw_rate)
+
+    def send_yaw_to(self, heading, speed=0):
+        self._capture("yaw_to", heading=heading, speed=speed)
+
+    def send_position_local(self, north, east, down=None):
+        self._capture("goto_local", north=north, east=east, down=down)
+
+    def heading(self):
+        # No attitude stream: the search scheduler times its steps instead
+        return None
+
+    def local_position(self):
+        return None
+
+    def set_flight_state(self, state):
+        self.states.append((self.clock(), state))
+
+    def connect_drone(self, *args, **kwargs):
+        pass
+
+    def start_dispatcher(self, *args, **kwargs):
+        pass
+
+    def arm_and_takeoff(self, altitude):
+        return "search"
+
+    def land(self):
+        self._capture("land")
+
+    def RTL(self):
+        self._capture("RTL")
+
+    def disconnect_drone(self):
+        pass
+
+
+# === REPLAY ===
+def replay(video_path, output_dir="replay_out", initial_state="search", record_video=False):
+    """
+    Drives main.py's state machine from a recorded video with a mock control
+    module, running as fast as the CPU allows. Returns a summary with every
+    captured command and state change.
+    """
+    import main
+
+    source = VideoFileSource(video_path)
+    mock = MockControl(source.clock)
+    main.control = mock
+    main.pipelined = False
+    main.headless = True
+    main.clock = source.clock
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    main.open_io(source, os.path.join(output_dir, name + "_replay.avi"), record_video)
+
+    start = time.perf_counter()
+    main.run(initial_state)
+    elapsed = time.perf_counter() - start
+    main.shutdown()
+
+    return {
+        "video": video_path,
+        "frames": source.seq,
+        "frames_processed": source.frames_read,
+        "video_seconds": source.video_time,
+        "wall_seconds": elapsed,
+        "speedup": source.video_time / elapsed if elapsed > 0 else None,
+        "states": mock.states,
+        "commands": mock.commands,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded flights through the tracking state machine")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--out", default="replay_out", help="Directory for replay logs and summaries")
+    parser.add_argument("--state", default="search", help="Initial state")
+    parser.add_argument("--video", action="store_true", help="Also write the replayed video")
+    args = parser.parse_args()
+
+    for video in args.videos:
+        summary = replay(video, args.out, args.state, args.video)
+        name = os.path.splitext(os.path.basename(video))[0]
+        with open(os.path.join(args.out, name + "_commands.json"), "w") as f:
+            json.dump(summary, f, indent=1, default=str)
+        print(f"{video}: {summary['frames']} frames, {len(summary['commands'])} commands, "
+              f"{summary['wall_seconds']:.1f}s ({summary['speedup'] or 0:.1f}x real time)")
@@ -0,0 +1,78 @@
+import numpy as np
+import detection
+
+
+# === REGION-OF-INTEREST DETECTION ===
+class RoiDetector:
+    """
+    Once a target is locked, runs the detector on a padded crop around the
+    last box instead of the full frame. Boxes are returned in full-frame
+    coordinates, so offset and area logic downstream is unchanged.
+
+    A full-frame pass is made when nothing is locked, every reacquire_every
+    frames, when the crop finds nothing, or when the best confidence drops
+    below min_conf.
+    """
+
+    def __init__(self, frame_width, frame_height, padding=1.0, min_size=192,
+                 roi_imgsz=320, reacquire_every=15, min_conf=0.5, detect_fn=None):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.padding = padding
+        self.min_size = min_size
+        self.roi_imgsz = roi_imgsz
+        self.reacquire_every = reacquire_every
+        self.min_conf = min_conf
+        self.detect_fn = detect_fn or detection.get_detections
+
+        self.target = None
+        self.roi = None
+        self.frames_since_full = 0
+        self.full_frames = 0
+        self.roi_frames = 0
+
+    def reset(self):
+        self.target = None
+        self.roi = None
+
+    def _crop_window(self, box):
+        x1, y1, x2, y2 = box[:4]
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        side = max((x2 - x1), (y2 - y1)) * (1 + 2 * self.padding)
+        side = min(max(side, self.min_size), self.frame_width, self.frame_height)
+        rx1 = int(np.clip(cx - side / 2, 0, self.frame_width - side))
+        ry1 = int(np.clip(cy - side / 2, 0, self.frame_height - side))
+        return rx1, ry1, rx1 + int(side), ry1 + int(side)
+
+    def _full_frame(self, frame):
+        self.frames_since_full = 0
+        self.full_frames += 1
+        self.roi = None
+        return detection.boxes_array(self.detect_fn(frame))
+
+    def detect(self, frame):
+        """
+        Returns an (N, 6) array of x1, y1, x2, y2, conf, cls in frame coordinates.
+        """
+        use_roi = self.target is not None and self.frames_since_full < self.reacquire_every
+        boxes = None
+        if use_roi:
+            rx1, ry1, rx2, ry2 = self._crop_window(self.target)
+            crop = frame[ry1:ry2, rx1:rx2]
+            boxes = detection.boxes_array(self.detect_fn(crop, imgsz=self.roi_imgsz))
+            boxes[:, [0, 2]] += rx1
+            boxes[:, [1, 3]] += ry1
+            self.roi = (rx1, ry1, rx2, ry2)
+            self.roi_frames += 1
+            self.frames_since_full += 1
+            if len(boxes) == 0 or boxes[:, 4].max() < self.min_conf:
+                boxes = None
+
+        if boxes is None:
+            boxes = self._full_frame(frame)
+
+        self.target = boxes[boxes[:, 4].argmax()] if len(boxes) else None
+        return boxes
+
+    def stats(self):
+        return {"full_frames": self.full_frames, "roi_frames": self.roi_frames}
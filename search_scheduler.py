@@ -0,0 +1,204 @@
+import math
+import time
+
+# === SEARCH PATTERNS ===
+# A pattern turns the start heading (deg) and local position (north, east in m)
+# into a list of steps: ("yaw", heading_deg) or ("goto", north, east).
+
+class YawSweep:
+    """
+    Turns on the spot in steps of one camera field of view (minus overlap)
+    until the full circle has been seen.
+    """
+
+    def __init__(self, horizontal_fov_deg, overlap=0.1, turns=1, direction=1):
+        self.step_deg = horizontal_fov_deg * (1 - overlap)
+        self.turns = turns
+        self.direction = direction
+
+    def steps(self, start_heading, start_north=0.0, start_east=0.0):
+        count = int(math.ceil(360.0 * self.turns / self.step_deg))
+        return [("yaw", (start_heading + self.direction * self.step_deg * i) % 360) for i in range(1, count + 1)]
+
+
+class Lawnmower:
+    """
+    Back-and-forth lanes of length metres, spaced lane_spacing apart, covering
+    width metres to the right of the start heading. The camera keeps facing
+    along the lanes.
+    """
+
+    def __init__(self, width, length, lane_spacing):
+        self.width = width
+        self.length = length
+        self.lane_spacing = lane_spacing
+
+    def steps(self, start_heading, start_north=0.0, start_east=0.0):
+        h = math.radians(start_heading)
+        forward = (math.cos(h), math.sin(h))
+        right = (-math.sin(h), math.cos(h))
+        lanes = int(self.width // self.lane_spacing) + 1
+        steps = []
+        for lane in range(lanes):
+            offset = lane * self.lane_spacing
+            along = (0.0, self.length) if lane % 2 == 0 else (self.length, 0.0)
+            for distance in along:
+                steps.append(("goto",
+                              start_north + forward[0] * distance + right[0] * offset,
+                              start_east + forward[1] * distance + right[1] * offset))
+        return steps
+
+
+class Spiral:
+    """
+    Square spiral outwards from the start point with legs growing by
+    spacing metres every two legs, facing along each leg.
+    """
+
+    def __init__(self, spacing, legs=8):
+        self.spacing = spacing
+        self.legs = legs
+
+    def steps(self, start_heading, start_north=0.0, start_east=0.0):
+        north, east = start_north, start_east
+        heading = start_heading
+        steps = []
+        for leg in range(self.legs):
+            length = self.spacing * (leg // 2 + 1)
+            h = math.radians(heading)
+            north += math.cos(h) * length
+            east += math.sin(h) * length
+            steps.append(("goto", north, east))
+            heading = (heading + 90) % 360
+            steps.append(("yaw", heading))
+        return steps
+
+
+# === SCHEDULER ===
+def _angle_diff(a, b):
+    return (a - b + 180) % 360 - 180
+
+
+class SearchScheduler:
+    """
+    Drives a search pattern one step at a time without blocking. Call
+    update() once per processed frame: it sends the next step when the
+    previous one has completed and returns immediately, so detection keeps
+    running while the vehicle turns or moves.
+
+    A step is complete when telemetry reports the target heading or position
+    within tolerance and the vehicle has dwelt there for dwell seconds. Without
+    telemetry, completion falls back to an estimate from yaw_speed and speed.
+    """
+
+    def __init__(self, pattern, yaw_to, get_heading=None, goto=None, get_position=None,
+                 yaw_speed=30.0, speed=2.0, heading_tolerance=3.0, position_tolerance=0.5,
+                 dwell=0.3, step_timeout=15.0, clock=time.time):
+        self.pattern = pattern
+        self.yaw_to = yaw_to
+        self.get_heading = get_heading
+        self.goto = goto
+        self.get_position = get_position
+        self.yaw_speed = yaw_speed
+        self.speed = speed
+        self.heading_tolerance = heading_tolerance
+        self.position_tolerance = position_tolerance
+        self.dwell = dwell
+        self.step_timeout = step_timeout
+        self.clock = clock
+
+        self.steps = None
+        self.index = 0
+        self.current = None
+        self.sent_at = 0.0
+        self.expected = 0.0
+        self.arrived_at = None
+        self.started_at = None
+        self.heading = 0.0  # last known or commanded heading when there is no telemetry
+        self.position = (0.0, 0.0)
+        self.timeouts = 0
+
+    @property
+    def done(self):
+        return self.steps is not None and self.index >= len(self.steps) and self.current is None
+
+    def reset(self):
+        """
+        Starts the pattern again from the current heading and position on the next update().
+        """
+        self.steps = None
+        self.index = 0
+        self.current = None
+
+    def _read_heading(self):
+        heading = self.get_heading() if self.get_heading is not None else None
+        return heading % 360 if heading is not None else None
+
+    def _read_position(self):
+        return self.get_position() if self.get_position is not None else None
+
+    def _start_step(self, now):
+        step = self.steps[self.index]
+        self.index += 1
+        self.current = step
+        self.sent_at = now
+        self.arrived_at = None
+        if step[0] == "yaw":
+            heading = self._read_heading()
+            start = heading if heading is not None else self.heading
+            self.expected = abs(_angle_diff(step[1], start)) / self.yaw_speed
+            self.yaw_to(step[1])
+        else:
+            position = self._read_position() or self.position
+            self.expected = math.hypot(step[1] - position[0], step[2] - position[1]) / self.speed
+            self.goto(step[1], step[2])
+
+    def _reached(self, now):
+        step = self.current
+        if step[0] == "yaw":
+            heading = self._read_heading()
+            if heading is not None:
+                return abs(_angle_diff(step[1], heading)) <= self.heading_tolerance
+        else:
+            position = self._read_position()
+            if position is not None:
+                return math.hypot(step[1] - position[0], step[2] - position[1]) <= self.position_tolerance
+        # No telemetry: assume the step took as long as the commanded rate implies
+        return now - self.sent_at >= self.expected
+
+    def update(self):
+        """
+        Advances the pattern. Returns the step in progress, or None when the pattern is done.
+        """
+        now = self.clock()
+        if self.steps is None:
+            heading = self._read_heading()
+            self.heading = heading if heading is not None else self.heading
+            self.position = self._read_position() or self.position
+            self.steps = self.pattern.steps(self.heading, *self.position)
+            self.started_at = now
+
+        if self.current is not None:
+            if self.arrived_at is None and self._reached(now):
+                self.arrived_at = now
+            if self.arrived_at is None and now - self.sent_at > max(self.step_timeout, 2 * self.expected):
+                self.timeouts += 1
+                self.arrived_at = now
+            if self.arrived_at is not None and now - self.arrived_at >= self.dwell:
+                if self.current[0] == "yaw":
+                    self.heading = self.current[1]
+                else:
+                    self.position = (self.current[1], self.current[2])
+                self.current = None
+
+        if self.current is None and self.index < len(self.steps):
+            self._start_step(now)
+        return self.current
+
+    def stats(self):
+        return {
+            "steps": len(self.steps) if self.steps is not None else 0,
+            "completed": self.index - (1 if self.current is not None else 0),
+            "elapsed": self.clock() - self.started_at if self.started_at is not None else 0.0,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,620 @@
+import argparse
+import json
+import math
+import random
+import socket
+import threading
+import time
+
+# === SIMULATION CONSTANTS ===
+HOME_LAT = 17.396974
+HOME_LON = 78.490319
+EARTH_RADIUS = 6378137.0
+PHYSICS_DT = 0.01             # simulated seconds per physics step
+VELOCITY_TAU = 0.3            # first-order response of the velocity controller, s
+MAX_ACCEL = 3.0               # m/s^2
+MAX_YAW_RATE = math.radians(90)
+DEFAULT_YAW_SPEED = 60.0      # deg/s used by CONDITION_YAW when speed is 0
+TAKEOFF_SPEED = 1.5           # m/s
+LAND_SPEED = 0.5              # m/s
+RTL_SPEED = 5.0               # m/s
+GUIDED_SPEED = 5.0            # m/s towards a position target, as WPNAV_SPEED
+POSITION_GAIN = 1.0           # 1/s, slows the approach to a position target
+GUIDED_TIMEOUT = 3.0          # velocity setpoints expire like ArduCopter's guided mode
+
+# ArduCopter custom modes
+MODES = {"STABILIZE": 0, "ACRO": 1, "ALT_HOLD": 2, "AUTO": 3, "GUIDED": 4, "LOITER": 5,
+         "RTL": 6, "CIRCLE": 7, "LAND": 9, "BRAKE": 17}
+MODE_NAMES = {number: name for name, number in MODES.items()}
+
+# Parameters served to DroneKit's wait_ready()
+PARAMS = {
+    "SYSID_THISMAV": 1, "FRAME_CLASS": 1, "FRAME_TYPE": 1, "ARMING_CHECK": 1,
+    "WPNAV_SPEED": 500, "WPNAV_SPEED_UP": 250, "WPNAV_SPEED_DN": 150,
+    "RTL_ALT": 1500, "LAND_SPEED": 50, "ATC_RATE_Y_MAX": 90,
+}
+
+# Outbound stream rates in Hz (simulated time) until the client asks otherwise
+DEFAULT_RATES = {
+    "HEARTBEAT": 1, "ATTITUDE": 10, "GLOBAL_POSITION_INT": 5, "LOCAL_POSITION_NED": 5,
+    "VFR_HUD": 2, "SYS_STATUS": 1, "GPS_RAW_INT": 1, "EKF_STATUS_REPORT": 1,
+}
+
+# Every EKF solution flag DroneKit checks, without constant position mode
+EKF_FLAGS_OK = 0x37F
+
+
+def wrap_angle(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+# === KINEMATICS ===
+class SimVehicle:
+    """
+    Point-mass multicopter in a local NED frame around HOME. Velocity
+    setpoints are tracked with a first-order lag and an acceleration limit,
+    position targets are flown to at up to GUIDED_SPEED, and yaw follows
+    either a yaw-rate setpoint or a CONDITION_YAW target.
+    Nothing here touches the network or the wall clock, so it can be stepped
+    as fast as the CPU allows.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+        self.position = [0.0, 0.0, 0.0]  # north, east, down (m)
+        self.velocity = [0.0, 0.0, 0.0]
+        self.yaw = 0.0
+        self.yaw_speed = 0.0
+        self.armed = False
+        self.mode = "STABILIZE"
+
+        self.velocity_target = None  # NED m/s
+        self.velocity_target_time = 0.0
+        self.position_target = None  # NED m, held until replaced
+        self.yaw_rate_target = None
+        self.yaw_target = None
+        self.yaw_target_speed = math.radians(DEFAULT_YAW_SPEED)
+        self.takeoff_altitude = None
+        self.battery = 12.6
+
+    @property
+    def altitude(self):
+        return -self.position[2]
+
+    @property
+    def landed(self):
+        return self.altitude <= 0.01
+
+    # === COMMANDS ===
+    def set_mode(self, mode):
+        if mode not in MODES:
+            return False
+        self.mode = mode
+        self.velocity_target = None
+        self.position_target = None
+        self.yaw_rate_target = None
+        return True
+
+    def arm(self, armed=True):
+        if armed and self.mode not in ("GUIDED", "STABILIZE", "LOITER", "ALT_HOLD"):
+            return False
+        self.armed = armed
+        if not armed:
+            self.takeoff_altitude = None
+        return True
+
+    def takeoff(self, altitude):
+        if not self.armed or self.mode != "GUIDED":
+            return False
+        self.takeoff_altitude = altitude
+        return True
+
+    def set_velocity(self, vx, vy, vz, body=True):
+        """
+        Velocity setpoint; body-frame requests are rotated by the current
+        heading when received, as ArduCopter does for MAV_FRAME_BODY_NED.
+        """
+        if body:
+            c, s = math.cos(self.yaw), math.sin(self.yaw)
+            vx, vy = vx * c - vy * s, vx * s + vy * c
+        self.velocity_target = [vx, vy, vz]
+        self.velocity_target_time = self.time
+        self.position_target = None
+        self.takeoff_altitude = None
+
+    def set_position(self, north, east, down):
+        """
+        Position target in the local NED frame; replaces any velocity setpoint.
+        """
+        self.position_target = [north, east, down]
+        self.velocity_target = None
+        self.takeoff_altitude = None
+
+    def set_yaw_rate(self, yaw_rate):
+        self.yaw_rate_target = max(-MAX_YAW_RATE, min(MAX_YAW_RATE, yaw_rate))
+        self.yaw_target = None
+
+    def condition_yaw(self, heading, speed=0, direction=1, relative=True):
+        angle = math.radians(heading)
+        if relative:
+            target = self.yaw + (angle if direction >= 0 else -angle)
+        else:
+            target = angle
+        self.yaw_target = wrap_angle(target)
+        self.yaw_target_speed = math.radians(speed or DEFAULT_YAW_SPEED)
+        self.yaw_rate_target = None
+
+    # === PHYSICS ===
+    def _desired_velocity(self):
+        if not self.armed or (self.landed and self.takeoff_altitude is None):
+            return [0.0, 0.0, 0.0]
+        if self.mode == "LAND":
+            return [0.0, 0.0, LAND_SPEED]
+        if self.mode == "RTL":
+            north, east = self.position[0], self.position[1]
+            dist = math.hypot(north, east)
+            if dist < 0.5:
+                return [0.0, 0.0, LAND_SPEED]
+            speed = min(RTL_SPEED, dist)
+            return [-north / dist * speed, -east / dist * speed, 0.0]
+        if self.mode != "GUIDED":
+            return [0.0, 0.0, 0.0]
+        if self.takeoff_altitude is not None:
+            remaining = self.takeoff_altitude - self.altitude
+            return [0.0, 0.0, -min(TAKEOFF_SPEED, max(remaining, 0.0) * 2)]
+        if self.position_target is not None:
+            offset = [target - current for target, current in zip(self.position_target, self.position)]
+            dist = math.sqrt(sum(value * value for value in offset))
+            if dist < 1e-3:
+                return [0.0, 0.0, 0.0]
+            speed = min(GUIDED_SPEED, dist * POSITION_GAIN)
+            return [value / dist * speed for value in offset]
+        if self.velocity_target is None or self.time - self.velocity_target_time > GUIDED_TIMEOUT:
+            return [0.0, 0.0, 0.0]
+        return list(self.velocity_target)
+
+    def step(self, dt=PHYSICS_DT):
+        desired = self._desired_velocity()
+        alpha = min(1.0, dt / VELOCITY_TAU)
+        for axis in range(3):
+            change = (desired[axis] - self.velocity[axis]) * alpha
+            limit = MAX_ACCEL * dt
+            self.velocity[axis] += max(-limit, min(limit, change))
+            self.position[axis] += self.velocity[axis] * dt
+
+        if self.position[2] >= 0.0:
+            self.position[2] = 0.0
+            self.velocity[2] = min(self.velocity[2], 0.0)
+            if self.armed and self.mode in ("LAND", "RTL") and self.time > 0:
+                self.armed = False
+                self.velocity = [0.0, 0.0, 0.0]
+
+        yaw_rate = 0.0
+        if self.armed and not self.landed:
+            if self.yaw_rate_target is not None:
+                if self.time - self.velocity_target_time > GUIDED_TIMEOUT:
+                    self.yaw_rate_target = None
+                else:
+                    yaw_rate = self.yaw_rate_target
+            elif self.yaw_target is not None:
+                error = wrap_angle(self.yaw_target - self.yaw)
+                max_step = self.yaw_target_speed * dt
+                yaw_rate = max(-max_step, min(max_step, error)) / dt
+                if abs(error) <= max_step:
+                    self.yaw_target = None
+        self.yaw_speed = yaw_rate
+        self.yaw = wrap_angle(self.yaw + yaw_rate * dt)
+
+        if self.armed:
+            self.battery = max(10.5, self.battery - 0.0002 * dt)
+        self.time += dt
+
+    def global_position(self):
+        lat = HOME_LAT + math.degrees(self.position[0] / EARTH_RADIUS)
+        lon = HOME_LON + math.degrees(self.position[1] / (EARTH_RADIUS * math.cos(math.radians(HOME_LAT))))
+        return lat, lon
+
+
+# === MAVLINK SERVER ===
+class MavlinkSimulator:
+    """
+    Serves a SimVehicle on a local TCP port as an ArduCopter-like autopilot,
+    so control.py, clicontrol.py and Flightcode.py can connect to
+    tcp:127.0.0.1:5762 without SITL. Simulated time runs speedup times
+    faster than the wall clock.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5762, speedup=1.0, vehicle=None):
+        from pymavlink.dialects.v20 import ardupilotmega as mavlink
+        self.mavlink = mavlink
+        self.mav = mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+        self.host = host
+        self.port = port
+        self.speedup = speedup
+        self.vehicle = vehicle or SimVehicle()
+        self.lock = threading.Lock()
+        self.intervals = {name: 1.0 / hz for name, hz in DEFAULT_RATES.items()}
+        self.next_due = {}
+        self.client = None
+        self.server = None
+        self.running = False
+        self.received = {}
+        self.sent = 0
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(1)
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._sim_loop, daemon=True).start()
+        print(f"Simulated vehicle listening on tcp:{self.host}:{self.port} ({self.speedup}x real time)")
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.client is not None:
+            self.client.close()
+        self.server.close()
+
+    # === NETWORK ===
+    def _accept_loop(self):
+        while self.running:
+            try:
+                client, address = self.server.accept()
+            except OSError:
+                return
+            print("Client connected from", address)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.client = client
+            self._read_loop(client)
+            print("Client disconnected")
+            self.client = None
+
+    def _read_loop(self, client):
+        parser = self.mavlink.MAVLink(None)
+        parser.robust_parsing = True
+        while self.running:
+            try:
+                data = client.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            for msg in parser.parse_buffer(data) or []:
+                self._handle(msg)
+
+    def _send(self, msg):
+        client = self.client
+        if client is None:
+            return
+        try:
+            client.sendall(msg.pack(self.mav))
+            self.sent += 1
+        except OSError:
+            pass
+
+    # === INBOUND ===
+    def _ack(self, command, accepted):
+        result = self.mavlink.MAV_RESULT_ACCEPTED if accepted else self.mavlink.MAV_RESULT_FAILED
+        self._send(self.mav.command_ack_encode(command, result))
+
+    def _handle(self, msg):
+        kind = msg.get_type()
+        self.received[kind] = self.received.get(kind, 0) + 1
+        with self.lock:
+            v = self.vehicle
+            if kind == "SET_MODE":
+                v.set_mode(MODE_NAMES.get(msg.custom_mode, ""))
+            elif kind == "COMMAND_LONG":
+                self._handle_command(msg)
+            elif kind == "SET_POSITION_TARGET_LOCAL_NED":
+                self._handle_setpoint(msg)
+            elif kind == "PARAM_REQUEST_LIST":
+                for index, name in enumerate(PARAMS):
+                    self._send_param(name, index)
+            elif kind == "PARAM_REQUEST_READ":
+                name = msg.param_id.rstrip("\x00") if isinstance(msg.param_id, str) else msg.param_id.decode().rstrip("\x00")
+                if name in PARAMS:
+                    self._send_param(name, list(PARAMS).index(name))
+            elif kind == "PARAM_SET":
+                name = msg.param_id.rstrip("\x00") if isinstance(msg.param_id, str) else msg.param_id.decode().rstrip("\x00")
+                PARAMS[name] = msg.param_value
+                self._send_param(name, list(PARAMS).index(name))
+            elif kind == "REQUEST_DATA_STREAM" and msg.start_stop:
+                for name in DEFAULT_RATES:
+                    if name != "HEARTBEAT" and msg.req_message_rate > 0:
+                        self.intervals[name] = 1.0 / msg.req_message_rate
+
+    def _handle_command(self, msg):
+        m = self.mavlink
+        v = self.vehicle
+        command = msg.command
+        if command == m.MAV_CMD_COMPONENT_ARM_DISARM:
+            self._ack(command, v.arm(msg.param1 > 0.5))
+        elif command == m.MAV_CMD_DO_SET_MODE:
+            self._ack(command, v.set_mode(MODE_NAMES.get(int(msg.param2), "")))
+        elif command == m.MAV_CMD_NAV_TAKEOFF:
+            self._ack(command, v.takeoff(msg.param7))
+        elif command == m.MAV_CMD_CONDITION_YAW:
+            v.condition_yaw(msg.param1, msg.param2, msg.param3, msg.param4 > 0.5)
+            self._ack(command, True)
+        elif command == m.MAV_CMD_NAV_LAND:
+            self._ack(command, v.set_mode("LAND"))
+        elif command == m.MAV_CMD_NAV_RETURN_TO_LAUNCH:
+            self._ack(command, v.set_mode("RTL"))
+        elif command == m.MAV_CMD_SET_MESSAGE_INTERVAL:
+            name = m.mavlink_map[int(msg.param1)].msgname if int(msg.param1) in m.mavlink_map else None
+            if name is not None:
+                if msg.param2 < 0:
+                    self.intervals.pop(name, None)
+                elif msg.param2 > 0:
+                    self.intervals[name] = msg.param2 / 1e6
+            self._ack(command, name is not None)
+        elif command == m.MAV_CMD_REQUEST_AUTOPILOT_CAPABILITIES:
+            self._send(self.mav.autopilot_version_encode(
+                capabilities=m.MAV_PROTOCOL_CAPABILITY_MAVLINK2 | m.MAV_PROTOCOL_CAPABILITY_SET_POSITION_TARGET_LOCAL_NED,
+                flight_sw_version=(4 << 24) | (5 << 16), middleware_sw_version=0, os_sw_version=0,
+                board_version=0, flight_custom_version=[0] * 8, middleware_custom_version=[0] * 8,
+                os_custom_version=[0] * 8, vendor_id=0, product_id=0, uid=0))
+            self._ack(command, True)
+        else:
+            self._ack(command, False)
+
+    def _handle_setpoint(self, msg):
+        m = self.mavlink
+        v = self.vehicle
+        if v.mode != "GUIDED":
+            return
+        ignore_position = msg.type_mask & 0b111 == 0b111
+        ignore_velocity = msg.type_mask & 0b111000 == 0b111000
+        if not ignore_position:
+            north, east, down = msg.x, msg.y, msg.z
+            if msg.coordinate_frame == m.MAV_FRAME_LOCAL_OFFSET_NED:
+                north, east, down = v.position[0] + north, v.position[1] + east, v.position[2] + down
+            elif msg.coordinate_frame == m.MAV_FRAME_BODY_OFFSET_NED:
+                c, s = math.cos(v.yaw), math.sin(v.yaw)
+                north, east = v.position[0] + north * c - east * s, v.position[1] + north * s + east * c
+                down = v.position[2] + down
+            v.set_position(north, east, down)
+        elif not ignore_velocity:
+            body = msg.coordinate_frame in (m.MAV_FRAME_BODY_NED, m.MAV_FRAME_BODY_OFFSET_NED)
+            v.set_velocity(msg.vx, msg.vy, msg.vz, body)
+        if not msg.type_mask & 0b100000000000:
+            v.set_yaw_rate(msg.yaw_rate)
+        elif not msg.type_mask & 0b10000000000:
+            v.condition_yaw(math.degrees(msg.yaw), relative=False)
+
+    def _send_param(self, name, index):
+        self._send(self.mav.param_value_encode(name.encode(), float(PARAMS[name]),
+                                               self.mavlink.MAV_PARAM_TYPE_REAL32, len(PARAMS), index))
+
+    # === OUTBOUND ===
+    def _encode(self, name):
+        m = self.mavlink
+        v = self.vehicle
+        boot_ms = int(v.time * 1000) & 0xFFFFFFFF
+        north, east, down = v.position
+        vn, ve, vd = v.velocity
+        heading = math.degrees(v.yaw) % 360
+        if name == "HEARTBEAT":
+            base_mode = m.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED | m.MAV_MODE_FLAG_GUIDED_ENABLED
+            if v.armed:
+                base_mode |= m.MAV_MODE_FLAG_SAFETY_ARMED
+            state = m.MAV_STATE_ACTIVE if v.armed else m.MAV_STATE_STANDBY
+            return self.mav.heartbeat_encode(m.MAV_TYPE_QUADROTOR, m.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                             base_mode, MODES[v.mode], state)
+        if name == "ATTITUDE":
+            return self.mav.attitude_encode(boot_ms, 0.0, 0.0, v.yaw, 0.0, 0.0, v.yaw_speed)
+        if name == "GLOBAL_POSITION_INT":
+            lat, lon = v.global_position()
+            return self.mav.global_position_int_encode(
+                boot_ms, int(lat * 1e7), int(lon * 1e7), int(-down * 1000), int(-down * 1000),
+                int(vn * 100), int(ve * 100), int(vd * 100), int(heading * 100))
+        if name == "LOCAL_POSITION_NED":
+            return self.mav.local_position_ned_encode(boot_ms, north, east, down, vn, ve, vd)
+        if name == "VFR_HUD":
+            ground_speed = math.hypot(vn, ve)
+            return self.mav.vfr_hud_encode(ground_speed, ground_speed, int(heading), 50 if v.armed else 0, -down, -vd)
+        if name == "SYS_STATUS":
+            level = int(100 * (v.battery - 10.5) / 2.1)
+            return self.mav.sys_status_encode(0, 0, 0, 200, int(v.battery * 1000), 1000, level, 0, 0, 0, 0, 0, 0)
+        if name == "GPS_RAW_INT":
+            lat, lon = v.global_position()
+            return self.mav.gps_raw_int_encode(int(v.time * 1e6), 3, int(lat * 1e7), int(lon * 1e7),
+                                               int(-down * 1000), 80, 120, int(math.hypot(vn, ve) * 100),
+                                               int(heading * 100), 12)
+        if name == "EKF_STATUS_REPORT":
+            return self.mav.ekf_status_report_encode(
+                flags=EKF_FLAGS_OK, velocity_variance=0.05, pos_horiz_variance=0.05,
+                pos_vert_variance=0.05, compass_variance=0.05, terrain_alt_variance=0.0)
+        return None
+
+    def _sim_loop(self):
+        wall_next = time.time()
+        while self.running:
+            with self.lock:
+                self.vehicle.step(PHYSICS_DT)
+                now = self.vehicle.time
+                due = []
+                for name, interval in self.intervals.items():
+                    if now >= self.next_due.get(name, 0.0):
+                        self.next_due[name] = now + interval
+                        due.append(self._encode(name))
+            for msg in due:
+                if msg is not None:
+                    self._send(msg)
+            wall_next += PHYSICS_DT / self.speedup
+            delay = wall_next - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                wall_next = time.time()
+
+
+# === APPROACH TRIALS ===
+# Same camera and thresholds as main.track(): 640x480 camera looking along
+# the body Y axis, yaw toward the fruit while the offset exceeds
+# MOVE_THRESHOLD, approach at 0.3 m/s until the box area reaches STOP_AREA.
+IMAGE_WIDTH_PX = 640
+IMAGE_HEIGHT_PX = 480
+HFOV_DEG = 62.2
+CAMERA_YAW = math.pi / 2
+FRUIT_SIZE_M = 0.09
+MOVE_THRESHOLD = 50
+TRACK_YAW_RATE = 0.15
+APPROACH_SPEED = 0.3
+STOP_AREA = 3850
+CONTROL_RATE_HZ = 10
+
+def observe(vehicle, fruit):
+    """
+    Pinhole projection of a fruit (north, east, altitude) into the simulated
+    camera. Returns (offset_x px, box area px^2), or None when out of view.
+    """
+    dn, de = fruit[0] - vehicle.position[0], fruit[1] - vehicle.position[1]
+    bearing = wrap_angle(math.atan2(de, dn) - vehicle.yaw - CAMERA_YAW)
+    if abs(bearing) >= math.radians(HFOV_DEG / 2):
+        return None
+    focal_px = (IMAGE_WIDTH_PX / 2) / math.tan(math.radians(HFOV_DEG / 2))
+    distance = max(math.hypot(dn, de) * math.cos(bearing), 0.05)
+    size_px = focal_px * FRUIT_SIZE_M / distance
+    return focal_px * math.tan(bearing), size_px * size_px
+
+def default_controller(offset_x, area, now=None):
+    """
+    The former bang-bang steering of main.track(): returns (vx, vy, vz, yaw_rate).
+    """
+    speed = APPROACH_SPEED if area < STOP_AREA else 0
+    if abs(offset_x) > MOVE_THRESHOLD:
+        return 0, speed, 0, -TRACK_YAW_RATE if offset_x < 0 else TRACK_YAW_RATE
+    return 0, speed, 0, 0
+
+def pid_controller(config=None):
+    """
+    main.track()'s VisualServoController, fed with a square box of the
+    observed offset and area at the simulated time.
+    """
+    from visual_servo import VisualServoController
+    servo = VisualServoController(IMAGE_WIDTH_PX, IMAGE_HEIGHT_PX, config, target_area=STOP_AREA, approach_axis="y")
+
+    def controller(offset_x, area, now=None):
+        half = math.sqrt(area) / 2
+        cx, cy = IMAGE_WIDTH_PX / 2 + offset_x, IMAGE_HEIGHT_PX / 2
+        return servo.update((cx - half, cy - half, cx + half, cy + half), now=now)
+    return controller
+
+CONTROLLERS = {"bangbang": lambda: default_controller, "pid": pid_controller}
+
+def approach_trial(controller=default_controller, rng=None, max_time=60.0, hold_time=1.0, altitude=3.0):
+    """
+    Flies one simulated approach from a random start towards a fruit in
+    view and reports settling time (offset inside MOVE_THRESHOLD for
+    hold_time), time to reach STOP_AREA and the worst overshoot.
+    """
+    rng = rng or random.Random()
+    v = SimVehicle()
+    v.set_mode("GUIDED")
+    v.arm()
+    v.position[2] = -altitude
+    v.yaw = rng.uniform(-math.pi, math.pi)
+    distance = rng.uniform(2.0, 8.0)
+    bearing = v.yaw + CAMERA_YAW + math.radians(rng.uniform(-0.4, 0.4) * HFOV_DEG)
+    fruit = (distance * math.cos(bearing), distance * math.sin(bearing), altitude)
+
+    steps_per_command = int(round(1.0 / (CONTROL_RATE_HZ * PHYSICS_DT)))
+    settled_at = None
+    inside_since = None
+    reached_at = None
+    lost = False
+    first_sign = None
+    overshoot = 0.0
+    step = 0
+    while v.time < max_time:
+        if step % steps_per_command == 0:
+            seen = observe(v, fruit)
+            if seen is None:
+                lost = True
+                break
+            offset_x, area = seen
+            if first_sign is None:
+                first_sign = offset_x >= 0
+            elif (offset_x >= 0) != first_sign:
+                overshoot = max(overshoot, abs(offset_x))
+            if abs(offset_x) <= MOVE_THRESHOLD:
+                inside_since = v.time if inside_since is None else inside_since
+                if settled_at is None and v.time - inside_since >= hold_time:
+                    settled_at = inside_since
+            else:
+                inside_since = None
+            if reached_at is None and area >= STOP_AREA:
+                reached_at = v.time
+            if settled_at is not None and reached_at is not None:
+                break
+            vx, vy, vz, yaw_rate = controller(offset_x, area, v.time)
+            v.set_velocity(vx, vy, vz, body=True)
+            v.set_yaw_rate(yaw_rate)
+        v.step(PHYSICS_DT)
+        step += 1
+
+    return {
+        "start_distance": distance,
+        "settling_time": settled_at,
+        "approach_time": reached_at,
+        "overshoot_px": overshoot,
+        "lost": lost,
+    }
+
+def run_trials(trials=1000, make_controller=CONTROLLERS["bangbang"], seed=0):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    # Controllers keep state (integrators), so every trial gets a fresh one
+    results = [approach_trial(make_controller(), rng) for _ in range(trials)]
+    elapsed = time.perf_counter() - start
+
+    settling = sorted(r["settling_time"] for r in results if r["settling_time"] is not None)
+    approach = sorted(r["approach_time"] for r in results if r["approach_time"] is not None)
+
+    def percentile(values, q):
+        return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+    return {
+        "trials": trials,
+        "wall_seconds": elapsed,
+        "settled": len(settling),
+        "reached": len(approach),
+        "lost": sum(r["lost"] for r in results),
+        "settling_p50": percentile(settling, 0.5),
+        "settling_p95": percentile(settling, 0.95),
+        "approach_p50": percentile(approach, 0.5),
+        "approach_p95": percentile(approach, 0.95),
+        "max_overshoot_px": max(r["overshoot_px"] for r in results) if results else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated MAVLink vehicle for testing without SITL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Serve a simulated vehicle over TCP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5762)
+    serve.add_argument("--speedup", type=float, default=1.0, help="Simulated seconds per wall-clock second")
+    trials = sub.add_parser("approach", help="Run simulated approach sequences and report settling times")
+    trials.add_argument("--trials", type=int, default=1000)
+    trials.add_argument("--seed", type=int, default=0)
+    trials.add_argument("--controller", default="pid", choices=sorted(CONTROLLERS))
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        sim = MavlinkSimulator(args.host, args.port, args.speedup).start()
+        try:
+            while True:
+                time.sleep(5)
+                v = sim.vehicle
+                print(f"t={v.time:7.1f}s mode={v.mode:<8} armed={v.armed} alt={v.altitude:5.2f}m "
+                      f"yaw={math.degrees(v.yaw):6.1f} sent={sim.sent}")
+        except KeyboardInterrupt:
+            sim.stop()
+    else:
+        print(json.dumps(run_trials(args.trials, CONTROLLERS[args.controller], args.seed), indent=2))
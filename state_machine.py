@@ -0,0 +1,207 @@
+import threading
+import time
+
+
+# === STATE ===
+class State:
+    """
+    One mission state. enter() runs once on entry, tick(*args) once per
+    scheduler step and may return the name of the next state, exit() once
+    on leaving. After timeout seconds in the state the machine moves to
+    on_timeout. Entering a final state stops the machine.
+    """
+
+    def __init__(self, name, tick=None, enter=None, exit=None, timeout=None, on_timeout=None, final=False):
+        self.name = name
+        self.tick = tick
+        self.enter = enter
+        self.exit = exit
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.final = final
+
+
+class Transition:
+    """
+    Moves from source ("*" for any state) to target when guard() is true.
+    """
+
+    def __init__(self, source, target, guard, label=None):
+        self.source = source
+        self.target = target
+        self.guard = guard
+        self.label = label or f"{source}->{target}"
+
+    def applies(self, state):
+        return self.source == "*" or state == self.source or (isinstance(self.source, tuple) and state in self.source)
+
+
+# === BACKGROUND ACTION ===
+class Action:
+    """
+    Runs a blocking call (arm and takeoff, landing) on its own thread so the
+    scheduler loop keeps ticking. done and result are polled from a tick.
+    """
+
+    def __init__(self, fn, *args):
+        self.result = None
+        self.error = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(fn, args), daemon=True)
+        self.thread.start()
+
+    def _run(self, fn, args):
+        try:
+            self.result = fn(*args)
+        except Exception as e:
+            self.error = e
+            print(f"Action {getattr(fn, '__name__', fn)} failed: {e}")
+        self.finished.set()
+
+    @property
+    def done(self):
+        return self.finished.is_set()
+
+
+# === STATE MACHINE ===
+class StateMachine:
+    """
+    Declarative mission state machine driven by one scheduler loop calling
+    step() once per frame. Each step first checks requested transitions,
+    then guards in the order they were added, then the state's timeout, and
+    only ticks the state when none of them fired. Nothing blocks, so the
+    caller's loop (capture, recording, display) keeps running across state
+    changes. Time spent in each state is accumulated with clock.
+
+    on_transition(previous, state, reason, elapsed) is called after every
+    change, e.g. to log it or switch telemetry rates.
+    """
+
+    def __init__(self, clock=time.time, on_transition=None):
+        self.clock = clock
+        self.on_transition = on_transition
+        self.states = {}
+        self.transitions = []
+        self.current = None
+        self.entered_at = None
+        self.pending = None
+        self.lock = threading.Lock()
+
+        self.history = []
+        self.time_in_state = {}
+        self.entries = {}
+        self.timeouts = 0
+        self.ticks = 0
+
+    def add_state(self, name, tick=None, **kwargs):
+        state = State(name, tick, **kwargs)
+        self.states[name] = state
+        return state
+
+    def add_transition(self, source, target, guard, label=None):
+        transition = Transition(source, target, guard, label)
+        self.transitions.append(transition)
+        return transition
+
+    def start(self, name):
+        self._switch(name, "start", self.clock())
+        return self
+
+    def request(self, name, reason="request"):
+        """
+        Asks for a transition on the next step. Safe to call from other threads.
+        """
+        with self.lock:
+            self.pending = (name, reason)
+
+    @property
+    def done(self):
+        return self.current is not None and self.states[self.current].final
+
+    def elapsed(self):
+        """
+        Seconds spent in the current state so far.
+        """
+        return self.clock() - self.entered_at if self.entered_at is not None else 0.0
+
+    def check(self):
+        """
+        Applies a requested, guarded or timed-out transition, if any. Returns True when one fired.
+        """
+        if self.done:
+            return False
+        now = self.clock()
+        with self.lock:
+            pending, self.pending = self.pending, None
+        if pending is not None:
+            self._switch(pending[0], pending[1], now)
+            return True
+        for transition in self.transitions:
+            if transition.applies(self.current) and transition.target != self.current and transition.guard():
+                self._switch(transition.target, transition.label, now)
+                return True
+        state = self.states[self.current]
+        if state.timeout is not None and now - self.entered_at >= state.timeout:
+            self.timeouts += 1
+            self._switch(state.on_timeout, "timeout", now)
+            return True
+        return False
+
+    def step(self, *args):
+        """
+        One scheduler step: check transitions, otherwise tick the current state with args.
+        Returns the current state afterwards.
+        """
+        if self.done or self.check():
+            return self.current
+        state = self.states[self.current]
+        if state.tick is not None:
+            self.ticks += 1
+            target = state.tick(*args)
+            if target is not None and target != self.current:
+                self._switch(target, "tick", self.clock())
+        return self.current
+
+    def _switch(self, target, reason, now):
+        if target not in self.states:
+            raise ValueError(f"Unknown state '{target}'")
+        previous = self.current
+        elapsed = 0.0
+        if previous is not None:
+            elapsed = now - self.entered_at
+            self.time_in_state[previous] = self.time_in_state.get(previous, 0.0) + elapsed
+            if self.states[previous].exit is not None:
+                self.states[previous].exit()
+        self.current = target
+        self.entered_at = now
+        self.entries[target] = self.entries.get(target, 0) + 1
+        self.history.append((now, previous, target, reason, elapsed))
+        if previous is None:
+            print(f"State {target}")
+        else:
+            print(f"State {previous} -> {target} ({reason}, {elapsed:.1f}s in {previous})")
+        if self.on_transition is not None:
+            self.on_transition(previous, target, reason, elapsed)
+        if self.states[target].enter is not None:
+            self.states[target].enter()
+
+    def stats(self):
+        time_in_state = dict(self.time_in_state)
+        if self.current is not None and not self.done:
+            time_in_state[self.current] = time_in_state.get(self.current, 0.0) + self.elapsed()
+        return {
+            "state": self.current,
+            "time_in_state": {name: round(seconds, 3) for name, seconds in time_in_state.items()},
+            "entries": dict(self.entries),
+            "transitions": len(self.history) - 1 if self.history else 0,
+            "timeouts": self.timeouts,
+            "ticks": self.ticks,
+        }
+
+    def report(self):
+        stats = self.stats()
+        lines = [f"{'state':<10}{'entries':>8}{'seconds':>10}"]
+        for name in self.states:
+            if name in stats["entries"]:
+                lines.append(f"{name:<10}{stats['entries'][name]:>8}{stats['time_in_state'].get(name, 0.0):>10.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,129 @@
+from pymavlink import mavutil
+
+# === STREAM PROFILES ===
+# Message rates in Hz per flight state. 0 disables the message, messages not
+# listed keep whatever rate the autopilot is already using.
+PROFILES = {
+    "idle": {
+        "ATTITUDE": 2,
+        "LOCAL_POSITION_NED": 1,
+        "GLOBAL_POSITION_INT": 2,
+        "VFR_HUD": 1,
+        "SYS_STATUS": 1,
+        "BATTERY_STATUS": 0.5,
+        "GPS_RAW_INT": 1,
+    },
+    "takeoff": {
+        "ATTITUDE": 5,
+        "LOCAL_POSITION_NED": 5,
+        "GLOBAL_POSITION_INT": 5,
+        "VFR_HUD": 2,
+        "SYS_STATUS": 0.5,
+        "BATTERY_STATUS": 0.5,
+        "GPS_RAW_INT": 1,
+    },
+    "search": {
+        # Yaw steps complete on attitude feedback
+        "ATTITUDE": 20,
+        "LOCAL_POSITION_NED": 5,
+        "GLOBAL_POSITION_INT": 2,
+        "VFR_HUD": 1,
+        "SYS_STATUS": 0.2,
+        "BATTERY_STATUS": 0.2,
+        "GPS_RAW_INT": 0.5,
+    },
+    "track": {
+        "ATTITUDE": 25,
+        "LOCAL_POSITION_NED": 20,
+        "GLOBAL_POSITION_INT": 2,
+        "VFR_HUD": 0.5,
+        "SYS_STATUS": 0.2,
+        "BATTERY_STATUS": 0.2,
+        "GPS_RAW_INT": 0.5,
+    },
+    "land": {
+        "ATTITUDE": 5,
+        "LOCAL_POSITION_NED": 5,
+        "GLOBAL_POSITION_INT": 5,
+        "VFR_HUD": 2,
+        "SYS_STATUS": 1,
+        "BATTERY_STATUS": 1,
+        "GPS_RAW_INT": 1,
+    },
+}
+
+# Flight states without their own profile
+STATE_PROFILES = {
+    "preflight": "idle",
+    "takeoff": "takeoff",
+    "search": "search",
+    "track": "track",
+    "land": "land",
+    "RTL": "land",
+    "idle": "idle",
+    "exit": "idle",
+}
+
+# Approximate MAVLink 2 frame sizes (payload + 12 bytes framing) used for the link budget
+FRAME_BYTES = {
+    "ATTITUDE": 40,
+    "LOCAL_POSITION_NED": 40,
+    "GLOBAL_POSITION_INT": 40,
+    "VFR_HUD": 32,
+    "SYS_STATUS": 55,
+    "BATTERY_STATUS": 66,
+    "GPS_RAW_INT": 64,
+}
+
+
+# === STREAM RATE MANAGER ===
+class StreamRateManager:
+    """
+    Requests per-message intervals with MAV_CMD_SET_MESSAGE_INTERVAL and
+    switches between rate profiles as the flight state changes. Only
+    messages whose rate actually changes are re-requested.
+    """
+
+    def __init__(self, vehicle, baudrate=57600, send=None):
+        self.vehicle = vehicle
+        self.baudrate = baudrate
+        self.send = send or self._send_direct
+        self.rates = {}
+        self.profile = None
+
+    def _send_direct(self, msg):
+        self.vehicle.send_mavlink(msg)
+        self.vehicle.flush()
+
+    def set_message_rate(self, message_name, rate_hz):
+        message_id = getattr(mavutil.mavlink, "MAVLINK_MSG_ID_" + message_name)
+        interval_us = -1 if rate_hz <= 0 else int(1e6 / rate_hz)
+        msg = self.vehicle.message_factory.command_long_encode(
+            0, 0, mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL, 0,
+            message_id, interval_us, 0, 0, 0, 0, 0)
+        self.send(msg)
+        self.rates[message_name] = rate_hz
+
+    def link_load(self, rates=None):
+        """
+        Estimated share of the serial link used by the requested streams
+        (10 bits per byte on the wire).
+        """
+        rates = self.rates if rates is None else rates
+        bytes_per_s = sum(FRAME_BYTES.get(name, 40) * hz for name, hz in rates.items())
+        return bytes_per_s * 10 / self.baudrate
+
+    def apply(self, profile):
+        rates = PROFILES[profile]
+        load = self.link_load(rates)
+        if load > 0.7:
+            print(f"Warning: stream profile '{profile}' uses {load:.0%} of a {self.baudrate} baud link")
+        for name, rate_hz in rates.items():
+            if self.rates.get(name) != rate_hz:
+                self.set_message_rate(name, rate_hz)
+        self.profile = profile
+
+    def set_state(self, state):
+        profile = STATE_PROFILES.get(state)
+        if profile is not None and profile != self.profile:
+            self.apply(profile)
@@ -0,0 +1,161 @@
+import threading
+import time
+
+# DroneKit attributes mirrored into the cache
+ATTRIBUTES = [
+    "attitude",
+    "location.global_relative_frame",
+    "location.global_frame",
+    "location.local_frame",
+    "velocity",
+    "heading",
+    "battery",
+    "armed",
+    "mode",
+    "ekf_ok",
+    "gps_0",
+    "system_status",
+]
+
+
+# === TELEMETRY CACHE ===
+class TelemetryCache:
+    """
+    Latest vehicle state with receive timestamps, fed by DroneKit attribute
+    listeners and optional raw MAVLink message listeners. wait_until() wakes
+    on the first update that satisfies the predicate instead of polling with
+    fixed sleeps.
+    """
+
+    def __init__(self, vehicle):
+        self.vehicle = vehicle
+        self.values = {}
+        self.stamps = {}
+        self.messages = {}  # MAVLink message type -> latest message
+        self.cond = threading.Condition()
+        self.attached = False
+
+    def attach(self, message_types=()):
+        for name in ATTRIBUTES:
+            try:
+                value = self.vehicle
+                for part in name.split("."):
+                    value = getattr(value, part)
+                self._store(name, value)
+            except AttributeError:
+                pass
+            self.vehicle.add_attribute_listener(name, self._on_attribute)
+        for message_type in message_types:
+            self.vehicle.add_message_listener(message_type, self._on_message)
+        self.attached = True
+        return self
+
+    def detach(self, message_types=()):
+        for name in ATTRIBUTES:
+            self.vehicle.remove_attribute_listener(name, self._on_attribute)
+        for message_type in message_types:
+            self.vehicle.remove_message_listener(message_type, self._on_message)
+        self.attached = False
+
+    def _store(self, name, value):
+        with self.cond:
+            self.values[name] = value
+            self.stamps[name] = time.time()
+            self.cond.notify_all()
+
+    def _on_attribute(self, vehicle, name, value):
+        self._store(name, value)
+
+    def _on_message(self, vehicle, name, message):
+        with self.cond:
+            self.messages[name] = message
+            self.stamps[name] = time.time()
+            self.cond.notify_all()
+
+    # === ACCESSORS ===
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def age(self, name):
+        stamp = self.stamps.get(name)
+        return time.time() - stamp if stamp is not None else None
+
+    @property
+    def armed(self):
+        return bool(self.values.get("armed"))
+
+    @property
+    def mode(self):
+        mode = self.values.get("mode")
+        return mode.name if mode is not None else None
+
+    @property
+    def altitude(self):
+        frame = self.values.get("location.global_relative_frame")
+        return frame.alt if frame is not None and frame.alt is not None else 0.0
+
+    @property
+    def attitude(self):
+        return self.values.get("attitude")
+
+    @property
+    def velocity(self):
+        return self.values.get("velocity")
+
+    @property
+    def battery(self):
+        return self.values.get("battery")
+
+    def snapshot(self):
+        """
+        Plain-value copy of the cache, e.g. for logging.
+        """
+        with self.cond:
+            attitude = self.values.get("attitude")
+            position = self.values.get("location.global_relative_frame")
+            battery = self.values.get("battery")
+            return {
+                "time": time.time(),
+                "armed": self.armed,
+                "mode": self.mode,
+                "lat": position.lat if position is not None else None,
+                "lon": position.lon if position is not None else None,
+                "alt": position.alt if position is not None else None,
+                "roll": attitude.roll if attitude is not None else None,
+                "pitch": attitude.pitch if attitude is not None else None,
+                "yaw": attitude.yaw if attitude is not None else None,
+                "velocity": self.values.get("velocity"),
+                "battery_voltage": battery.voltage if battery is not None else None,
+                "battery_level": battery.level if battery is not None else None,
+                "stamps": dict(self.stamps),
+            }
+
+    # === WAIT PRIMITIVES ===
+    def wait_until(self, predicate, timeout=None, recheck=1.0):
+        """
+        Blocks until predicate(cache) is true and returns True, or False on timeout.
+        The predicate is re-evaluated on every update, and at least every
+        recheck seconds for predicates that read the vehicle directly.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.cond:
+            while not predicate(self):
+                remaining = recheck
+                if deadline is not None:
+                    remaining = min(recheck, deadline - time.time())
+                    if remaining <= 0:
+                        return False
+                self.cond.wait(remaining)
+            return True
+
+    def wait_for_armed(self, armed=True, timeout=None):
+        return self.wait_until(lambda t: t.armed == armed, timeout)
+
+    def wait_for_altitude(self, altitude, tolerance=None, timeout=None):
+        """
+        With tolerance, waits until |alt - altitude| <= tolerance;
+        otherwise until the vehicle is at or above 95% of altitude.
+        """
+        if tolerance is None:
+            return self.wait_until(lambda t: t.altitude >= altitude * 0.95, timeout)
+        return self.wait_until(lambda t: abs(t.altitude - altitude) <= tolerance, timeout)
@@ -0,0 +1,94 @@
+import numpy as np
+
+from camera_model import CameraModel
+from fruit_map import FruitMap, LocalFrame
+
+
+def brute_force_within(fruit_map, north, east, radius):
+    positions = fruit_map.positions[:fruit_map.count]
+    return set(np.nonzero(np.hypot(positions[:, 0] - north, positions[:, 1] - east) <= radius)[0].tolist())
+
+
+def test_repeated_sightings_merge_into_one_fruit():
+    fruit_map = FruitMap(merge_radius=0.3)
+    index, new = fruit_map.add_local(1.0, 1.0, 2.0, timestamp=0)
+    assert new
+    again, new = fruit_map.add_local(1.2, 1.0, 2.0, timestamp=1)
+    assert again == index and not new
+    assert fruit_map.sightings[index] == 2
+    assert np.allclose(fruit_map.positions[index], (1.1, 1.0, 2.0))
+    assert fruit_map.last_seen[index] == 1
+    _, new = fruit_map.add_local(1.0, 1.0, 3.0, timestamp=2)
+    assert new  # above the first one, not the same fruit
+    assert len(fruit_map) == 2
+
+
+def test_merged_fruit_moves_grid_cell_and_stays_findable():
+    fruit_map = FruitMap(merge_radius=0.3, cell_size=1.0)
+    index, _ = fruit_map.add_local(0.95, 0.0, 0.0)
+    fruit_map.add_local(1.15, 0.0, 0.0)
+    assert fruit_map.positions[index, 0] > 1.0
+    assert index in fruit_map.cells[(1, 0)]
+    assert index not in fruit_map.cells.get((0, 0), [])
+    assert fruit_map.within_local(1.05, 0.0, 0.1).tolist() == [index]
+
+
+def test_radius_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    fruit_map = FruitMap(merge_radius=0.05)
+    for north, east in rng.uniform(0, 50, (3000, 2)):
+        fruit_map.add_local(north, east, 1.0, timestamp=0)
+    for north, east in rng.uniform(-5, 55, (50, 2)):
+        assert set(fruit_map.within_local(north, east, 5.0).tolist()) == \
+            brute_force_within(fruit_map, north, east, 5.0)
+
+
+def test_fruits_are_counted_per_tree():
+    fruit_map = FruitMap(tree_radius=2.0)
+    for offset in (0.0, 0.5, 1.0):
+        fruit_map.add_local(offset, 0.0, 2.0)
+        fruit_map.add_local(10.0 + offset, 0.0, 2.0)
+    fruit_map.add_local(10.2, 0.4, 2.5)
+    assert fruit_map.tree_counts() == {0: 3, 1: 4}
+
+
+def test_geographic_round_trip_and_query():
+    fruit_map = FruitMap()
+    frame = LocalFrame(17.39, 78.49, 500.0)
+    lat, lon, alt = frame.to_global(3.0, 4.0, 2.0)
+    fruit_map.add(17.39, 78.49, 500.0)
+    fruit_map.add(float(lat), float(lon), float(alt))
+    assert np.allclose(fruit_map.positions[1], (3.0, 4.0, 2.0), atol=1e-6)
+    assert sorted(fruit_map.within(17.39, 78.49, 5.5).tolist()) == [0, 1]
+    assert fruit_map.within(17.39, 78.49, 4.9).tolist() == [0]
+
+
+def test_estimates_are_projected_along_the_bearing():
+    fruit_map = FruitMap()
+    estimates = np.zeros(2, dtype=[("conf", "f4"), ("bearing_deg", "f4"), ("elevation_deg", "f4"),
+                                   ("distance_cm", "f4")])
+    estimates["conf"] = (0.9, 0.2)
+    estimates["distance_cm"] = 200
+    indices = fruit_map.add_estimates((17.39, 78.49, 10.0), 90.0, 0.0, estimates, min_conf=0.5)
+    assert len(indices) == 1
+    assert np.allclose(fruit_map.positions[indices[0]], (0.0, 2.0, 0.0), atol=1e-6)
+
+
+def test_zero_width_boxes_are_skipped():
+    fruit_map = FruitMap()
+    boxes = np.array([[300, 200, 300, 260, 0.9, 0],    # zero width, infinite distance
+                      [300, 200, 340, 250, 0.9, 0]], dtype=np.float32)
+    estimates = CameraModel().estimate(boxes)
+    assert np.isinf(estimates["distance_cm"][0])
+    indices = fruit_map.add_estimates((17.39, 78.49, 10.0), 0.0, 0.0, estimates, min_conf=0.5)
+    assert len(indices) == 1 and len(fruit_map) == 1
+
+
+def test_save_and_load_keep_sightings(tmp_path):
+    fruit_map = FruitMap()
+    fruit_map.add(17.39, 78.49, 500.0, timestamp=1)
+    fruit_map.add(17.39, 78.49, 500.0, timestamp=2)
+    loaded = FruitMap.load(fruit_map.save(str(tmp_path / "map.csv")))
+    assert len(loaded) == 1
+    assert loaded.sightings[0] == 2
+    assert loaded.last_seen[0] == 2
@@ -0,0 +1,71 @@
+import itertools
+import math
+import random
+
+from harvest_queue import (HarvestQueue, fruit_position, nearest_neighbour_order, standoff_point,
+                           tour_length, two_opt)
+
+
+def test_two_opt_removes_crossing():
+    start = (0.0, 0.0, 0.0)
+    points = [(1.0, 0.0, 0.0), (2.0, 1.0, 0.0), (2.0, 0.0, 0.0), (3.0, 1.0, 0.0)]
+    crossing = [0, 1, 2, 3]
+    order = two_opt(start, points, crossing)
+    assert sorted(order) == crossing
+    assert tour_length(start, points, order) < tour_length(start, points, crossing)
+
+
+def test_two_opt_is_never_worse_than_nearest_neighbour_and_close_to_optimal():
+    rng = random.Random(1)
+    start = (0.0, 0.0, 0.0)
+    for _ in range(10):
+        points = [(rng.uniform(0, 10), rng.uniform(0, 10), 0.0) for _ in range(6)]
+        greedy = nearest_neighbour_order(start, points)
+        order = two_opt(start, points, greedy)
+        best = min(tour_length(start, points, p) for p in itertools.permutations(range(6)))
+        assert tour_length(start, points, order) <= tour_length(start, points, greedy) + 1e-9
+        assert tour_length(start, points, order) <= best * 1.2
+
+
+def test_queue_merges_by_track_id_and_by_distance():
+    queue = HarvestQueue(merge_radius=0.5)
+    first = queue.add(1, (0.0, 0.0, -2.0))
+    assert queue.add(1, (0.2, 0.0, -2.0)) is first
+    # Same fruit under a new tracker ID
+    assert queue.add(7, (0.1, 0.3, -2.0)) is first
+    other = queue.add(2, (3.0, 0.0, -2.0))
+    assert other is not first
+    assert first.observations == 3
+    assert first.track_ids == {1, 7}
+    assert len(queue) == 2
+
+
+def test_visited_fruit_is_not_queued_again_after_clear():
+    queue = HarvestQueue()
+    fruit = queue.add(1, (1.0, 1.0, -2.0))
+    queue.plan((0.0, 0.0, -2.0))
+    assert queue.next() is fruit
+    queue.mark_visited(fruit)
+    assert queue.next() is None
+    queue.clear()
+    assert queue.add(9, (1.1, 1.0, -2.0)) is fruit
+    assert len(queue) == 0
+
+
+def test_plan_visits_every_pending_fruit_once():
+    queue = HarvestQueue()
+    for i, position in enumerate([(5, 0, 0), (1, 0, 0), (3, 0, 0)]):
+        queue.add(i, position)
+    tour = queue.plan((0.0, 0.0, 0.0))
+    assert [t.position[0] for t in tour] == [1, 3, 5]
+    assert queue.stats()["tour_m"] == 5.0
+
+
+def test_fruit_position_and_standoff_point():
+    north, east, down = fruit_position((0.0, 0.0, -3.0, 90.0), 0.0, 0.0, 2.0)
+    assert math.isclose(north, 0.0, abs_tol=1e-9) and math.isclose(east, 2.0) and down == -3.0
+    point, heading = standoff_point((0.0, 0.0, -3.0), (4.0, 0.0, -2.0), 1.0)
+    assert point == (3.0, 0.0, -2.0) and heading == 0.0
+    # Already inside the stand-off: stay put
+    point, _ = standoff_point((3.5, 0.0, -3.0), (4.0, 0.0, -2.0), 1.0)
+    assert point == (3.5, 0.0, -2.0)
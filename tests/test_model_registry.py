@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+import model_registry
+
+
+class FakeDetector:
+    def __init__(self, weights, **backend_kwargs):
+        self.weights = weights
+        self.backend_kwargs = backend_kwargs
+
+    def fuse(self):
+        return self
+
+    def predict(self, **kwargs):
+        return []
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(model_registry, "load_detector", FakeDetector)
+    monkeypatch.setattr(model_registry, "_models", {})
+    return model_registry
+
+
+def test_models_are_cached_per_backend_arguments(registry):
+    default = registry.get_model("fruit.pt")
+    assert registry.get_model("fruit.pt") is default
+    assert registry.get_model("fruit.pt", imgsz=None) is default
+
+    onnx = registry.get_model("fruit.pt", backend="onnx", imgsz=320)
+    assert onnx is not default
+    assert onnx.backend_kwargs == {"backend": "onnx", "imgsz": 320}
+    assert registry.get_model("fruit.pt", imgsz=320, backend="onnx") is onnx
+    assert registry.get_model("fruit.pt", backend="onnx", imgsz=320, int8=True) is not onnx
+
+
+def test_unload_drops_every_backend(registry):
+    registry.get_model("fruit.pt")
+    registry.get_model("fruit.pt", backend="onnx")
+    registry.get_model("other.pt")
+    registry.unload("fruit.pt")
+    assert not registry.is_loaded("fruit.pt")
+    assert not registry.is_loaded("fruit.pt", backend="onnx")
+    assert registry.is_loaded("other.pt")
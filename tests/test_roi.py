@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+
+from detector_backends import ExportedDetector
+from roi import RoiDetector
+
+
+class CentreBoxDetector(ExportedDetector):
+    """
+    Exported graph stand-in: one 64 px box of class 0 in the middle of every blob.
+    """
+
+    def __init__(self, imgsz=640):
+        super().__init__(imgsz, {0: "mango"})
+        self.blob_shapes = []
+
+    def _infer(self, blob):
+        self.blob_shapes.append(blob.shape)
+        output = np.zeros((1, 5, 1), dtype=np.float32)
+        output[0, :, 0] = (self.imgsz / 2, self.imgsz / 2, 64, 64, 0.9)
+        return output
+
+
+def test_roi_crop_runs_on_an_exported_graph():
+    detector = CentreBoxDetector(imgsz=640)
+    roi_detector = RoiDetector(640, 480, roi_imgsz=320, detect_fn=detector)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    boxes = roi_detector.detect(frame)
+    assert roi_detector.full_frames == 1
+    assert np.allclose(boxes[0, :4], (288, 208, 352, 272))
+
+    # The locked target is searched in a crop, letterboxed to the export size
+    boxes = roi_detector.detect(frame)
+    assert roi_detector.roi_frames == 1 and roi_detector.full_frames == 1
+    assert roi_detector.roi == (224, 144, 416, 336)
+    assert detector.blob_shapes == [(1, 3, 640, 640)] * 2
+    assert np.allclose((boxes[0, :2] + boxes[0, 2:4]) / 2, (320, 240))
+
+
+def test_exported_graph_rejects_unknown_arguments():
+    with pytest.raises(TypeError):
+        CentreBoxDetector().predict(np.zeros((64, 64, 3), dtype=np.uint8), augment=True)
@@ -0,0 +1,33 @@
+import math
+
+from sim_vehicle import SimVehicle
+
+
+def flying_vehicle(altitude=4.0):
+    vehicle = SimVehicle()
+    vehicle.set_mode("GUIDED")
+    vehicle.arm()
+    vehicle.takeoff(altitude)
+    while vehicle.altitude < altitude - 0.05:
+        vehicle.step()
+    return vehicle
+
+
+def test_position_target_is_reached_and_held():
+    vehicle = flying_vehicle()
+    vehicle.set_position(10.0, -5.0, -4.0)
+    start = vehicle.time
+    while vehicle.time - start < 20:
+        vehicle.step()
+    assert math.dist(vehicle.position, (10.0, -5.0, -4.0)) < 0.05
+    assert max(abs(value) for value in vehicle.velocity) < 0.05
+
+
+def test_velocity_setpoint_replaces_position_target():
+    vehicle = flying_vehicle()
+    vehicle.set_position(10.0, 0.0, -4.0)
+    vehicle.set_velocity(0.0, 1.0, 0.0, body=False)
+    assert vehicle.position_target is None
+    for _ in range(200):
+        vehicle.step()
+    assert vehicle.velocity[1] > 0.9 and abs(vehicle.position[0]) < 0.01
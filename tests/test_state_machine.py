@@ -0,0 +1,86 @@
+import pytest
+from state_machine import StateMachine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_machine(clock, guard=lambda: False, tick_target=None):
+    machine = StateMachine(clock)
+    calls = []
+    machine.add_state("search", lambda: calls.append("tick") or tick_target,
+                      enter=lambda: calls.append("enter"), exit=lambda: calls.append("exit"),
+                      timeout=5, on_timeout="idle")
+    machine.add_state("track", lambda: None)
+    machine.add_state("idle", lambda: None)
+    machine.add_state("exit", final=True)
+    machine.add_transition("*", "exit", guard, "stop")
+    return machine, calls
+
+
+def test_tick_return_value_switches_state_and_runs_exit():
+    clock = FakeClock()
+    machine, calls = make_machine(clock, tick_target="track")
+    machine.start("search")
+    assert machine.step() == "track"
+    assert calls == ["enter", "tick", "exit"]
+
+
+def test_timeout_fires_without_ticking():
+    clock = FakeClock()
+    machine, calls = make_machine(clock)
+    machine.start("search")
+    machine.step()
+    clock.now = 5.0
+    assert machine.step() == "idle"
+    assert calls.count("tick") == 1
+    assert machine.stats()["timeouts"] == 1
+    assert machine.history[-1][3] == "timeout"
+
+
+def test_request_beats_guard_and_guard_beats_timeout():
+    clock = FakeClock()
+    stop = {"value": True}
+    machine, _ = make_machine(clock, guard=lambda: stop["value"])
+    machine.start("search")
+    clock.now = 10.0
+    machine.request("track", "operator")
+    assert machine.step() == "track"
+    assert machine.history[-1][3] == "operator"
+
+    machine.start("search")
+    clock.now = 20.0
+    assert machine.step() == "exit"
+    assert machine.history[-1][3] == "stop"
+    assert machine.done
+    # A final state is never left again
+    assert machine.step() == "exit"
+
+
+def test_time_in_state_is_accumulated():
+    clock = FakeClock()
+    machine, _ = make_machine(clock, tick_target=None)
+    machine.start("search")
+    clock.now = 2.0
+    machine.request("track")
+    machine.step()
+    clock.now = 3.5
+    machine.request("search")
+    machine.step()
+    clock.now = 4.0
+    stats = machine.stats()
+    assert stats["time_in_state"] == {"search": 2.5, "track": 1.5}
+    assert stats["entries"] == {"search": 2, "track": 1}
+    assert stats["transitions"] == 2
+
+
+def test_unknown_state_raises():
+    machine, _ = make_machine(FakeClock(), tick_target="nowhere")
+    machine.start("search")
+    with pytest.raises(ValueError):
+        machine.step()
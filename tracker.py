@@ -0,0 +1,168 @@
+from collections import namedtuple
+import cv2
+import numpy as np
+
+# Box the steering logic consumes; source is "detection" or "prediction"
+TrackedBox = namedtuple("TrackedBox", ["x1", "y1", "x2", "y2", "confidence", "source", "track_id"],
+                        defaults=(None,))
+
+
+# === KALMAN BOX FILTER ===
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter over box centre and size
+    (cx, cy, w, h and their per-frame velocities).
+    """
+
+    def __init__(self, box):
+        self.kf = cv2.KalmanFilter(8, 4)
+        transition = np.eye(8, dtype=np.float32)
+        for i in range(4):
+            transition[i, i + 4] = 1.0
+        self.kf.transitionMatrix = transition
+        self.kf.measurementMatrix = np.eye(4, 8, dtype=np.float32)
+        self.kf.processNoiseCov = np.diag([1, 1, 1, 1, 0.5, 0.5, 0.1, 0.1]).astype(np.float32)
+        self.kf.errorCovPost = np.eye(8, dtype=np.float32) * 10
+        self.kf.statePost = np.zeros((8, 1), dtype=np.float32)
+        self.kf.statePost[:4, 0] = self._to_measurement(box)[:, 0]
+
+    @staticmethod
+    def _to_measurement(box):
+        x1, y1, x2, y2 = box[:4]
+        return np.array([[(x1 + x2) / 2], [(y1 + y2) / 2], [x2 - x1], [y2 - y1]], dtype=np.float32)
+
+    @staticmethod
+    def _to_box(state):
+        cx, cy, w, h = state[:4, 0]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+    def predict(self):
+        return self._to_box(self.kf.predict())
+
+    def correct(self, box, noise=1.0):
+        self.kf.measurementNoiseCov = np.eye(4, dtype=np.float32) * noise
+        return self._to_box(self.kf.correct(self._to_measurement(box)))
+
+
+# === OPTICAL FLOW BOX PROPAGATION ===
+def _seed_points(gray, box, max_points=40):
+    h, w = gray.shape[:2]
+    x1, y1, x2, y2 = np.clip(np.asarray(box[:4]), 0, [w - 1, h - 1, w - 1, h - 1]).astype(int)
+    if x2 - x1 < 4 or y2 - y1 < 4:
+        return None
+    mask = np.zeros_like(gray)
+    mask[y1:y2, x1:x2] = 255
+    return cv2.goodFeaturesToTrack(gray, max_points, 0.01, 3, mask=mask)
+
+def propagate_box(prev_gray, gray, points, box, max_fb_error=1.0):
+    """
+    Moves box from prev_gray to gray with pyramidal Lucas-Kanade flow on points.
+    Returns (new_box, ratio of points tracked reliably) or (None, 0.0).
+    """
+    if points is None or len(points) < 4:
+        return None, 0.0
+    lk = dict(winSize=(15, 15), maxLevel=2)
+    moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **lk)
+    back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, moved, None, **lk)
+    fb_error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+    good = (status.reshape(-1) == 1) & (status_back.reshape(-1) == 1) & (fb_error < max_fb_error)
+    if good.sum() < 4:
+        return None, 0.0
+
+    old, new = points.reshape(-1, 2)[good], moved.reshape(-1, 2)[good]
+    shift = np.median(new - old, axis=0)
+    old_spread = np.median(np.linalg.norm(old - old.mean(axis=0), axis=1))
+    new_spread = np.median(np.linalg.norm(new - new.mean(axis=0), axis=1))
+    scale = new_spread / old_spread if old_spread > 1e-3 else 1.0
+
+    x1, y1, x2, y2 = box[:4]
+    cx, cy = (x1 + x2) / 2 + shift[0], (y1 + y2) / 2 + shift[1]
+    w, h = (x2 - x1) * scale, (y2 - y1) * scale
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32), float(good.mean())
+
+
+# === TARGET TRACKER ===
+class TargetTracker:
+    """
+    Follows one target between detector runs. The detector runs every
+    detect_every frames, or sooner when the propagated confidence (detector
+    confidence decayed by the share of reliably tracked flow points) falls
+    below min_confidence. In between, the box is propagated with optical
+    flow and smoothed by a Kalman filter.
+    """
+
+    def __init__(self, detect_fn, detect_every=3, min_confidence=0.4, select_fn=None):
+        self.detect_fn = detect_fn
+        self.select_fn = select_fn
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.reset()
+        self.detections = 0
+        self.predictions = 0
+
+    def reset(self):
+        self.kalman = None
+        self.box = None
+        self.confidence = 0.0
+        self.prev_gray = None
+        self.points = None
+        self.track_id = None
+        self.frames_since_detection = 0
+
+    def _select(self, boxes):
+        if self.select_fn is not None:
+            return self.select_fn(boxes)
+        # Stay on the box closest to where the target is expected to be
+        if self.box is None:
+            return boxes[boxes[:, 4].argmax()]
+        centre = (self.box[:2] + self.box[2:4]) / 2
+        centres = (boxes[:, :2] + boxes[:, 2:4]) / 2
+        return boxes[np.linalg.norm(centres - centre, axis=1).argmin()]
+
+    def update(self, frame):
+        """
+        Returns a TrackedBox in frame coordinates, or None when the target is lost.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        need_detection = (self.kalman is None
+                          or self.frames_since_detection + 1 >= self.detect_every
+                          or self.confidence < self.min_confidence)
+
+        if self.kalman is not None:
+            self.kalman.predict()
+        source = "prediction"
+        if not need_detection:
+            flow_box, ratio = propagate_box(self.prev_gray, gray, self.points, self.box)
+            if flow_box is None:
+                need_detection = True
+            else:
+                self.box = self.kalman.correct(flow_box, noise=4.0)
+                self.confidence *= ratio
+                self.frames_since_detection += 1
+                self.predictions += 1
+
+        if need_detection:
+            boxes = self.detect_fn(frame)
+            self.detections += 1
+            target = self._select(boxes) if len(boxes) else None
+            if target is None:
+                self.reset()
+                return None
+            # Rows from the multi-object tracker carry the track id in column 6
+            self.track_id = int(target[6]) if len(target) > 6 else None
+            if self.kalman is None:
+                self.kalman = KalmanBoxFilter(target)
+                self.box = target[:4].astype(np.float32)
+            else:
+                self.box = self.kalman.correct(target, noise=1.0)
+            self.confidence = float(target[4])
+            self.frames_since_detection = 0
+            source = "detection"
+
+        self.prev_gray = gray
+        self.points = _seed_points(gray, self.box)
+        x1, y1, x2, y2 = self.box
+        return TrackedBox(float(x1), float(y1), float(x2), float(y2), self.confidence, source, self.track_id)
+
+    def stats(self):
+        return {"detections": self.detections, "predictions": self.predictions}
@@ -0,0 +1,148 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+
+# === ENCODER SETTINGS ===
+DEFAULT_CODEC = "libx264"     # h264_nvenc, h264_v4l2m2m or h264_vaapi where the hardware has one
+DEFAULT_PRESET = "veryfast"
+DEFAULT_CRF = 23
+DEFAULT_SEGMENT_MINUTES = 10
+# Codecs that understand -preset / -crf
+PRESET_CODECS = ("libx264", "libx265", "h264_nvenc", "hevc_nvenc")
+CRF_CODECS = ("libx264", "libx265")
+
+
+# === FFMPEG WRITER ===
+class FfmpegWriter:
+    """
+    cv2.VideoWriter replacement that hands frames to an ffmpeg process. write()
+    only queues a reference to the frame and returns; a feeder thread pushes
+    the raw BGR bytes into ffmpeg's stdin without copying them. When the
+    encoder falls behind, new frames are dropped and counted instead of
+    stalling the caller. Output is cut into segments of segment_minutes named
+    <base>_000.mp4, <base>_001.mp4, ...
+
+    Queued frames must not be modified afterwards; annotate a copy.
+    """
+
+    def __init__(self, path, width, height, fps=20.0, codec=DEFAULT_CODEC, preset=DEFAULT_PRESET,
+                 crf=DEFAULT_CRF, segment_minutes=DEFAULT_SEGMENT_MINUTES, max_pending=8,
+                 threads=2, niceness=10, extra_args=()):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        base, ext = os.path.splitext(path)
+        self.pattern = f"{base}_%03d{ext or '.mp4'}"
+        self.segment_seconds = segment_minutes * 60
+
+        command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                   "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps),
+                   "-i", "-", "-an", "-c:v", codec]
+        if codec in PRESET_CODECS:
+            command += ["-preset", preset]
+        if codec in CRF_CODECS:
+            command += ["-crf", str(crf)]
+        if threads:
+            command += ["-threads", str(threads)]
+        command += ["-pix_fmt", "yuv420p",
+                    # Keyframe at every segment boundary so segments cut exactly on time
+                    "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+                    *extra_args,
+                    "-f", "segment", "-segment_time", str(self.segment_seconds),
+                    "-reset_timestamps", "1", self.pattern]
+
+        # Lower priority so the encoder only gets CPU time the vision loop leaves over
+        preexec = (lambda: os.nice(niceness)) if niceness and hasattr(os, "nice") else None
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        preexec_fn=preexec, bufsize=0)
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.frames_rejected = 0
+        self.error = None
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+
+    def isOpened(self):
+        return self.process.poll() is None and self.error is None
+
+    def write(self, frame):
+        """
+        Queues frame for encoding. Returns False when it was dropped.
+        """
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            self.frames_rejected += 1
+            return False
+        try:
+            self.pending.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def _feed(self):
+        while True:
+            frame = self.pending.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue
+            if not frame.flags["C_CONTIGUOUS"]:
+                frame = np.ascontiguousarray(frame)
+            try:
+                self._write_all(memoryview(frame).cast("B"))
+                self.frames_written += 1
+            except (BrokenPipeError, OSError) as e:
+                self.error = e
+                print(f"Encoder stopped: {e} {self.process.stderr.read().decode(errors='replace').strip()}")
+
+    def _write_all(self, data):
+        # stdin is unbuffered, so write() may take only part of a frame; a short
+        # write left unhandled would shift every later frame in the raw stream
+        while data:
+            written = self.process.stdin.write(data)
+            data = data[written or 0:]
+
+    def segment_index(self, frame_index):
+        """
+        Segment file number holding the frame_index-th written frame.
+        """
+        return int(frame_index / self.fps // self.segment_seconds)
+
+    def release(self):
+        self.pending.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        print("Recording stats:", self.stats())
+
+    def stats(self):
+        return {
+            "written": self.frames_written,
+            "dropped": self.frames_dropped,
+            "rejected": self.frames_rejected,
+            "pending": self.pending.qsize(),
+            "segments": self.segment_index(max(self.frames_written - 1, 0)) + 1 if self.frames_written else 0,
+        }
+
+
+def open_writer(path, width, height, fps=20.0, backend="ffmpeg", **ffmpeg_kwargs):
+    """
+    Recording backend for path: an FfmpegWriter, or cv2.VideoWriter (XVID)
+    when backend is "opencv" or no ffmpeg binary is installed.
+    """
+    if backend == "ffmpeg" and shutil.which("ffmpeg"):
+        return FfmpegWriter(path, width, height, fps, **ffmpeg_kwargs)
+    if backend == "ffmpeg":
+        print("ffmpeg not found, recording with cv2.VideoWriter in the calling thread")
+    path = os.path.splitext(path)[0] + ".avi"
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'XVID'), fps, (width, height))
@@ -0,0 +1,168 @@
+import json
+import math
+import time
+
+# === CONFIGURATION ===
+# The "servo" section of config.json overrides any of these, e.g.
+# {"servo": {"yaw": {"kp": 0.5}, "rate_hz": 20}}
+CONFIG_FILE = 'config.json'
+DEFAULT_SERVO_CONFIG = {
+    "rate_hz": 10,
+    # Horizontal offset (fraction of half the frame width) -> yaw rate (rad/s)
+    "yaw": {"kp": 0.6, "ki": 0.05, "kd": 0.05, "limit": 0.5, "deadband": 0.02},
+    # Vertical offset (fraction of half the frame height) -> climb rate (m/s)
+    "climb": {"kp": 0.4, "ki": 0.02, "kd": 0.0, "limit": 0.3, "deadband": 0.05},
+    # Remaining distance (fraction of the stand-off distance) -> forward speed (m/s)
+    "forward": {"kp": 0.8, "ki": 0.0, "kd": 0.05, "limit": 0.5, "min": -0.2, "deadband": 0.05},
+    # Forward speed is scaled down to zero as the horizontal offset grows to this fraction
+    "align_window": 0.5,
+    # The approach aims this fraction of the stand-off distance closer than the
+    # stand-off, so the forward deadband stops it inside the stand-off, not short of it
+    "standoff_margin": 0.1,
+}
+
+def load_servo_config(path=CONFIG_FILE):
+    config = json.loads(json.dumps(DEFAULT_SERVO_CONFIG))
+    try:
+        with open(path, 'r') as config_file:
+            overrides = json.load(config_file).get('servo', {})
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        overrides = {}
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+# === PID ===
+class PID:
+    """
+    PID loop with output clamping and conditional-integration anti-windup:
+    the integral only grows while the output is not saturated in the
+    direction of the error. The derivative is low-pass filtered because
+    detector boxes jitter from frame to frame.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, limit=1.0, min=None, deadband=0.0, derivative_filter=0.5):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_max = limit
+        self.output_min = -limit if min is None else min
+        self.deadband = deadband
+        self.derivative_filter = derivative_filter
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous_error = None
+        self.derivative = 0.0
+        self.output = 0.0
+
+    def update(self, error, dt):
+        if abs(error) < self.deadband:
+            error = 0.0
+        if self.previous_error is not None and dt > 0:
+            raw = (error - self.previous_error) / dt
+            self.derivative += (1 - self.derivative_filter) * (raw - self.derivative)
+        self.previous_error = error
+
+        unclamped = self.kp * error + self.ki * self.integral + self.kd * self.derivative
+        output = max(self.output_min, min(self.output_max, unclamped))
+        saturated = (output >= self.output_max and error > 0) or (output <= self.output_min and error < 0)
+        if not saturated and dt > 0:
+            self.integral += error * dt
+        self.output = output
+        return output
+
+
+# === VISUAL SERVO ===
+class VisualServoController:
+    """
+    Steers onto a target box with three PID loops: horizontal offset ->
+    yaw rate, vertical offset -> climb rate, remaining distance -> approach
+    speed. Commands are recomputed at a fixed rate_hz no matter how often
+    update() is called, so gains do not depend on the detector frame rate.
+
+    The remaining distance comes from distance_cm when the caller has one
+    (CameraModel), otherwise from the box area against target_area, using
+    the fact that the box side shrinks with 1 / distance.
+
+    update() returns (vx, vy, vz, yaw_rate) in the body frame; approach_axis
+    picks which of vx / vy carries the approach speed ("x" for a forward
+    camera, "y" for one looking to the right).
+    """
+
+    def __init__(self, frame_width, frame_height, config=None, target_area=3850, target_distance_cm=None,
+                 approach_axis="y", clock=time.time):
+        self.config = config or load_servo_config()
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.target_area = target_area
+        self.target_distance_cm = target_distance_cm
+        self.approach_axis = approach_axis
+        self.clock = clock
+        self.period = 1.0 / self.config["rate_hz"]
+        self.yaw_pid = PID(**self.config["yaw"])
+        self.climb_pid = PID(**self.config["climb"])
+        self.forward_pid = PID(**self.config["forward"])
+        self.last_tick = None
+        self.command = (0.0, 0.0, 0.0, 0.0)
+        self.errors = None
+        self.ticks = 0
+
+    def reset(self):
+        for pid in (self.yaw_pid, self.climb_pid, self.forward_pid):
+            pid.reset()
+        self.last_tick = None
+        self.command = (0.0, 0.0, 0.0, 0.0)
+        self.errors = None
+
+    def at_standoff(self):
+        """
+        True once the last measured distance is at or inside the stand-off.
+        """
+        return self.errors is not None and self.errors[2] <= 0
+
+    def measure(self, box, distance_cm=None):
+        """
+        Normalized (horizontal, vertical, distance) errors for box; positive
+        means target right of centre, above centre, and still too far away.
+        """
+        x1, y1, x2, y2 = box[:4]
+        horizontal = ((x1 + x2) / 2 - self.frame_width / 2) / (self.frame_width / 2)
+        vertical = (self.frame_height / 2 - (y1 + y2) / 2) / (self.frame_height / 2)
+        if distance_cm is not None and self.target_distance_cm:
+            distance = (distance_cm - self.target_distance_cm) / self.target_distance_cm
+        else:
+            area = max((x2 - x1) * (y2 - y1), 1.0)
+            distance = math.sqrt(self.target_area / area) - 1.0
+        return horizontal, vertical, distance
+
+    def update(self, box, distance_cm=None, now=None):
+        now = self.clock() if now is None else now
+        if box is None:
+            self.reset()
+            return self.command
+        if self.last_tick is not None and now - self.last_tick < self.period:
+            return self.command
+        dt = self.period if self.last_tick is None else now - self.last_tick
+        self.last_tick = now
+        self.ticks += 1
+
+        horizontal, vertical, distance = self.measure(box, distance_cm)
+        self.errors = (horizontal, vertical, distance)
+        yaw_rate = self.yaw_pid.update(horizontal, dt)
+        climb = self.climb_pid.update(vertical, dt)
+        speed = self.forward_pid.update(distance + self.config["standoff_margin"], dt)
+        # Approach only once the target is roughly centred
+        speed *= max(0.0, 1.0 - abs(horizontal) / self.config["align_window"])
+
+        vx, vy = (speed, 0.0) if self.approach_axis == "x" else (0.0, speed)
+        self.command = (vx, vy, -climb, yaw_rate)
+        return self.command
+
+    def stats(self):
+        return {"ticks": self.ticks, "errors": self.errors, "command": self.command}